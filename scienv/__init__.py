@@ -1 +1,7 @@
-from .core import *
\ No newline at end of file
+def __getattr__(name):
+    # the GUI, and wx with it, is imported only when it is asked for,
+    # so the calculator engine can run on a machine without a display.
+    if name == 'Application':
+        from .core import Application
+        return Application
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,103 @@
+"""
+Headless calculator, the evaluator of the calculator widget without wx.
+
+    python -m scienv.calc expressions.txt
+    python -m scienv.calc --csv results.csv < expressions.txt
+
+Every line of the input is an independent expression. The lines are
+evaluated in parallel by worker processes, each within the time and
+memory budgets, and the results are written in the order of the lines
+as soon as they are ready. The input is read only as far as the workers
+are ahead of the output, so inputs of any length run in bounded memory.
+Empty lines and lines starting with # are skipped.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from .widgets.calculator.bigint import to_string
+from .widgets.calculator.expression_manager import format_result, reserved, DEFAULT_PRECISION
+from .widgets.calculator.variables import Worksheet
+from .widgets.calculator.worker import BatchEvaluator, DEFAULT_TIMEOUT, DEFAULT_MEMORY
+
+
+def expressions(file):
+    """Yields the expressions of the lines of file."""
+
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def text(value):
+    # integers are written out in full, arrays in their compact form.
+    if isinstance(value, int) and not isinstance(value, bool):
+        return to_string(value)
+    if isinstance(value, np.ndarray):
+        return format_result(value)
+    return str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m scienv.calc', description=__doc__.split('\n\n')[0])
+    parser.add_argument('input', nargs='?', help='file of expressions, standard input by default')
+    parser.add_argument('-p', '--precision', type=int, default=DEFAULT_PRECISION,
+                        help='significant digits of the results')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='worker processes, one per core by default')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='seconds each expression may take')
+    parser.add_argument('--memory', type=int, default=DEFAULT_MEMORY,
+                        help='megabytes each worker may take')
+    parser.add_argument('--csv', metavar='FILE',
+                        help='write expression, result and error columns to FILE, - for standard output')
+    args = parser.parse_args(argv)
+
+    # a file that can't be opened is a usage error, exit status 2.
+    try:
+        source = open(args.input, encoding='utf-8') if args.input else sys.stdin
+        if args.csv and args.csv != '-':
+            output = open(args.csv, 'w', encoding='utf-8', newline='')
+        else:
+            output = sys.stdout
+    except OSError as error:
+        parser.error(f"can't open {error.filename!r}: {error.strerror}")
+    writer = csv.writer(output) if args.csv else None
+    if writer is not None:
+        writer.writerow(('expression', 'result', 'error'))
+
+    evaluator = BatchEvaluator(args.timeout, args.memory, args.jobs)
+    failures = 0
+    try:
+        for items in evaluator.evaluate(expressions(source), args.precision, Worksheet(reserved)):
+            for line, (value, message), _ in items:
+                failures += value is None
+                if writer is not None:
+                    writer.writerow((line, '', message) if value is None else (line, text(value), ''))
+                elif value is None:
+                    output.write(f'{line}: {message}\n')
+                else:
+                    output.write(f'{text(value)}\n')
+            output.flush()
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # the reader went away, like head, the rest is not wanted.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        evaluator.close()
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Forward-mode automatic differentiation for the calculator's d function.
+
+A Dual carries a value and its derivative, arithmetic and the functions
+below propagate both by the chain rule. Values may be NumPy arrays, so
+a derivative over a whole sweep is computed in one vectorized pass, and
+may be Duals themselves, which gives higher derivatives for nested d.
+Function packs declare the derivatives of their functions, see packs.
+
+The arithmetic is that of floats in both engines, d() is good to about
+DIGITS digits at any precision.
+"""
+
+import math
+from collections import ChainMap
+import numpy as np
+
+from . import packs
+from . import vectorized
+
+
+# digits of a derivative, those of a float.
+DIGITS = 15
+
+
+class NotDifferentiable(ValueError):
+    pass
+
+
+class Dual:
+
+    __slots__ = ('val', 'der')
+
+    # lets NumPy arrays hand operations over to the reflected methods.
+    __array_ufunc__ = None
+
+    def __init__(self, val, der):
+        self.val = val
+        self.der = der
+
+    def __repr__(self):
+        return f'Dual({self.val!r}, {self.der!r})'
+
+    def __pos__(self):
+        return self
+
+    def __neg__(self):
+        return Dual(-self.val, -self.der)
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val + other.val, self.der + other.der)
+        return Dual(self.val + other, self.der)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val - other.val, self.der - other.der)
+        return Dual(self.val - other, self.der)
+
+    def __rsub__(self, other):
+        return Dual(other - self.val, -self.der)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val * other.val, self.der * other.val + self.val * other.der)
+        return Dual(self.val * other, self.der * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val / other.val,
+                        (self.der * other.val - self.val * other.der) / (other.val * other.val))
+        return Dual(self.val / other, self.der / other)
+
+    def __rtruediv__(self, other):
+        return Dual(other / self.val, -other * self.der / (self.val * self.val))
+
+    def __mod__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val % other.val,
+                        self.der - other.der * floor(self.val / other.val))
+        return Dual(self.val % other, self.der)
+
+    def __rmod__(self, other):
+        return Dual(other % self.val, -self.der * floor(other / self.val))
+
+    def __pow__(self, other):
+        if isinstance(other, Dual):
+            value = self.val ** other.val
+            return Dual(value, value * (other.der * log(self.val)
+                                        + other.val * self.der / self.val))
+        return Dual(self.val ** other, other * self.val ** (other - 1) * self.der)
+
+    def __rpow__(self, other):
+        value = other ** self.val
+        return Dual(value, value * log(other) * self.der)
+
+
+def floor(x):
+    if isinstance(x, Dual):
+        return floor(x.val)
+    return np.floor(x)
+
+
+def log(x):
+    if isinstance(x, Dual):
+        return Dual(log(x.val), x.der / x.val)
+    return np.log(x)
+
+
+# differentiable counterparts of the calculator functions.
+
+def sin(x):
+    if isinstance(x, Dual):
+        return Dual(sin(x.val), cos(x.val) * x.der)
+    return np.sin(x)
+
+
+def cos(x):
+    if isinstance(x, Dual):
+        return Dual(cos(x.val), -sin(x.val) * x.der)
+    return np.cos(x)
+
+
+def tan(x):
+    if isinstance(x, Dual):
+        return Dual(tan(x.val), x.der / cos(x.val) ** 2)
+    return np.tan(x)
+
+
+def log10(x):
+    return log(x) / math.log(10)
+
+
+def log2(x):
+    return log(x) / math.log(2)
+
+
+def root(x, degree=2):
+    if isinstance(x, Dual) or isinstance(degree, Dual):
+        return x ** (1 / degree)
+    return vectorized.root(x, degree)
+
+
+sqrt = root
+
+
+def rad(deg):
+    return deg * math.pi / 180
+
+
+def deg(rad):
+    return rad * 180 / math.pi
+
+
+def differentiable(name, function, *partials):
+
+    """
+    return type: function
+    function made to take Duals, by the chain rule with partials, the
+    partial derivatives of function for each of its arguments. A partial
+    is None for an argument function is not differentiable in, like the
+    integer k of poissonpmf, the partials are taken once, their own
+    derivatives are not known.
+    """
+
+    def dual(*args):
+        values = [arg.val if isinstance(arg, Dual) else arg for arg in args]
+        if not any(isinstance(arg, Dual) for arg in args):
+            return function(*values)
+        if any(isinstance(value, Dual) for value in values):
+            raise NotDifferentiable(f'd(): {name} can only be differentiated once')
+        der = 0.0
+        for index, arg in enumerate(args):
+            if not isinstance(arg, Dual):
+                continue
+            if index >= len(partials) or partials[index] is None:
+                raise NotDifferentiable(f'd(): {name} is not differentiable')
+            der = der + partials[index](*values) * arg.der
+        return Dual(function(*values), der)
+
+    dual.__name__ = name
+    return dual
+
+
+def _reduction(function):
+    # a linear reduction, applied to the value and to the derivative,
+    # which is a number when the value is an array plus a constant.
+    def reduce(x):
+        if isinstance(x, Dual):
+            return Dual(function(x.val), function(np.broadcast_to(x.der, np.shape(x.val))))
+        return function(x)
+    return reduce
+
+
+def _gamma(x):
+    return vectorized.gamma(x) * vectorized.digamma(x)
+
+
+def _factorial(n):
+    return vectorized.gamma(n + 1) * vectorized.digamma(n + 1)
+
+
+def _ncr_n(n, k):
+    return vectorized.ncr(n, k) * (vectorized.digamma(n + 1) - vectorized.digamma(n - k + 1))
+
+
+def _ncr_k(n, k):
+    return vectorized.ncr(n, k) * (vectorized.digamma(n - k + 1) - vectorized.digamma(k + 1))
+
+
+def _npr_n(n, k):
+    return vectorized.npr(n, k) * (vectorized.digamma(n + 1) - vectorized.digamma(n - k + 1))
+
+
+def _npr_k(n, k):
+    return vectorized.npr(n, k) * vectorized.digamma(n - k + 1)
+
+
+pi = math.pi
+e = math.e
+
+
+class _Namespace(dict):
+
+    # the functions above, those of packs are added when first looked up.
+    def __missing__(self, name):
+        if name in packs.constants:
+            return packs.lookup(name)[0]
+        implementations = packs.lookup(name)
+        if implementations is None:
+            raise KeyError(name)
+        value = self[name] = differentiable(name, implementations[1], *packs.derivatives(name))
+        return value
+
+
+namespace = _Namespace({
+    'sin': sin, 'cos': cos, 'tan': tan, 'log10': log10, 'log2': log2,
+    'root': root, 'sqrt': sqrt, 'rad': rad, 'deg': deg, 'pi': pi, 'e': e,
+    'gamma': differentiable('gamma', vectorized.gamma, _gamma),
+    'factorial': differentiable('factorial', vectorized.factorial, _factorial),
+    'ncr': differentiable('ncr', vectorized.ncr, _ncr_n, _ncr_k),
+    'binomial': differentiable('binomial', vectorized.ncr, _ncr_n, _ncr_k),
+    'npr': differentiable('npr', vectorized.npr, _npr_n, _npr_k),
+    'sum': _reduction(np.sum), 'mean': _reduction(np.mean),
+    'std': differentiable('std', np.std), 'max': differentiable('max', np.max),
+    'min': differentiable('min', np.min),
+})
+
+
+class _Dependents:
+
+    """
+    Variables whose formulas read name, directly or through other
+    variables, computed again in dual numbers. Their stored values are
+    plain numbers, reading them would drop the derivative (d(y, x) with
+    y = x^2 would be 0).
+    """
+
+    def __init__(self, formulas, name):
+        self.formulas = formulas
+        self.name = name
+        # the namespace the formulas are evaluated in, this one included.
+        self.scope = None
+        self._values = {}
+        self._reading = {}
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        if key == self.name or not self.reads(key):
+            raise KeyError(key)
+        value = self._values[key] = self.formulas[key](self.scope)
+        return value
+
+    def reads(self, key, seen=frozenset()):
+        # True when the formula of key depends on name.
+        if key not in self._reading:
+            if key not in self.formulas or key in seen:
+                return False
+            names = self.formulas[key].names
+            self._reading[key] = self.name in names or any(
+                self.reads(other, seen | {key}) for other in names if other != self.name)
+        return self._reading[key]
+
+
+def derivative(function, name, point, outer, formulas=None):
+
+    """
+    return type: float or numpy.ndarray
+    Derivative of function(namespace) with respect to name at point,
+    point may be an array of points, all handled in one pass. Names
+    other than the differentiable functions are taken from outer.
+    formulas maps the worksheet variables to their expressions in float
+    arithmetic, those depending on name are evaluated again.
+    """
+
+    variable = {name: Dual(point, 1.0)}
+    if formulas is None:
+        result = function(ChainMap(variable, namespace, outer))
+    else:
+        dependents = _Dependents(formulas, name)
+        dependents.scope = ChainMap(variable, dependents, namespace, outer)
+        result = function(dependents.scope)
+    if isinstance(result, Dual):
+        return result.der
+    # the expression does not depend on name.
+    return np.zeros_like(np.asarray(point, dtype=float))[()]
@@ -0,0 +1,206 @@
+"""
+Benchmark of the calculator expression engine.
+
+Runs a fixed corpus of expressions, grouped in categories, through the
+parser/compiler and the compiled evaluator and reports latency
+percentiles and throughput for each category. The median latencies are
+compared against benchmark_baseline.json and the run fails when one of
+them regresses by more than the threshold. Expressions of numbers only
+are folded into a constant when compiled, the "variables" and "arrays"
+categories read names bound in VALUES so their evaluation does the work.
+
+    python -m scienv.widgets.calculator.benchmark
+    python -m scienv.widgets.calculator.benchmark --update
+
+The baseline holds timings of one machine, regenerate it with --update
+before comparing runs on another one.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+from collections import ChainMap
+
+import numpy as np
+
+from .expression_manager import Expression, evaluate_precise, _builtins
+from .expression_manager import namespace, array_namespace, FLOAT_DIGITS
+from .parser import normalize
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 1.0
+DEFAULT_REPEAT = 20
+
+# values of the names read by the corpus, x and y scalars, a and b arrays.
+VALUES = {'x': 1.25, 'y': 0.75, 'a': np.linspace(0, 1, 1000), 'b': np.arange(1000.0)}
+
+
+def corpus(seed=0):
+
+    """
+    return type: dict
+    Category name -> list of expressions, generated from a fixed seed
+    so every run measures the same input.
+    """
+
+    rng = random.Random(seed)
+    functions = ('sin', 'cos', 'tan', 'log10', 'log2', 'sqrt', 'rad', 'deg')
+
+    def number():
+        return rng.choice((str(rng.randint(1, 99)), f'{rng.uniform(1, 99):.3f}'))
+
+    def chain(length):
+        parts = [number()]
+        for _ in range(length):
+            parts.append(rng.choice('+-*/'))
+            parts.append(number())
+        return ''.join(parts)
+
+    def operand():
+        return rng.choice((number(), 'x', 'y'))
+
+    def polynomial(length):
+        parts = [operand()]
+        for _ in range(length):
+            parts.append(rng.choice('+-*/'))
+            parts.append(operand())
+        return ''.join(parts)
+
+    return {
+        'short': ['2+2', '3*4-1', '2pi', '1/3', '2^10', '(1+2)*3', '10%3', '-5+2', 'e^2', '7/8*2'],
+        'long': [chain(500) for _ in range(5)],
+        'nested': ['(' * depth + '1+1' + ')' * depth for depth in (10, 50, 100)]
+                  + ['sin(' * depth + '1' + ')' * depth for depth in (10, 50, 100)],
+        'factorial': ['5!', '10!+9!', '(3!)!', '20!/18!', '100!', '1000!', '5000!',
+                      '3!*4!-5!', 'ncr(1000, 500)', 'npr(2000, 1000)'],
+        'functions': [''.join(f'{rng.choice(functions)}({number()})+' for _ in range(20)) + '1'
+                      for _ in range(10)],
+        'variables': ['x+1', '2x^2-3x+1', 'sin(x)^2+cos(x)^2', 'x*y/(x+y)', 'sqrt(x^2+y^2)',
+                      'e^(-x*y)', 'd(x^3, x)', 'log10(x)+log2(y)']
+                     + [polynomial(100) for _ in range(2)]
+                     + [''.join(f'{rng.choice(functions)}({operand()})+' for _ in range(20)) + 'x'],
+        'arrays': ['a+b', 'a*x+b', 'sin(a)^2+cos(a)^2', 'sum(a*b)', 'mean(a)+std(b)',
+                   'max(a*b)-min(b)', 'a[10]*x+b[20]', 'sqrt(a^2+b^2)', '[x, y, 1]*x',
+                   'd(x^2, x, a)'],
+    }
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def measure(expressions, repeat=DEFAULT_REPEAT, values=VALUES):
+
+    """
+    return type: dict
+    Parse and eval latencies in microseconds (p50, p90, p99) and
+    evaluations per second of the expressions, names are read from
+    values. Parsing bypasses the compiled expressions cache, so it is
+    measured every time.
+    """
+
+    parse, run = [], []
+    # one untimed pass warms up caches (sieve, pi, allocator), the
+    # collector is paused so its pauses do not land in the samples.
+    for string in expressions:
+        expression = Expression(normalize(string))
+        expression(_names(expression, values))
+    gc.disable()
+    try:
+        for string in expressions:
+            string = normalize(string)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                expression = Expression(string)
+                parse.append(time.perf_counter() - start)
+
+                names = _names(expression, values)
+                start = time.perf_counter()
+                expression(names)
+                run.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    report = {}
+    for name, samples in (('parse', parse), ('eval', run)):
+        for fraction in (0.5, 0.9, 0.99):
+            report[f'{name}_p{int(fraction * 100)}'] = percentile(samples, fraction) * 1e6
+    report['eval_per_second'] = len(run) / sum(run)
+    return report
+
+
+def _names(expression, values):
+    # the namespace evaluate would give the expression.
+    return ChainMap(values, _builtins(expression, values, (namespace, array_namespace)))
+
+
+def check(results, baseline, threshold):
+
+    """
+    return type: list
+    Messages for every median latency slower than the baseline by
+    more than threshold (1.0 = 100%).
+    """
+
+    failures = []
+    for category, report in results.items():
+        for key in ('parse_p50', 'eval_p50'):
+            reference = baseline.get(category, {}).get(key)
+            if reference and report[key] > reference * (1 + threshold):
+                failures.append(f'{category} {key}: {report[key]:.1f} us, '
+                                f'baseline {reference:.1f} us')
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed slowdown of the medians, 1.0 = 100%%')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update', action='store_true', help='write the baseline file')
+    args = parser.parse_args(argv)
+
+    # the corpus doubles as a regression check of the results.
+    categories = corpus()
+    for category, expressions in categories.items():
+        for string in expressions:
+            try:
+                evaluate_precise(string, FLOAT_DIGITS, VALUES)
+            except Exception as error:
+                print(f'{category}: {string[:40]!r} failed to evaluate: {error!r}', file=sys.stderr)
+                return 1
+
+    results = {category: measure(expressions, args.repeat)
+               for category, expressions in categories.items()}
+
+    print(f'{"category":<10}{"parse p50/p90/p99 (us)":>28}{"eval p50/p90/p99 (us)":>28}{"eval/s":>12}')
+    for category, report in results.items():
+        parse = '/'.join(f'{report[f"parse_p{p}"]:.1f}' for p in (50, 90, 99))
+        run = '/'.join(f'{report[f"eval_p{p}"]:.1f}' for p in (50, 90, 99))
+        print(f'{category:<10}{parse:>28}{run:>28}{report["eval_per_second"]:>12.0f}')
+
+    if args.update:
+        with open(args.baseline, 'w') as baseline:
+            json.dump(results, baseline, indent=4)
+        print(f'baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('no baseline, run with --update to create one')
+        return 0
+    with open(args.baseline) as baseline:
+        failures = check(results, json.load(baseline), args.threshold)
+    for failure in failures:
+        print(f'REGRESSION {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Decimal digits of huge integers.
+
+str(int) is quadratic in the number of digits (and refused past
+sys.get_int_max_str_digits()), so a factorial of a few hundred thousand
+takes tens of seconds to print. Here the integer is split in halves by
+bit shifts, which are linear, and put back together as a Decimal, whose
+multiplication is subquadratic, then the Decimal is printed in linear
+time.
+"""
+
+import math
+from decimal import Decimal, Context, MAX_PREC, MAX_EMAX, Inexact, Rounded
+
+# below this many bits the halves are converted directly.
+LEAF_BITS = 2**10
+LOG10_2 = math.log10(2)
+
+# chunks the digits are written in.
+CHUNK = 2**20
+
+_CONTEXT = Context(prec=MAX_PREC, Emax=MAX_EMAX, traps=[Inexact, Rounded])
+
+
+def digit_count(n):
+
+    """
+    return type: int
+    Number of decimal digits of abs(n), exact, estimated from the bit
+    length and settled with one comparison when the estimate is close.
+    """
+
+    n = abs(n)
+    if n < 10**15:
+        return len(str(n))
+
+    shift = max(n.bit_length() - 64, 0)
+    estimate = math.log10(n >> shift) + shift * LOG10_2
+    digits = int(estimate) + 1
+    fraction = estimate % 1
+    if 1e-9 < fraction < 1 - 1e-9:
+        return digits
+    # the value is within rounding of a power of 10.
+    if digits > 1 and n < 10 ** (digits - 1):
+        return digits - 1
+    if n >= 10 ** digits:
+        return digits + 1
+    return digits
+
+
+def to_decimal(n):
+
+    """
+    return type: Decimal
+    The integer n as an exact Decimal.
+    """
+
+    powers = {}
+
+    def power(bits):
+        # 2**bits as a Decimal, shared between the halves.
+        value = powers.get(bits)
+        if value is None:
+            if bits <= LEAF_BITS:
+                value = _CONTEXT.power(Decimal(2), bits)
+            else:
+                half = bits // 2
+                value = _CONTEXT.multiply(power(half), power(bits - half))
+            powers[bits] = value
+        return value
+
+    def convert(n, bits):
+        if bits <= LEAF_BITS:
+            return Decimal(n)
+        half = bits // 2
+        high = n >> half
+        low = n - (high << half)
+        return _CONTEXT.add(_CONTEXT.multiply(convert(high, bits - half), power(half)),
+                            convert(low, half))
+
+    sign = n < 0
+    value = convert(abs(n), abs(n).bit_length())
+    return _CONTEXT.minus(value) if sign else value
+
+
+def to_string(n):
+
+    """
+    return type: string
+    All the decimal digits of n, in subquadratic time.
+    """
+
+    if abs(n).bit_length() <= LEAF_BITS:
+        return str(n)
+    return f'{to_decimal(n):f}'
+
+
+def write_digits(n, file, progress=None):
+
+    """
+    Writes all the decimal digits of n to the text file in chunks,
+    progress(written, total) is called after each one.
+    """
+
+    digits = to_string(n)
+    for start in range(0, len(digits), CHUNK):
+        file.write(digits[start:start + CHUNK])
+        if progress is not None:
+            progress(min(start + CHUNK, len(digits)), len(digits))
@@ -0,0 +1,58 @@
+"""
+Semantics shared by the compiled expressions (see jit.py): the
+operators, array literals and indexing, and the reserved namespace keys.
+"""
+
+import operator
+import numpy as np
+
+from .parser import Name
+
+
+BINARY = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+    '^': operator.pow,
+}
+
+UNARY = {
+    '+': operator.pos,
+    '-': operator.neg,
+}
+
+# namespace key of the function reading past results, "ans[n]" calls it
+# with n. No name can be typed with brackets, so it never clashes.
+ANSWERS = 'ans[]'
+
+# namespace key of the worksheet formulas d() evaluates again in dual
+# numbers, see autodiff.derivative.
+FORMULAS = 'formulas[]'
+
+
+def to_array(items):
+    """Builds the NumPy array of an array literal, nested literals give rows."""
+
+    try:
+        return np.array(items)
+    except ValueError:
+        raise SyntaxError('the rows of an array have different lengths') from None
+
+
+def element(value, index):
+    """Element of an array, numbers are accepted as indices if they are integral."""
+
+    if isinstance(index, np.ndarray):
+        return value[index]
+    position = int(index)
+    if position != index:
+        raise IndexError(f'index {index} is not an integer')
+    return value[position]
+
+
+def is_answer(node):
+    """Tells if the Index node is "ans[n]", a past result and not an element."""
+
+    return isinstance(node.value, Name) and node.value.id == 'ans'
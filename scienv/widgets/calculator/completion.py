@@ -0,0 +1,143 @@
+"""
+Completion of the names the calculator knows.
+
+The names are kept in a trie. A completion walks down the prefix once
+and collects the names below it in alphabetical order until it has
+enough, so a lookup costs the length of the prefix and the names
+returned, however many names there are.
+"""
+
+# kinds of names, functions complete with their parenthesis.
+FUNCTION = 'function'
+CONSTANT = 'constant'
+VARIABLE = 'variable'
+
+# most completions offered at once.
+COMPLETIONS = 20
+
+
+class _Node:
+
+    __slots__ = ('children', 'kind', '_order')
+
+    def __init__(self):
+        self.children = {}
+        # kind of the name ending here, None when no name does.
+        self.kind = None
+        self._order = None
+
+    @property
+    def order(self):
+        """The characters of the children, sorted once per change."""
+
+        if self._order is None:
+            self._order = sorted(self.children)
+        return self._order
+
+
+class Trie:
+
+    def __init__(self, names=()):
+        self._root = _Node()
+        self._size = 0
+        for name, kind in names:
+            self.add(name, kind)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, name):
+        node = self._find(name)
+        return node is not None and node.kind is not None
+
+    def add(self, name, kind):
+        node = self._root
+        for char in name:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+                node._order = None
+            node = child
+        if node.kind is None:
+            self._size += 1
+        node.kind = kind
+
+    def remove(self, name):
+        """Removes name and the branches only it was using."""
+
+        path = [self._root]
+        for char in name:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        if path[-1].kind is None:
+            return
+        path[-1].kind = None
+        self._size -= 1
+        for index in range(len(name), 0, -1):
+            node = path[index]
+            if node.kind is not None or node.children:
+                break
+            del path[index - 1].children[name[index - 1]]
+            path[index - 1]._order = None
+
+    def complete(self, prefix, limit=COMPLETIONS):
+
+        """
+        return type: list
+        (name, kind) of the names starting with prefix, in alphabetical
+        order, at most limit of them.
+        """
+
+        node = self._find(prefix)
+        if node is None:
+            return []
+        found = [(prefix, node.kind)] if node.kind is not None else []
+        # depth first, the stack holds an iterator over the remaining
+        # children of every node on the path, siblings are not touched
+        # before they are reached.
+        stack = [(prefix, node, iter(node.order))]
+        while stack and len(found) < limit:
+            name, node, chars = stack[-1]
+            char = next(chars, None)
+            if char is None:
+                stack.pop()
+                continue
+            child = node.children[char]
+            if child.kind is not None:
+                found.append((name + char, child.kind))
+            if child.children:
+                stack.append((name + char, child, iter(child.order)))
+        return found
+
+    def _find(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+
+class Completer:
+
+    """
+    Completes the built-in names and the variables of a worksheet,
+    the variables are brought up to date with update().
+    """
+
+    def __init__(self, symbols):
+        self.trie = Trie(symbols.items())
+        self.variables = set()
+
+    def update(self, variables):
+        variables = set(variables)
+        for name in self.variables - variables:
+            self.trie.remove(name)
+        for name in variables - self.variables:
+            self.trie.add(name, VARIABLE)
+        self.variables = variables
+
+    def complete(self, prefix, limit=COMPLETIONS):
+        return self.trie.complete(prefix, limit)
@@ -1,177 +1,516 @@
-from .keywords import *
+import math
+import re
+from collections import ChainMap
+from functools import lru_cache
 from decimal import *
+import numpy as np
+
+from . import keywords
+from . import packs
+from . import vectorized
+from . import precision as decimal_keywords
+from .bigint import digit_count
+from .parser import normalize, parse, unparse, names, to_number
+from .compiler import ANSWERS, FORMULAS
+from .completion import FUNCTION, CONSTANT
+from .jit import compile_code
+from .autodiff import NotDifferentiable
+from .variables import Worksheet, InvalidAssignment, UnknownAnswer
 
 # imported functions and constants
-functions = ("d", "root", "factorial", "log10", "log2", "sin", "cos", "tan", "rad", "deg")
+functions = ("d", "root", "sqrt", "factorial", "gamma", "ncr", "npr", "binomial",
+             "log10", "log2", "sin", "cos", "tan", "rad", "deg")
 constants = ("pi", "e")
+ranges = ("linspace", "arange")
+reductions = ("sum", "mean", "std", "max", "min")
+answers = ("ans",)
+
+# names that can't be assigned to, those of function packs too,
+# loaded or not.
+reserved = functions + constants + ranges + reductions + answers + packs.functions + packs.constants
+
+# kind of every built-in name, for completion.
+symbols = dict.fromkeys(functions + ranges + reductions + packs.functions, FUNCTION)
+symbols.update(dict.fromkeys(constants + answers + packs.constants, CONSTANT))
+
+
+def _broadcasting(scalar, vector):
+    # the scalar function for numbers, its array counterpart for arrays.
+    def function(*args):
+        for arg in args:
+            if isinstance(arg, np.ndarray):
+                return vector(*args)
+        return scalar(*args)
+    function.__name__ = scalar.__name__
+    return function
+
+
+class _Namespace(dict):
+
+    """
+    Built-in names, the names of function packs are added when first
+    looked up, variant(scalar, vector) picks the value to bind. The
+    namespaces of the precise engine take the Decimal implementations.
+    """
+
+    def __init__(self, names, variant, precise=False):
+        super().__init__(names)
+        self.variant = variant
+        self.precise = precise
+
+    def __missing__(self, name):
+        implementations = packs.lookup(name, self.precise)
+        if implementations is None:
+            raise KeyError(name)
+        value = self[name] = self.variant(*implementations)
+        return value
+
+
+def _scalar(scalar, vector):
+    return scalar
+
+
+def _vector(scalar, vector):
+    return vector
+
+
+def _array(scalar, vector):
+    return _broadcasting(scalar, vector) if callable(scalar) else scalar
+
+
+# the names bound to NumPy functions, used for sweeps.
+vector_namespace = _Namespace({name: getattr(vectorized, name)
+                               for name in functions + constants + ranges + reductions
+                               if hasattr(vectorized, name)}, _vector)
+
+# names the evaluator can resolve, built once from keywords.
+namespace = _Namespace({name: getattr(keywords, name)
+                        for name in functions + constants if hasattr(keywords, name)}, _scalar)
+namespace.update({name: vector_namespace[name] for name in ranges + reductions})
+
+# the same names for expressions meeting arrays, functions
+# fall over to NumPy when they are given one.
+array_namespace = _Namespace({name: _broadcasting(function, vector_namespace[name])
+                              if callable(function) and name in functions and name in vector_namespace
+                              else function
+                              for name, function in namespace.items()}, _array)
+
+# "<expression> for <name> = <values>" sweeps the expression over values.
+_SWEEP = re.compile(r'^(?P<expression>.+?) for (?P<name>[a-z_][a-z0-9_]*) ?= ?(?P<values>.+)$')
+
+# "<name> = <expression>" assigns to a variable.
+_ASSIGNMENT = re.compile(r'^(?P<name>[a-z_][a-z0-9_]*) ?= ?(?P<expression>.+)$')
+
+# an input starting with a binary operator continues from the last result.
+_CONTINUATION = re.compile(r'^ ?(\*\*|[*/^%])')
+
+# "ans" and "ans[-n]", relative references to results.
+_LAST_ANSWER = re.compile(r'\bans\b(?!\[)')
+_RELATIVE_ANSWER = re.compile(r'\bans\[ ?-(?P<back>\d+) ?\]')
 
 # global variables for evaluation purposes
-variables = {}
+variables = Worksheet(reserved)
+
+# significant digits of results, up to FLOAT_DIGITS
+# the evaluation runs on plain floats.
+DEFAULT_PRECISION = 6
+FLOAT_DIGITS = 15
+
+# integers longer than this are shown in a shortened form.
+HUGE_DIGITS = 4000
+LOG2_10 = math.log2(10)
+
+
+class Expression:
+
+    """
+    A parsed and compiled expression, calling it with a namespace
+    evaluates it without touching the source string again.
+    """
+
+    def __init__(self, string, literal=to_number):
+        self.string = string
+        self.literal = literal
+        self.tree = parse(string)
+        self.names = names(self.tree)
+        self.source = unparse(self.tree)
+        # the expression builds arrays of its own.
+        self.arrays = '[' in string or not self.names.isdisjoint(ranges)
+        self._function = compile_code(self.tree, literal)
+
+    def __call__(self, namespace):
+        return self._function(namespace)
+
+    def __reduce__(self):
+        # closures can't be pickled, the receiving side compiles
+        # the string again (or takes it from its cache).
+        return (_compile, (self.string, self.literal))
+
+
+@lru_cache(maxsize=512)
+def _compile(normalized, literal):
+    return Expression(normalized, literal)
+
+
+def compile_expression(string, literal=to_number):
 
+    """
+    return type: Expression
+    Returns the compiled expression for the string, expressions are
+    cached by their normalized form so re-submitted input is not parsed again.
+    literal converts number literals, Decimal for the precise engine.
+    """
+
+    return _compile(normalize(string), literal)
+
+
+def evaluate_precise(string, precision, values=None):
+
+    """
+    return type: Decimal
+    Evaluates the expression with Decimal arithmetic at the given number
+    of significant digits, the decimal context is local to the call.
+    """
 
-getcontext().prec = 6
+    literal, builtins, working = _engine(precision)
+    with localcontext() as ctx:
+        ctx.prec = working
+        expression = compile_expression(string, literal)
+        values = {} if values is None else values
+        value = expression(ChainMap(values, _builtins(expression, values, builtins)))
+        return _finish(value, precision)
+
+
+def _engine(precision):
+
+    # number literal type, namespaces (for numbers, for arrays)
+    # and working precision used to evaluate at the given precision.
+    if precision <= FLOAT_DIGITS:
+        return to_number, (namespace, array_namespace), precision
+    working = precision + decimal_keywords.GUARD
+    return Decimal, _precise_namespaces(working), working
+
+
+class _Formulas:
+
+    """
+    The formulas of the worksheet variables compiled in floats, the
+    arithmetic of d(), which evaluates those depending on its variable.
+    """
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def __contains__(self, name):
+        return name in self.worksheet.formulas
+
+    def __getitem__(self, name):
+        return _compile(self.worksheet.formulas[name].string, to_number)
+
+
+class _Answers:
+
+    """
+    Namespace of "ans" and "ans[n]", results computed by another
+    engine are converted to the number type of this one.
+    """
+
+    def __init__(self, worksheet, literal):
+        self.worksheet = worksheet
+        self.literal = literal
+
+    def __getitem__(self, key):
+        if key == 'ans':
+            return self.read(-1)
+        if key == ANSWERS:
+            return self.read
+        raise KeyError(key)
+
+    def read(self, number=-1):
+        value = self.worksheet.answer(number)
+        if self.literal is Decimal:
+            if isinstance(value, float):
+                return Decimal(repr(value))
+            if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+                return np.frompyfunc(lambda item: Decimal(repr(float(item))), 1, 1)(value)
+        else:
+            if isinstance(value, Decimal):
+                return float(value)
+            if isinstance(value, np.ndarray) and value.dtype == object:
+                try:
+                    return value.astype(float)
+                except (TypeError, ValueError, OverflowError):
+                    return value
+        return value
+
+
+def pin_answers(string, answered):
+
+    """
+    return type: string
+    The expression with "ans" and "ans[-n]" replaced by the numbers of
+    the results they refer to now, so a variable keeps reading the same
+    result when it is recomputed later.
+    """
+
+    if not answered:
+        return string
+    string = _RELATIVE_ANSWER.sub(lambda match: f'ans[{answered + 1 - int(match.group("back"))}]',
+                                  string)
+    return _LAST_ANSWER.sub(f'ans[{answered}]', string)
+
+
+def _builtins(expression, values, builtins):
+
+    # functions broadcast over arrays only in expressions that may meet
+    # one, the others call the plain functions without the type checks.
+    if expression.arrays or any(isinstance(values.get(name), np.ndarray)
+                                for name in expression.names):
+        return builtins[1]
+    return builtins[0]
+
+
+@lru_cache(maxsize=32)
+def _precise_namespaces(working):
+    # arrays of Decimals are object arrays, functions are mapped over
+    # them element by element and reductions work through the Decimal
+    # operators, ranges are Decimal arrays as well and pack functions
+    # have Decimal implementations. The binary operators are bound under
+    # their symbols, see precision.operators.
+    names = _Namespace(decimal_keywords.namespace(working, functions + constants + ranges),
+                       _scalar, precise=True)
+    names.update({name: vector_namespace[name] for name in reductions})
+    names.update(decimal_keywords.operators)
+    arrays = _Namespace({name: _broadcasting(value, _elementwise(value))
+                         if callable(value) and name in functions else value
+                         for name, value in names.items()}, _precise_array, precise=True)
+    return names, arrays
+
+
+def _precise_array(scalar, vector):
+    return _broadcasting(scalar, _elementwise(scalar)) if callable(scalar) else scalar
+
+
+def _elementwise(function):
+    return lambda *args: np.frompyfunc(function, len(args), 1)(*args)
+
+
+def _finish(value, precision):
+
+    # rounds a raw value of the engine to the precision,
+    # arrays are kept whole and NumPy scalars become numbers.
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            # Decimals (or huge ints), rounded one by one.
+            return np.frompyfunc(lambda item: _finish(item, precision), 1, 1)(value)
+        return value
+    if isinstance(value, np.generic):
+        value = value.item()
+    if precision <= FLOAT_DIGITS or isinstance(value, int):
+        # integers are exact in both engines, like those of pack functions.
+        return round_result(value, precision)
+    if isinstance(value, float):
+        # a float met in the precise engine, the value of a pack function
+        # without a Decimal implementation, is good to about FLOAT_DIGITS
+        # digits, the rest of its repr is noise.
+        value = Context(prec=min(precision, FLOAT_DIGITS)).create_decimal(repr(value))
+    with localcontext() as ctx:
+        ctx.prec = precision
+        return _tidy(+value, precision)
+
+
+def round_result(value, precision):
+
+    """
+    return type: Decimal or int
+    Rounds a float result to the given number of significant digits,
+    integers are exact and returned as they are.
+    """
+
+    if isinstance(value, int):
+        return value
+    return _tidy(Context(prec=precision).create_decimal(repr(value)), precision)
+
+
+def _tidy(value, precision):
+    # 100.000 -> 100 and 0.300000 -> 0.3, without switching to exponents.
+    if value.is_finite() and value == value.to_integral_value() and value.adjusted() < precision:
+        return value.quantize(Decimal(1))
+    return value.normalize()
 
 
 def to_expr(_string):
 
     """
     return type: string
-    This function is used to make any string, 
-    as eval()-friendly as possible.
-    """
-
-    string = ''
-    for key in _string:
-        if key.isupper():
-            key = key.lower()
-        string = string + key
-
-
-    # making the string more operation-friendly.
-    string = (
-                string
-                .replace(" ", "", -1)
-                .replace("++", "+", -1)
-                .replace("--", "-", -1)
-             )
-
-    # necessary variables.
-    temp_string = ""
-    parantheses = []
-    operations = [0]
-    i = 0
-
-    # necessary changes if user is not python-friendly.
-    for index, s in enumerate(string):
-        if (index - 1) > -1:
-
-            previous = string[index - 1]
-            condition = (previous != "*" 
-                        and previous != "-" 
-                        and previous != "+" 
-                        and previous != "/" 
-                        and previous != "(")
-
-            if s == "(" and condition:
-                temp_string += "*" + s
-                    
-            elif s.isalpha() and condition and not previous.isalpha() and previous != "(":
-                temp_string += "*" + s
-
-            else:
-                temp_string += s
-        else:
-            temp_string += s
-
-    string = temp_string
-    temp_string = ""
-
-    for f in functions:
-        target = string.find(f)
-        if target != -1:
-            string = string.replace(f+"*", f, -1)
-    
-    
-    ###########################################################################################
-    # loop through string and convert it to temp_string.
-    for index, s in enumerate(string):
-
-        # keeping index up to date with additional symbols.
-        index += i
-
-        # when the current position is "!".
-        if s == '!': 
-
-            # when the previous character was ")".
-            if temp_string[index - 1] == ")" and parantheses:
-                temp_string = (temp_string[:parantheses[-1]] 
-                            + "!" 
-                            + temp_string[parantheses[-1]:] 
-                            + ")")
-                i += 1 # added ")"
-
-            # when there were no prior operations.
-            elif not operations[-1] and string.find("(") == -1: ### PROBLEM WITH CORRECT FACTORIAL ORDER FOR FIRST CHARACTERS AFTER THE "(".
-                temp_string = ("!" 
-                            + temp_string 
-                            + ")")
-                i += 1 # added ")"
-                ### PROBLEM WITH CORRECT FACTORIAL ORDER FOR FIRST CHARACTERS AFTER THE "(".
-
-            # when there was nothing before it then ignore it.
-            elif not temp_string or operations[-1] == index-1: 
-                i -= 1 # removed "!"
-                temp_string = temp_string[:operations[-1]]
-                i -= 1
-
-            # if none of the above.
-            else:
-                temp_string = (temp_string[:operations[-1] + 1] 
-                            + "!" 
-                            + temp_string[operations[-1] + 1:] 
-                            + ")")
-                i += 1 # added ")"
-
-        else: # else
-
-            # add s to temp_string
-            temp_string += s
-
-            # operation append conditions
-            condition = (
-                            s == '+'\
-                            or s == '-'\
-                            or s == '*'\
-                            or s == '/'\
-                            or s == '%'\
-                            or s == '^'\
-                        )
-
-            # when s is "(" then append the index to the parantheses list.
-            if s == "(": 
-                parantheses.append(index)
-
-            # when s is ")" and next element is not "!" then remove it from the list.
-            elif s == ")": 
-                try: 
-                    if string[index - i + 1] != "!":
-                        parantheses.pop()
-                except:
-                    parantheses.pop()
-
-            # when s is not a diggit or a special character.
-            elif condition:
-                operations.append(index)
-        
-
-    # the end of iteration.
-    ###########################################################################################
-
-    # necessary replacements.
-    temp_string = (
-                    temp_string
-                    .replace("!", "factorial(", -1)
-                    .replace("^", "**", -1)
-                    .replace("sqrt", "root", -1)
-                  )
-
-    # returning converted string.
-    return temp_string
-
-
-
-def evaluate(string):
-
-    # make the expression evaluation-friendly.
-    string = to_expr(string)
-
-    # trying to evaluate the expression.
+    Returns the normalized, fully parenthesized form of the expression.
+    """
+
+    return compile_expression(_string).source
+
+
+def evaluate_sweep(string, **arrays):
+
+    """
+    return type: numpy.ndarray
+    Evaluates the expression once over whole arrays, keyword
+    arguments bind names to the arrays, e.g. x=np.linspace(0, 10, 10**6).
+    """
+
+    expression = compile_expression(string)
+    arrays = {name: np.asarray(values) for name, values in arrays.items()}
+    return np.asarray(expression(ChainMap(arrays, vector_namespace)))
+
+
+def split_sweep(string):
+
+    """
+    return type: tuple or None
+    Splits "<expression> for <name> = <values>" into its three
+    parts, returns None when the string is not a sweep.
+    """
+
+    match = _SWEEP.match(normalize(string))
+    if match is None:
+        return None
+    return match.group('expression', 'name', 'values')
+
+
+def split_assignment(string):
+
+    """
+    return type: tuple or None
+    Splits "<name> = <expression>" into the name and the expression,
+    returns None when the string is not an assignment.
+    """
+
+    match = _ASSIGNMENT.match(normalize(string))
+    if match is None:
+        return None
+    return match.group('name', 'expression')
+
+
+def is_huge(value):
+    """Tells if value is an integer too long to be written out in full."""
+
+    return isinstance(value, int) and value.bit_length() > HUGE_DIGITS * LOG2_10
+
+
+def format_result(value):
+
+    """
+    return type: string
+    Text of a result as shown in the history, huge integers
+    are shortened to their leading digits and digit count.
+    """
+
+    if isinstance(value, np.ndarray):
+        return format_array(value)
+    if is_huge(value):
+        # leading digits from the top 64 bits, without a full conversion,
+        # the digits (bigint.to_string) are only produced when asked for.
+        digits = digit_count(value)
+        shift = abs(value).bit_length() - 64
+        exponent = math.log10(abs(value) >> shift) + shift * math.log10(2)
+        mantissa = min(max(10 ** (exponent - digits + 1), 1), 9.999999)
+        mantissa = math.floor(mantissa * 10**6) / 10**6
+        sign = '-' if value < 0 else ''
+        return f'{sign}{mantissa:.6f}e{digits - 1} ({digits} digits)'
+    return f'{value}'
+
+
+def format_array(array):
+
+    """
+    return type: string
+    Compact form of an array result, only the first and last values are shown.
+    """
+
+    values = np.array2string(array, precision=6, threshold=6, edgeitems=3,
+                             separator=', ', max_line_width=10**9,
+                             formatter={'object': format_result})
+    # rows of a matrix go on one line.
+    values = re.sub(r'\n\s*', ' ', values)
+    return f'{values} ({array.size} values)'
+
+
+def evaluate(string, precision=DEFAULT_PRECISION, worksheet=None):
+
+    """
+    return type: tuple (result, source) or (None, error message)
+    Evaluates an expression, a sweep or an assignment, variables are
+    read from and assigned to the worksheet, the module one by default.
+    """
+
+    worksheet = variables if worksheet is None else worksheet
+    string = normalize(string)
+    if worksheet.answered and _CONTINUATION.match(string):
+        string = f'ans{string}'
+
+    # trying to evaluate the expression, the exact value of a result
+    # is kept in the worksheet for ans once it could be shown, a value
+    # _finish rejects (like the complex sqrt(-1)) is not an answer.
 
     try:
-        return (Decimal(round(eval(string), 6)), string)
+        sweep = split_sweep(string)
+        if sweep is not None:
+            body, name, values = sweep
+            floats = _Answers(worksheet, to_number)
+            values = compile_expression(values)(ChainMap(worksheet.values, floats, vector_namespace))
+            arrays = ChainMap({name: np.asarray(values)}, worksheet.values, floats, vector_namespace)
+            expression = compile_expression(body)
+            value = np.asarray(expression(arrays))
+            result = _finish(value, precision)
+            worksheet.remember(value)
+            return (result, expression.source)
+
+        literal, builtins, working = _engine(precision)
+        results = _Answers(worksheet, literal)
+        formulas = {FORMULAS: _Formulas(worksheet)}
+
+        def run(expression, values):
+            # variables defined under another engine are compiled again.
+            if expression.literal is not literal:
+                expression = compile_expression(expression.string, literal)
+            names = _builtins(expression, values, builtins)
+            if 'd' in expression.names:
+                names = ChainMap(names, formulas)
+            if 'ans' in expression.names:
+                return expression(ChainMap(values, results, names))
+            return expression(ChainMap(values, names))
+
+        with localcontext() as ctx:
+            ctx.prec = working
+            worksheet.sync((literal, working), run)
+
+            assignment = split_assignment(string)
+            if assignment is not None:
+                name, body = assignment
+                expression = compile_expression(pin_answers(body, worksheet.answered), literal)
+                value = worksheet.assign(name, expression, run)
+                result = _finish(value, precision)
+                worksheet.remember(value)
+                return (result, f'{name} = {expression.source}')
+
+            expression = compile_expression(string, literal)
+            value = run(expression, worksheet.values)
+            result = _finish(value, precision)
+            worksheet.remember(value)
+            return (result, expression.source)
+    except (InvalidAssignment, UnknownAnswer, NotDifferentiable) as e:
+        return (None, str(e))
     except NameError as e:
         return (None, "Invalid Function")
     except ZeroDivisionError:
         return (None, "Division by zero is not allowed.")
+    except (OverflowError, Overflow):
+        return (None, "Overflow")
+    except (ValueError, InvalidOperation):
+        # sqrt(-1) in Decimal, factorial(-1), log of a negative number.
+        return (None, "Math domain error")
+    except RecursionError:
+        return (None, "Expression is nested too deeply.")
+    except MemoryError:
+        return (None, "Out of memory.")
     except:
-        return (None, "Invalid Syntax")
\ No newline at end of file
+        return (None, "Invalid Syntax")
@@ -0,0 +1,109 @@
+"""
+Incremental lexer for highlighting the calculator input.
+
+The lexer keeps the tokens of the last text it saw. On an edit it
+re-tokenizes from the token touching the first changed character and
+stops as soon as a token lines up with an old one behind the change,
+so only the changed span has to be restyled, however long the text is.
+"""
+
+import numpy as np
+
+from .parser import Token, tokenize
+
+
+# characters the number pattern reads past the end of a shorter match,
+# "1e+" lexes as "1" until a digit turns it into "1e+5".
+LOOKAHEAD = 2
+
+
+class Lexer:
+
+    def __init__(self):
+        self.reset()
+
+    @property
+    def tokens(self):
+        return [Token(kind, text, int(pos))
+                for kind, text, pos in zip(self._kinds, self._texts, self._starts)]
+
+    def update(self, text):
+
+        """
+        return type: tuple
+        (start, end, tokens) where text[start:end] is the span whose
+        tokens changed and tokens are the tokens lying in it.
+        """
+
+        old, kinds, texts, starts = self.text, self._kinds, self._texts, self._starts
+        count = len(kinds)
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        delta = len(text) - len(old)
+        changed = len(text) - suffix
+
+        # a token ending close enough to the change can grow into it,
+        # like "2" followed by a new "e5", so rescanning starts at its start.
+        first = int(np.searchsorted(self._ends, prefix - LOOKAHEAD))
+        start = min(prefix, int(starts[first])) if first < count else prefix
+
+        scanned = []
+        index = first
+        resync = count
+        for token in tokenize(text, start):
+            if token.pos >= changed:
+                index += int(np.searchsorted(starts[index:], token.pos - delta))
+                if (index < count and starts[index] + delta == token.pos
+                        and kinds[index] == token.kind and texts[index] == token.text):
+                    # scanning is stateless between tokens, the rest
+                    # of the text tokenizes as it did before.
+                    resync = index
+                    break
+            scanned.append(token)
+
+        end = int(starts[resync]) + delta if resync < count else len(text)
+
+        # positions behind the change shift in one vectorized step.
+        positions = np.fromiter((t.pos for t in scanned), dtype=np.int64, count=len(scanned))
+        lengths = np.fromiter((len(t.text) for t in scanned), dtype=np.int64, count=len(scanned))
+        self.text = text
+        self._kinds = kinds[:first] + [t.kind for t in scanned] + kinds[resync:]
+        self._texts = texts[:first] + [t.text for t in scanned] + texts[resync:]
+        self._starts = np.concatenate((starts[:first], positions, starts[resync:] + delta))
+        self._ends = np.concatenate((self._ends[:first], positions + lengths,
+                                     self._ends[resync:] + delta))
+        return start, max(end, start), scanned
+
+    def reset(self):
+        self.text = ''
+        self._kinds = []
+        self._texts = []
+        # start and end offsets of the tokens.
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._ends = np.zeros(0, dtype=np.int64)
+
+
+def _common_prefix(a, b):
+    """Length of the common prefix, found by halving in C-level compares."""
+
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix(a, b, limit):
+    """Length of the common suffix, at most limit characters."""
+
+    low, high = 0, max(limit, 0)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
@@ -0,0 +1,242 @@
+"""
+Calculator history kept in a bounded ring buffer, and persisted.
+
+The buffer holds at most `capacity` entries, older entries are dropped
+or, if a spill file is given, appended to it as JSON lines before they
+are dropped. Indexing is O(1) anywhere in the buffer, so a view can
+ask for just the rows it draws.
+
+The store keeps every entry in a SQLite database, with a full-text
+index of trigrams over inputs and results, so a search for any part of
+an expression is an index lookup rather than a scan of the whole history.
+Entries are written by a background thread in batches, appending
+never waits on the disk.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+
+DEFAULT_CAPACITY = 100000
+
+# most entries written in one transaction and most matches of a search.
+BATCH = 1000
+SEARCH_LIMIT = 500
+
+# number is the result number, read back as ans[number].
+Entry = namedtuple('Entry', 'input result timestamp error number', defaults=(False, None))
+
+
+def make_entry(input, result, error=False, number=None):
+    """Returns an entry stamped with the current time."""
+
+    return Entry(input, result, time.time(), error, number)
+
+
+class HistoryBuffer:
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, spill=None):
+        self.capacity = capacity
+        self.spill = spill
+        self._entries = [None] * capacity
+        self._start = 0
+        self._length = 0
+        self._spillFile = None
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('history index out of range')
+        return self._entries[(self._start + index) % self.capacity]
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
+
+    def append(self, entry):
+        end = (self._start + self._length) % self.capacity
+        if self._length == self.capacity:
+            self._spill(self._entries[end])
+            self._start = (self._start + 1) % self.capacity
+        else:
+            self._length += 1
+        self._entries[end] = entry
+
+    def search(self, text, limit=SEARCH_LIMIT):
+
+        """
+        return type: list
+        The latest entries containing text in their input or result,
+        oldest first, found by a scan of the buffer.
+        """
+
+        text = text.casefold()
+        found = []
+        for index in range(self._length - 1, -1, -1):
+            entry = self[index]
+            if text in entry.input.casefold() or text in entry.result.casefold():
+                found.append(entry)
+                if len(found) == limit:
+                    break
+        return found[::-1]
+
+    def clear(self):
+        self._entries = [None] * self.capacity
+        self._start = self._length = 0
+
+    def close(self):
+        if self._spillFile is not None:
+            self._spillFile.close()
+            self._spillFile = None
+
+    def _spill(self, entry):
+        if not self.spill:
+            return
+        if self._spillFile is None:
+            self._spillFile = open(self.spill, 'a', encoding='utf-8')
+        self._spillFile.write(json.dumps(entry._asdict()) + '\n')
+
+
+class HistoryStore:
+
+    """
+    History database at path. Entries appended are queued for the
+    writer thread, reads go through a connection of their own, which
+    WAL journaling lets run alongside the writes.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # result numbers of other sessions don't resolve with ans[n].
+        self.session = time.time_ns()
+        self._connection = _connect(self.path)
+        self._fts = _create(self._connection)
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+
+    def append(self, entry):
+        self._queue.put(entry)
+
+    def latest(self, count):
+
+        """
+        return type: list
+        The last count entries, oldest first.
+        """
+
+        rows = self._connection.execute(
+            f'SELECT {_COLUMNS} FROM history ORDER BY id DESC LIMIT ?', (count,))
+        return [self._entry(row) for row in rows][::-1]
+
+    def search(self, text, limit=SEARCH_LIMIT):
+
+        """
+        return type: list
+        The latest entries containing text in their input or result,
+        oldest first. Entries still queued for writing are not found.
+        """
+
+        if not text:
+            return self.latest(limit)
+        if self._fts and len(text) >= 3:
+            # the whole text is one phrase of trigrams, a substring match.
+            phrase = '"' + text.replace('"', '""') + '"'
+            rows = self._connection.execute(
+                f'SELECT {_COLUMNS} FROM history WHERE id IN '
+                '(SELECT rowid FROM history_fts WHERE history_fts MATCH ? '
+                'ORDER BY rowid DESC LIMIT ?) ORDER BY id DESC', (phrase, limit))
+        else:
+            # too short for a trigram, the newest entries are scanned
+            # until enough of them match.
+            pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            rows = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM history WHERE input LIKE ?1 ESCAPE '\\' "
+                f"OR result LIKE ?1 ESCAPE '\\' ORDER BY id DESC LIMIT ?2", (pattern, limit))
+        return [self._entry(row) for row in rows][::-1]
+
+    def flush(self):
+        """Waits until the queued entries are written."""
+
+        self._queue.join()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._connection.close()
+
+    def _entry(self, row):
+        input, result, timestamp, error, number, session = row
+        return Entry(input, result, timestamp, bool(error),
+                     number if session == self.session else None)
+
+    def _write(self):
+        connection = _connect(self.path)
+        running = True
+        while running:
+            # whatever queued up while the last batch was written
+            # goes in the next transaction.
+            entries = [self._queue.get()]
+            while len(entries) < BATCH:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            running = None not in entries
+            rows = [(e.input, e.result, e.timestamp, e.error, e.number, self.session)
+                    for e in entries if e is not None]
+            try:
+                with connection:
+                    connection.executemany(
+                        'INSERT INTO history (input, result, timestamp, error, number, session) '
+                        'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            except sqlite3.Error:
+                # a locked or full disk loses the batch, not the session.
+                pass
+            for _ in entries:
+                self._queue.task_done()
+        connection.close()
+
+
+_COLUMNS = 'input, result, timestamp, error, number, session'
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=10)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def _create(connection):
+    # returns whether the full-text index is there, SQLite built
+    # without FTS5 or its trigram tokenizer (3.34) searches by scanning.
+    with connection:
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS history (id INTEGER PRIMARY KEY, input TEXT, '
+            'result TEXT, timestamp REAL, error INTEGER, number INTEGER, session INTEGER)')
+    try:
+        with connection:
+            connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(input, result, "
+                "content='history', content_rowid='id', tokenize='trigram')")
+            connection.execute(
+                'CREATE TRIGGER IF NOT EXISTS history_index AFTER INSERT ON history BEGIN '
+                'INSERT INTO history_fts (rowid, input, result) '
+                'VALUES (new.id, new.input, new.result); END')
+    except sqlite3.OperationalError:
+        return False
+    return True
@@ -0,0 +1,286 @@
+"""
+Compiles a syntax tree to the code of a single Python function.
+
+The tree is walked once, children first. Operators on numbers are
+folded to constants on the way and every other distinct subtree
+becomes one local variable of the generated function, so a
+repeated subexpression like the two "sin(x)" in "sin(x)^2 + sin(x)" is
+computed once. Run over NumPy arrays, the function is a fused kernel of
+array operations without the per-node calls of a tree of closures.
+
+Code objects are cached by the generated source, constants are bound
+as globals of the function, so "2*x" and "3*x" share one code object.
+"""
+
+import math
+from decimal import Context, Decimal
+from functools import lru_cache
+
+import numpy as np
+
+from . import autodiff
+from .compiler import BINARY, UNARY, ANSWERS, FORMULAS, to_array, element, is_answer
+from .parser import Number, Name, UnaryOp, BinOp, Call, Array, Index, to_number
+
+
+OPERATORS = {'+': '+', '-': '-', '*': '*', '/': '/', '%': '%', '^': '**'}
+
+# integer constants are folded while they stay below this many bits,
+# larger ones (like 9^9^9) are left for the evaluation and its budgets.
+FOLD_BITS = 4096
+
+
+def compile_code(tree, literal=to_number):
+
+    """
+    return type: function(namespace)
+    Compiles the tree to a generated function, number literals are
+    converted once by the literal function.
+    """
+
+    # folding in Decimal would bake the precision of the moment
+    # into an expression that is cached for every precision.
+    folding = literal is to_number
+
+    # loads of names from the namespace, and the other statements.
+    loads = []
+    lines = []
+    scope = {'callable': callable, '_constant_call': _constant_call, '_to_array': to_array,
+             '_element': element}
+    # structural key -> local or constant holding its value, for CSE.
+    keys = {}
+    # id of a node -> local or constant holding its value.
+    refs = {}
+    # constant -> its value, the operands folding can use.
+    constants = {}
+
+    def constant(value):
+        ref = f'_k{len(scope)}'
+        scope[ref] = constants[ref] = value
+        return ref
+
+    for node in _postorder(tree):
+        kind = type(node)
+        if kind is Number:
+            key = ('number', node.text)
+            if key not in keys:
+                keys[key] = constant(literal(node.text))
+            refs[id(node)] = keys[key]
+            continue
+
+        if kind is BinOp:
+            left, right = refs[id(node.left)], refs[id(node.right)]
+            if folding and left in constants and right in constants:
+                value = _apply(node.op, constants[left], constants[right])
+                if value is not None:
+                    refs[id(node)] = constant(value)
+                    continue
+            key = (node.op, left, right)
+        elif kind is UnaryOp:
+            operand = refs[id(node.operand)]
+            if folding and operand in constants:
+                refs[id(node)] = constant(UNARY[node.op](constants[operand]))
+                continue
+            key = (node.op, operand)
+        elif kind is Name:
+            refs[id(node)] = _load(node.id, keys, loads)
+            continue
+        elif kind is Call and node.name == 'd':
+            # the derivative is a function of its own, it evaluates
+            # its body in dual numbers with a namespace of its own.
+            key = ('d', id(node))
+        elif kind is Call:
+            key = ('call', node.name) + tuple(refs[id(arg)] for arg in node.args)
+        elif kind is Array:
+            items = [refs[id(item)] for item in node.items]
+            if folding and all(ref in constants for ref in items):
+                # pasted data is built once, not on every evaluation.
+                refs[id(node)] = constant(to_array([constants[ref] for ref in items]))
+                continue
+            key = ('array',) + tuple(items)
+        elif kind is Index and is_answer(node):
+            key = ('answer', refs[id(node.index)])
+        elif kind is Index:
+            key = ('index', refs[id(node.value)], refs[id(node.index)])
+        else:
+            raise TypeError(f'unknown node {node!r}')
+
+        if key not in keys:
+            statement = _statement(node, refs, scope, keys, loads, literal)
+            keys[key] = f't{len(lines)}'
+            lines.append(f'{keys[key]} = {statement}')
+        refs[id(node)] = keys[key]
+
+    source = _SOURCE.format(loads=''.join(f'        {line}\n' for line in loads) or '        pass\n',
+                            body=''.join(f'    {line}\n' for line in lines),
+                            result=refs[id(tree)])
+    exec(_code(source), scope)
+    return scope['_expression']
+
+
+# the names are all loaded first, there is no short-circuit in the
+# language, so a KeyError raised by a function called later is not
+# taken for a missing name.
+_SOURCE = '''\
+def _expression(ns):
+    try:
+{loads}    except KeyError as error:
+        raise NameError(f'name {{error.args[0]!r}} is not defined') from None
+{body}    return {result}
+'''
+
+
+@lru_cache(maxsize=512)
+def _code(source):
+    return compile(source, '<expression>', 'exec')
+
+
+def _load(name, keys, loads):
+    # local holding the value of name, loaded once.
+    key = ('name', name)
+    if key not in keys:
+        keys[key] = f'n{len(loads)}'
+        loads.append(f'{keys[key]} = ns[{name!r}]')
+    return keys[key]
+
+
+def _statement(node, refs, scope, keys, loads, literal):
+
+    # right hand side of the assignment computing node.
+    if isinstance(node, UnaryOp):
+        return f'{node.op}{refs[id(node.operand)]}'
+    if isinstance(node, BinOp) and literal is not to_number:
+        # the precise engine binds its operators under their symbols.
+        return f'{_load(node.op, keys, loads)}({refs[id(node.left)]}, {refs[id(node.right)]})'
+    if isinstance(node, BinOp):
+        return f'{refs[id(node.left)]} {OPERATORS[node.op]} {refs[id(node.right)]}'
+    if isinstance(node, Array):
+        items = ', '.join(refs[id(item)] for item in node.items)
+        return f'_to_array([{items}])'
+    if isinstance(node, Index) and is_answer(node):
+        return f'{_load(ANSWERS, keys, loads)}({refs[id(node.index)]})'
+    if isinstance(node, Index):
+        return f'_element({refs[id(node.value)]}, {refs[id(node.index)]})'
+    if node.name == 'd':
+        ref = f'_d{len(scope)}'
+        scope[ref] = _compile_derivative(node.args, literal)
+        return f'{ref}(ns)'
+
+    # the function is loaded like any name, and shared with its other uses.
+    function = _load(node.name, keys, loads)
+    args = ', '.join(refs[id(arg)] for arg in node.args)
+    return (f'{function}({args}) if callable({function}) '
+            f'else _constant_call({function}, {node.name!r}, ({args}{"," if args else ""}))')
+
+
+def _compile_derivative(args, literal):
+
+    # d(expression, name) at the current value of name, or
+    # d(expression, name, point), differentiated in float arithmetic.
+    if len(args) not in (2, 3) or not isinstance(args[1], Name):
+        raise SyntaxError('d() takes an expression, a name and optionally a point')
+    function = compile_code(args[0])
+    name = args[1].id
+    at = compile_code(args[-1], literal)
+
+    def derivative(namespace):
+        point = at(namespace)
+        try:
+            formulas = namespace[FORMULAS]
+        except KeyError:
+            formulas = None
+        precise = isinstance(point, Decimal) or isinstance(point, np.ndarray) and point.dtype == object
+        if precise:
+            point = float(point) if isinstance(point, Decimal) else point.astype(float)
+            namespace = _Floats(namespace)
+        result = autodiff.derivative(function, name, point, namespace, formulas)
+        if isinstance(result, autodiff.Dual):
+            return result
+        if precise:
+            # a float is good to DIGITS digits, not to the precision.
+            return _to_decimal(result)
+        if np.ndim(result) == 0:
+            return float(result)
+        return result
+
+    return derivative
+
+
+# float -> Decimal of its digits, element by element for arrays.
+_to_decimal = np.frompyfunc(lambda value: _DIGITS.create_decimal(repr(float(value))), 1, 1)
+_DIGITS = Context(prec=autodiff.DIGITS)
+
+
+class _Floats:
+
+    # the namespace of the precise engine as the body of d() sees it,
+    # the body runs in floats and Decimal values are read as floats.
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def __getitem__(self, name):
+        value = self.namespace[name]
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, np.ndarray) and value.dtype == object:
+            try:
+                return value.astype(float)
+            except (TypeError, ValueError):
+                pass
+        return value
+
+
+def _constant_call(value, name, args):
+    # a constant followed by parentheses, like "pi(2)".
+    if len(args) != 1:
+        raise SyntaxError(f'{name!r} is not a function')
+    return value * args[0]
+
+
+###########################################################################################
+# tree walks.
+
+def _postorder(tree):
+    """Yields the nodes children first, in a loop, so deep trees don't recurse."""
+
+    stack = [tree]
+    expanded = set()
+    while stack:
+        node = stack[-1]
+        kind = type(node)
+        if kind is BinOp:
+            children = (node.right, node.left)
+        elif kind is UnaryOp:
+            children = (node.operand,)
+        elif kind is Call and node.name != 'd' and node.args:
+            children = node.args[::-1]
+        elif kind is Array and node.items:
+            children = node.items[::-1]
+        elif kind is Index and is_answer(node):
+            children = (node.index,)
+        elif kind is Index:
+            children = (node.index, node.value)
+        else:
+            yield stack.pop()
+            continue
+        if id(node) in expanded:
+            yield stack.pop()
+        else:
+            expanded.add(id(node))
+            stack.extend(children)
+
+
+def _apply(op, left, right):
+    # the value of a folded operator, None when it is left alone.
+    if op == '^' and isinstance(left, int) and isinstance(right, int):
+        if abs(right) * max(left.bit_length(), 1) > FOLD_BITS:
+            return None
+    try:
+        value = BINARY[op](left, right)
+    except (ArithmeticError, ValueError):
+        return None
+    if isinstance(value, int):
+        return value if value.bit_length() <= FOLD_BITS else None
+    if isinstance(value, float) and math.isfinite(value):
+        return value
+    return None
@@ -11,20 +11,151 @@ tan = math.tan
 pi = math.pi
 e = math.e
 
+# factorials below this bound are read from a memoized table.
+SMALL_FACTORIALS = 256
+_factorials = [1]
+for _n in range(1, SMALL_FACTORIALS):
+    _factorials.append(_factorials[-1] * _n)
+
+# gamma of integers below this bound is the exact factorial, other
+# arguments, floats included, go to math.gamma, which overflows at 172.
+EXACT_GAMMA = 10**5
+
+# primes found so far, extended on demand by _primes.
+_sieve = bytearray()
+_prime_list = []
+
+
+def _primes(n):
+    """Returns the list of primes up to n, sieved once and reused."""
+
+    global _sieve, _prime_list
+    if n >= len(_sieve):
+        size = max(n + 1, 2 * len(_sieve))
+        sieve = bytearray([1]) * size
+        sieve[0:2] = b'\x00\x00'
+        for p in range(2, math.isqrt(size - 1) + 1):
+            if sieve[p]:
+                sieve[p*p::p] = bytes(len(range(p*p, size, p)))
+        _sieve = sieve
+        _prime_list = [p for p in range(size) if sieve[p]]
+    return _prime_list[:_bisect_right(_prime_list, n)]
+
+
+def _bisect_right(values, x):
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if x < values[mid]:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def _product(values, lo=0, hi=None):
+    """Product of values[lo:hi], split in halves so the operands stay balanced."""
+
+    if hi is None:
+        hi = len(values)
+    if hi - lo <= 16:
+        result = 1
+        for index in range(lo, hi):
+            result *= values[index]
+        return result
+    mid = (lo + hi) // 2
+    return _product(values, lo, mid) * _product(values, mid, hi)
+
+
+def _legendre(n, p):
+    """Exponent of the prime p in n!."""
+
+    exponent = 0
+    while n:
+        n //= p
+        exponent += n
+    return exponent
+
+
+def _from_exponents(factors):
+    """
+    Multiplies out (prime, exponent) pairs, going over the exponent bits
+    from the highest one and squaring in between, so most of the work
+    is done by a few big squarings instead of many small products.
+    Powers of two are applied as a single shift at the end.
+    """
+
+    shift = 0
+    odd = []
+    for p, k in factors:
+        if p == 2:
+            shift = k
+        elif k:
+            odd.append((p, k))
+    result = 1
+    if odd:
+        for bit in reversed(range(max(k for p, k in odd).bit_length())):
+            result *= result
+            result *= _product([p for p, k in odd if k >> bit & 1])
+    return result << shift
+
+
+def _integer(n, name):
+    if isinstance(n, float):
+        if not n.is_integer():
+            raise ValueError(f'{name}() only accepts integral values')
+        n = int(n)
+    if n < 0:
+        raise ValueError(f'{name}() not defined for negative values')
+    return n
+
+
 # factorial function:
 def factorial(n):
-    if n <= 1:
-    	return n
-    previous = 0
-    current = 1
-    for _ in range(n - 1):
-    	previous, current = current, current + previous
-    return current
+    if isinstance(n, float) and not n.is_integer():
+        return gamma(n + 1)
+    n = _integer(n, 'factorial')
+    if n < SMALL_FACTORIALS:
+        return _factorials[n]
+    return _from_exponents((p, _legendre(n, p)) for p in _primes(n))
+
+# gamma function, factorial of non-integers:
+def gamma(x):
+    if isinstance(x, int) and 0 < x < EXACT_GAMMA:
+        return factorial(x - 1)
+    return math.gamma(x)
+
+# combinations, n choose k:
+def ncr(n, k):
+    n, k = _integer(n, 'ncr'), _integer(k, 'ncr')
+    if k > n:
+        return 0
+    k = min(k, n - k)
+    if n < SMALL_FACTORIALS:
+        return _factorials[n] // (_factorials[k] * _factorials[n - k])
+    return _from_exponents((p, _legendre(n, p) - _legendre(k, p) - _legendre(n - k, p))
+                           for p in _primes(n))
+
+binomial = ncr
+
+# permutations, ordered selections of k out of n:
+def npr(n, k):
+    n, k = _integer(n, 'npr'), _integer(k, 'npr')
+    if k > n:
+        return 0
+    if k < SMALL_FACTORIALS:
+        return _product(range(n - k + 1, n + 1))
+    return _from_exponents((p, _legendre(n, p) - _legendre(n - k, p))
+                           for p in _primes(n))
 
 # root function:
 def root(x, degree=2):
+    if x < 0 and degree % 2 == 1:
+        return -(-x)**(1/degree)
     return x**(1/degree)
 
+sqrt = root
+
 # to radians:
 def rad(deg):
     return deg*pi/180
@@ -18,7 +18,7 @@ class Widget(WidgetBaseClass):
         self.InitWidget(_conf, __name__)
 
         # Adding the Panel
-        self.AddPanel(Panel(self, _conf))
+        self.AddPanel(Panel(self, _conf, self.widgetConf))
         
         # fixing the layout
         self.Layout()
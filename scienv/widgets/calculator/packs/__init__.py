@@ -0,0 +1,77 @@
+"""
+Function packs, families of functions loaded when they are first used.
+
+Every pack declares the names it defines below, so they are reserved
+and completed from the start, but its module is only imported when an
+expression first looks one of them up. A pack module defines
+
+    functions = {name: (scalar, vector)}
+    constants = {name: value}
+
+where scalar works on numbers and vector on whole NumPy arrays, it is
+used for sweeps and for arrays in expressions. A module may also define
+
+    precise = {name: function}
+
+Decimal implementations at the precision of the decimal context, used
+above 15 digits in place of scalar, whose floats would only be good
+to about 15 digits, and
+
+    derivatives = {name: (partial, ...)}
+
+vector functions of the same arguments giving the partial derivatives
+for each argument, None for one that is not differentiable, they let
+d() differentiate name.
+"""
+
+import importlib
+from collections import namedtuple
+
+
+Pack = namedtuple('Pack', 'module functions constants', defaults=((),))
+
+PACKS = (
+    Pack('special', ('erf', 'erfc', 'lgamma', 'beta')),
+    Pack('statistics', ('normpdf', 'normcdf', 'exppdf', 'expcdf', 'poissonpmf')),
+    Pack('numbers', ('gcd', 'lcm', 'isprime', 'nextprime')),
+)
+
+functions = tuple(name for pack in PACKS for name in pack.functions)
+constants = tuple(name for pack in PACKS for name in pack.constants)
+
+# name -> pack declaring it.
+_owners = {name: pack for pack in PACKS for name in pack.functions + pack.constants}
+
+
+def lookup(name, precise=False):
+
+    """
+    return type: tuple (scalar, vector) or None
+    The implementations of name, its pack is imported on the first
+    lookup. Both are the value for a constant, None if no pack
+    declares name. With precise, scalar is the Decimal implementation
+    when the pack has one.
+    """
+
+    pack = _owners.get(name)
+    if pack is None:
+        return None
+    module = importlib.import_module(f'.{pack.module}', __name__)
+    if name in pack.constants:
+        return module.constants[name], module.constants[name]
+    scalar, vector = module.functions[name]
+    if precise:
+        scalar = getattr(module, 'precise', {}).get(name, scalar)
+    return scalar, vector
+
+
+def derivatives(name):
+
+    """
+    return type: tuple
+    The partial derivatives of the function name, empty if its pack
+    declares none.
+    """
+
+    module = importlib.import_module(f'.{_owners[name].module}', __name__)
+    return getattr(module, 'derivatives', {}).get(name, ())
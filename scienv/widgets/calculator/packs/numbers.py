@@ -0,0 +1,99 @@
+"""
+Number theory: greatest common divisor, least common multiple and primes.
+"""
+
+import math
+import numpy as np
+
+
+# isprime of arrays up to this bound reads a sieve.
+SIEVE_LIMIT = 10**7
+
+# bases making Miller-Rabin exact below 3.3 * 10^24, larger
+# numbers get the same test, correct with overwhelming odds.
+_BASES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def _integer(x, name):
+    value = int(x)
+    if value != x:
+        raise ValueError(f'{name}() is defined for integers only')
+    return value
+
+
+def gcd(*args):
+    return math.gcd(*(_integer(x, 'gcd') for x in args))
+
+
+def lcm(*args):
+    return math.lcm(*(_integer(x, 'lcm') for x in args))
+
+
+def _integers(args, name):
+    arrays = [np.asarray(x) for x in args]
+    for array in arrays:
+        if array.dtype.kind not in 'iub' and np.any(array != np.floor(array)):
+            raise ValueError(f'{name}() is defined for integers only')
+    return [array.astype(np.int64) for array in arrays]
+
+
+def vector_gcd(*args):
+    return np.gcd.reduce(np.broadcast_arrays(*_integers(args, 'gcd')))
+
+
+def vector_lcm(*args):
+    return np.lcm.reduce(np.broadcast_arrays(*_integers(args, 'lcm')))
+
+
+def isprime(n):
+    n = _integer(n, 'isprime')
+    if n < 2:
+        return 0
+    for p in _BASES:
+        if n % p == 0:
+            return int(n == p)
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d, s = d // 2, s + 1
+    for a in _BASES:
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return 0
+    return 1
+
+
+def vector_isprime(n):
+    n, = _integers((n,), 'isprime')
+    top = int(n.max(initial=0))
+    if top > SIEVE_LIMIT:
+        return np.frompyfunc(isprime, 1, 1)(n).astype(np.int64)
+    sieve = np.ones(top + 1, dtype=bool)
+    sieve[:2] = False
+    for p in range(2, math.isqrt(top) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = False
+    return np.where(n >= 0, sieve[np.clip(n, 0, top)], False).astype(np.int64)
+
+
+def nextprime(n):
+    # the smallest prime larger than n.
+    n = max(math.floor(n), 1) + 1
+    if n > 2 and n % 2 == 0:
+        n += 1
+    while not isprime(n):
+        n += 2
+    return n
+
+
+functions = {
+    'gcd': (gcd, vector_gcd),
+    'lcm': (lcm, vector_lcm),
+    'isprime': (isprime, vector_isprime),
+    'nextprime': (nextprime, np.frompyfunc(nextprime, 1, 1)),
+}
@@ -0,0 +1,178 @@
+"""
+Special functions: error functions, log-gamma and beta.
+"""
+
+import math
+from decimal import Decimal, getcontext, localcontext, ROUND_CEILING
+import numpy as np
+
+from ..precision import pi, lgamma as precise_lgamma
+from ..vectorized import digamma
+
+
+_erf = np.vectorize(math.erf, otypes=[float])
+_erfc = np.vectorize(math.erfc, otypes=[float])
+_lgamma = np.vectorize(math.lgamma, otypes=[float])
+
+
+def erf(x):
+    return math.erf(x)
+
+
+def erfc(x):
+    return math.erfc(x)
+
+
+def lgamma(x):
+    return math.lgamma(x)
+
+
+def beta(a, b):
+    # through log-gamma, gamma alone overflows already for a + b > 171.
+    a, b = float(a), float(b)
+    return (_gamma_sign(a) * _gamma_sign(b) * _gamma_sign(a + b)
+            * math.exp(math.lgamma(a) + math.lgamma(b) - math.lgamma(a + b)))
+
+
+def vector_beta(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return (_gamma_sign(a) * _gamma_sign(b) * _gamma_sign(a + b)
+            * np.exp(_lgamma(a) + _lgamma(b) - _lgamma(a + b)))
+
+
+def _gamma_sign(x):
+    # gamma is negative between -1 and 0, -3 and -2 and so on.
+    return np.where(x > 0, 1.0, (-1.0) ** np.ceil(-x)) if isinstance(x, np.ndarray) \
+        else 1.0 if x > 0 else (-1.0) ** math.ceil(-x)
+
+
+###########################################################################################
+# Decimal implementations, at the precision of the decimal context.
+
+def precise_erf(x):
+    x = Decimal(x)
+    if x < 0:
+        return -precise_erf(-x)
+    if x * x > _series_limit():
+        return 1 - precise_erfc(x)
+    precision = getcontext().prec
+    with localcontext() as ctx:
+        ctx.prec = precision + 5
+        # erf(x) = 2/sqrt(pi) exp(-x^2) sum 2^n x^(2n+1) / (1*3*...*(2n+1)),
+        # the terms are all positive, nothing cancels.
+        square = 2 * x * x
+        term = total = x
+        n = 0
+        while True:
+            n += 1
+            term = term * square / (2 * n + 1)
+            if total + term == total:
+                break
+            total += term
+        result = 2 / pi(ctx.prec).sqrt() * (-x * x).exp() * total
+        ctx.prec = precision
+        return +result
+
+
+def precise_erfc(x):
+    x = Decimal(x)
+    if x < 0:
+        return 2 - precise_erfc(-x)
+    precision = getcontext().prec
+    with localcontext() as ctx:
+        if x * x <= _series_limit():
+            # 1 - erf(x) cancels about x^2 / ln(10) digits, they are carried.
+            ctx.prec = precision + 5 + int(x * x / Decimal(10).ln())
+            result = 1 - precise_erf(x)
+        else:
+            # continued fraction, erfc(x) = exp(-x^2)/sqrt(pi) / (x + (1/2)/(x + 1/(x + ...))),
+            # evaluated by the modified Lentz method.
+            ctx.prec = precision + 5
+            tiny = Decimal(10) ** -(ctx.prec * 2)
+            f = c = x
+            d = Decimal(0)
+            n = 0
+            while True:
+                n += 1
+                a = Decimal(n) / 2
+                d = x + a * d
+                d = 1 / (d if d else tiny)
+                c = x + a / c
+                c = c if c else tiny
+                delta = c * d
+                f *= delta
+                if abs(delta - 1) < Decimal(10) ** -ctx.prec:
+                    break
+            result = (-x * x).exp() / pi(ctx.prec).sqrt() / f
+        ctx.prec = precision
+        return +result
+
+
+def _series_limit():
+    # the series of erf is used up to x^2 of about the number of digits,
+    # beyond it the continued fraction of erfc converges faster.
+    return 2 * getcontext().prec
+
+
+def precise_beta(a, b):
+    a, b = Decimal(a), Decimal(b)
+    precision = getcontext().prec
+    with localcontext() as ctx:
+        # exp() turns the absolute error of the logarithms into a relative
+        # one, their integer digits, a couple more than those of a + b, are carried.
+        ctx.prec = precision + 8 + max(0, (abs(a) + abs(b)).adjusted())
+        logarithm = precise_lgamma(a) + precise_lgamma(b) - precise_lgamma(a + b)
+        result = _precise_gamma_sign(a) * _precise_gamma_sign(b) * _precise_gamma_sign(a + b) \
+            * logarithm.exp()
+        ctx.prec = precision
+        return +result
+
+
+def _precise_gamma_sign(x):
+    if x > 0:
+        return 1
+    return -1 if int((-x).to_integral_value(ROUND_CEILING)) % 2 else 1
+
+
+functions = {
+    'erf': (erf, _erf),
+    'erfc': (erfc, _erfc),
+    'lgamma': (lgamma, _lgamma),
+    'beta': (beta, vector_beta),
+}
+
+###########################################################################################
+# partial derivatives, for d().
+
+TWO_OVER_SQRT_PI = 2 / math.sqrt(math.pi)
+
+
+def _erf_x(x):
+    return TWO_OVER_SQRT_PI * np.exp(-np.square(x))
+
+
+def _erfc_x(x):
+    return -_erf_x(x)
+
+
+def _beta_a(a, b):
+    return vector_beta(a, b) * (digamma(a) - digamma(np.add(a, b)))
+
+
+def _beta_b(a, b):
+    return vector_beta(a, b) * (digamma(b) - digamma(np.add(a, b)))
+
+
+derivatives = {
+    'erf': (_erf_x,),
+    'erfc': (_erfc_x,),
+    'lgamma': (digamma,),
+    'beta': (_beta_a, _beta_b),
+}
+
+precise = {
+    'erf': precise_erf,
+    'erfc': precise_erfc,
+    'lgamma': precise_lgamma,
+    'beta': precise_beta,
+}
@@ -0,0 +1,195 @@
+"""
+Probability distributions: normal, exponential and Poisson.
+"""
+
+import math
+from decimal import Decimal, localcontext
+import numpy as np
+
+from ..precision import pi, lgamma as precise_lgamma
+from .special import _erfc, _lgamma, precise_erfc
+
+
+SQRT_2 = math.sqrt(2)
+SQRT_2PI = math.sqrt(2 * math.pi)
+
+
+def normpdf(x, mu=0, sigma=1):
+    z = (float(x) - float(mu)) / float(sigma)
+    return math.exp(-z * z / 2) / (float(sigma) * SQRT_2PI)
+
+
+def vector_normpdf(x, mu=0, sigma=1):
+    z = (np.asarray(x, dtype=float) - mu) / sigma
+    return np.exp(-z * z / 2) / (sigma * SQRT_2PI)
+
+
+def normcdf(x, mu=0, sigma=1):
+    z = (float(x) - float(mu)) / float(sigma)
+    return math.erfc(-z / SQRT_2) / 2
+
+
+def vector_normcdf(x, mu=0, sigma=1):
+    z = (np.asarray(x, dtype=float) - mu) / sigma
+    return _erfc(-z / SQRT_2) / 2
+
+
+def exppdf(x, rate=1):
+    x, rate = float(x), float(rate)
+    return rate * math.exp(-rate * x) if x >= 0 else 0.0
+
+
+def vector_exppdf(x, rate=1):
+    x = np.asarray(x, dtype=float)
+    return np.where(x >= 0, rate * np.exp(-rate * np.maximum(x, 0)), 0.0)
+
+
+def expcdf(x, rate=1):
+    x, rate = float(x), float(rate)
+    return -math.expm1(-rate * x) if x >= 0 else 0.0
+
+
+def vector_expcdf(x, rate=1):
+    x = np.asarray(x, dtype=float)
+    return np.where(x >= 0, -np.expm1(-rate * np.maximum(x, 0)), 0.0)
+
+
+def poissonpmf(k, lam):
+    # in logarithms, lam^k and k! overflow long before their ratio does.
+    k, lam = float(k), float(lam)
+    if k < 0 or k != math.floor(k):
+        return 0.0
+    if lam == 0:
+        return 1.0 if k == 0 else 0.0
+    return math.exp(k * math.log(lam) - lam - math.lgamma(k + 1))
+
+
+def vector_poissonpmf(k, lam):
+    k, lam = np.asarray(k, dtype=float), np.asarray(lam, dtype=float)
+    valid = (k >= 0) & (k == np.floor(k))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.where(lam > 0, k * np.log(lam), np.where(k == 0, 0.0, -np.inf))
+        values = np.exp(logs - lam - _lgamma(np.maximum(k, 0) + 1))
+    return np.where(valid, values, 0.0)
+
+
+###########################################################################################
+# Decimal implementations, at the precision of the decimal context.
+
+def precise_normpdf(x, mu=0, sigma=1):
+    x, mu, sigma = Decimal(x), Decimal(mu), Decimal(sigma)
+    with localcontext() as ctx:
+        ctx.prec += 5
+        z = (x - mu) / sigma
+        result = (-z * z / 2).exp() / (sigma * (2 * pi(ctx.prec)).sqrt())
+    return +result
+
+
+def precise_normcdf(x, mu=0, sigma=1):
+    x, mu, sigma = Decimal(x), Decimal(mu), Decimal(sigma)
+    with localcontext() as ctx:
+        ctx.prec += 5
+        z = (x - mu) / sigma
+        result = precise_erfc(-z / Decimal(2).sqrt()) / 2
+    return +result
+
+
+def precise_exppdf(x, rate=1):
+    x, rate = Decimal(x), Decimal(rate)
+    return rate * (-rate * x).exp() if x >= 0 else Decimal(0)
+
+
+def precise_expcdf(x, rate=1):
+    # 1 - exp(-rate*x) cancels for small x, the digits it loses are carried.
+    x, rate = Decimal(x), Decimal(rate)
+    if x <= 0:
+        return Decimal(0)
+    with localcontext() as ctx:
+        ctx.prec += 5 + max(0, -(rate * x).adjusted())
+        result = 1 - (-rate * x).exp()
+    return +result
+
+
+def precise_poissonpmf(k, lam):
+    k, lam = Decimal(k), Decimal(lam)
+    if k < 0 or k != k.to_integral_value():
+        return Decimal(0)
+    if lam == 0:
+        return Decimal(1 if k == 0 else 0)
+    with localcontext() as ctx:
+        # the integer digits of the logarithm are carried, exp() makes
+        # its absolute error a relative one.
+        ctx.prec += 8 + max(0, (k + lam).adjusted())
+        result = (k * lam.ln() - lam - precise_lgamma(k + 1)).exp()
+    return +result
+
+
+functions = {
+    'normpdf': (normpdf, vector_normpdf),
+    'normcdf': (normcdf, vector_normcdf),
+    'exppdf': (exppdf, vector_exppdf),
+    'expcdf': (expcdf, vector_expcdf),
+    'poissonpmf': (poissonpmf, vector_poissonpmf),
+}
+
+###########################################################################################
+# partial derivatives, for d().
+
+def _z(x, mu, sigma):
+    return (np.asarray(x, dtype=float) - mu) / sigma
+
+
+def _normpdf_x(x, mu=0, sigma=1):
+    return -_z(x, mu, sigma) / sigma * vector_normpdf(x, mu, sigma)
+
+
+def _normpdf_mu(x, mu=0, sigma=1):
+    return _z(x, mu, sigma) / sigma * vector_normpdf(x, mu, sigma)
+
+
+def _normpdf_sigma(x, mu=0, sigma=1):
+    return (_z(x, mu, sigma)**2 - 1) / sigma * vector_normpdf(x, mu, sigma)
+
+
+def _normcdf_mu(x, mu=0, sigma=1):
+    return -vector_normpdf(x, mu, sigma)
+
+
+def _normcdf_sigma(x, mu=0, sigma=1):
+    return -_z(x, mu, sigma) * vector_normpdf(x, mu, sigma)
+
+
+def _exppdf_x(x, rate=1):
+    return -rate * vector_exppdf(x, rate)
+
+
+def _exppdf_rate(x, rate=1):
+    x = np.asarray(x, dtype=float)
+    return np.where(x >= 0, (1 - rate * x) * np.exp(-rate * np.maximum(x, 0)), 0.0)
+
+
+def _expcdf_rate(x, rate=1):
+    x = np.asarray(x, dtype=float)
+    return np.where(x >= 0, x * np.exp(-rate * np.maximum(x, 0)), 0.0)
+
+
+def _poissonpmf_lam(k, lam):
+    # k is an integer, the pmf is not differentiable in it.
+    return vector_poissonpmf(k, lam) * (np.asarray(k, dtype=float) / lam - 1)
+
+
+derivatives = {
+    'normpdf': (_normpdf_x, _normpdf_mu, _normpdf_sigma),
+    'normcdf': (vector_normpdf, _normcdf_mu, _normcdf_sigma),
+    'exppdf': (_exppdf_x, _exppdf_rate),
+    'expcdf': (vector_exppdf, _expcdf_rate),
+    'poissonpmf': (None, _poissonpmf_lam),
+}
+
+precise = {
+    'normpdf': precise_normpdf,
+    'normcdf': precise_normcdf,
+    'exppdf': precise_exppdf,
+    'expcdf': precise_expcdf,
+    'poissonpmf': precise_poissonpmf,
+}
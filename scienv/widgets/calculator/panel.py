@@ -1,21 +1,79 @@
 import wx
-from wx.richtext import RichTextCtrl, RE_READONLY
-from .expression_manager import evaluate
+from ...lib import SimpleButton
+from .expression_manager import format_result, is_huge, split_assignment
+from .expression_manager import reserved, symbols, DEFAULT_PRECISION
+from .variables import Worksheet
+from .history import HistoryBuffer, HistoryStore, make_entry, DEFAULT_CAPACITY
+from .highlight import Lexer
+from .completion import Completer, FUNCTION
+from .bigint import to_string, write_digits
+from .parser import NAME, NUMBER
+from .worker import Evaluator, BatchEvaluator, DEFAULT_TIMEOUT, DEFAULT_MEMORY, CANCELLED, FAILED
+from collections import OrderedDict
+import re
+import sqlite3
+import threading
 from decimal import *
 
 
+# live preview: delay after the last keystroke (ms), time budget
+# of a preview evaluation (s) and number of cached previews.
+PREVIEW_DELAY = 150
+PREVIEW_TIMEOUT = 2
+PREVIEW_CACHE = 256
+
+# entries of past sessions shown at start, the rest is found by searching.
+RECENT = 1000
+
+# the name being typed, completed by tab.
+_PREFIX = re.compile(r'[a-z_][a-z0-9_]*$', re.IGNORECASE)
+
+
 class Panel(wx.Panel):
 
-    def __init__(self, parent, appConf):
+    def __init__(self, parent, appConf, widgetConf=None):
         super().__init__(parent, style=wx.NO_BORDER, size=(300, 150))
 
         self.config = appConf
+        self.widgetConf = widgetConf or {}
+        # significant digits, each widget evaluates at its own precision.
+        self.precision = int(self.widgetConf.get('precision', DEFAULT_PRECISION))
+        # variables assigned in this widget.
+        self.worksheet = Worksheet(reserved)
+        self.completer = Completer(symbols)
+        # evaluation runs in a worker process, within time (s) and memory (MB) budgets.
+        self.evaluator = Evaluator(float(self.widgetConf.get('timeout', DEFAULT_TIMEOUT)),
+                                   int(self.widgetConf.get('memory', DEFAULT_MEMORY)))
+        self.evaluator.start()
+        # previews get their own worker, so typing never waits on a submission.
+        self.previewer = Evaluator(PREVIEW_TIMEOUT, self.evaluator.memory)
+        self.previewer.start()
+        self._previewCache = OrderedDict()
+        self._previewPending = False
+        # pasted blocks of lines are evaluated by a pool of workers,
+        # started with the first block.
+        self.batch = None
+        # bounded history, evicted entries optionally go to a spill file.
+        self.history = HistoryBuffer(int(self.widgetConf.get('history', DEFAULT_CAPACITY)),
+                                     self.widgetConf.get('historySpill'))
+        # every entry is also kept in a database, across sessions.
+        self.store = None
+        if self.widgetConf.get('historyDatabase'):
+            try:
+                self.store = HistoryStore(self.widgetConf['historyDatabase'])
+            except (OSError, sqlite3.Error):
+                # the history is kept for this session only.
+                pass
+            else:
+                for entry in self.store.latest(min(RECENT, self.history.capacity)):
+                    self.history.append(entry)
         self.font = self.config.get_font('small')
         self.bigFont = self.config.get_font('medium')
         self.fontSize = self.font.GetPointSize()
 
         self.Bind(wx.EVT_PAINT, self._OnPaint)
         self.Bind(wx.EVT_ERASE_BACKGROUND, self._OnEraseBackground)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self._OnDestroy)
 
         self.DefineStyles()
         self.Display()
@@ -33,74 +91,372 @@ class Panel(wx.Panel):
         self.NUMBER_STYLE = wx.TextAttr('#6600ff')
         self.NUMBER_STYLE.SetFont(self.font)
         self.NUMBER_STYLE.SetFontSize(self.fontSize)
+        # token kind -> style, anything else keeps the regular style.
+        self.TOKEN_STYLES = {NAME: self.KEYWORD_STYLE, NUMBER: self.NUMBER_STYLE}
 
     def Display(self):
         sizer = wx.BoxSizer(wx.VERTICAL)
 
-        self.hist = History(self, style=wx.NO_BORDER |
-                            wx.TE_RICH2 | wx.TE_READONLY, size=(100, 80))
-        self.hist.SetFont(self.bigFont)
+        self.search = wx.SearchCtrl(self, style=wx.NO_BORDER)
+        self.search.SetFont(self.font)
+        self.search.SetBackgroundColour(self.config.get_color('color1', 'widget'))
+        self.search.SetForegroundColour(self.config.get_color('text', 'widget'))
+        self.search.SetDescriptiveText('Search history')
+        self.search.ShowCancelButton(True)
+        self.search.Bind(wx.EVT_TEXT, self.SearchHistory)
+        self.search.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.ClearSearch)
+
+        self.hist = History(self, self.history, self.bigFont,
+                            self.config.get_color('text', 'widget'), size=(100, 80))
         self.hist.SetBackgroundColour(
             self.config.get_color('color1', 'widget'))
-        self.hist.SetDefaultStyle(self.REGULAR_STYLE)
+        self.hist.Bind(wx.EVT_LISTBOX_DCLICK, self.RecallHistory)
+        self.hist.Bind(wx.EVT_CONTEXT_MENU, self.HistoryMenu)
 
         self.inp = Input(self, self.config.get_color('color1', 'widget'))
         self.inp.SetFont(self.font)
         self.inp.SetForegroundColour(self.config.get_color('text', 'widget'))
+        self.inp.SetDefaultStyle(self.REGULAR_STYLE)
+        self.lexer = Lexer()
 
         self.inp.Bind(wx.EVT_TEXT, self.ProcessInput)
         self.inp.Bind(wx.EVT_KEY_DOWN, self.ProcessKey)
         self.inp.Bind(wx.EVT_TEXT_ENTER, self.SubmitInput)
-        self._lastKey = 999
+        self.inp.Bind(wx.EVT_TEXT_PASTE, self.PasteInput)
+
+        self.preview = wx.StaticText(self, style=wx.ALIGN_RIGHT | wx.ST_NO_AUTORESIZE
+                                     | wx.ST_ELLIPSIZE_END)
+        self.preview.SetFont(self.font)
+        self.preview.SetForegroundColour(self.config.get_color('text', 'widget'))
+        self._previewTimer = wx.CallLater(PREVIEW_DELAY, self.RunPreview)
+        self._previewTimer.Stop()
 
+        # shown only while an evaluation is running.
+        self.cancel = SimpleButton(self, label='Cancel', config=self.config, size=(70, -1))
+        self.cancel.Bind(wx.EVT_BUTTON, self.CancelInput)
+        self.cancel.Hide()
+
+        inputSizer = wx.BoxSizer(wx.HORIZONTAL)
+        inputSizer.Add(self.inp, 1, flag=wx.EXPAND)
+        inputSizer.Add(self.cancel, 0, flag=wx.EXPAND)
+
+        sizer.Add(self.search, 0, flag=wx.EXPAND)
         sizer.Add(self.hist, 1, flag=wx.EXPAND)
         sizer.Add((-1, 2))
-        sizer.Add(self.inp, 0, flag=wx.EXPAND)
+        sizer.Add(self.preview, 0, flag=wx.EXPAND | wx.RIGHT, border=4)
+        sizer.Add(inputSizer, 0, flag=wx.EXPAND)
 
         self.SetSizer(sizer)
         self.Layout()
 
     def ProcessKey(self, e):
-        value = self.inp.GetValue()
-        length = len(value)
-        key = e.GetUnicodeKey()
-        if self._lastKey == 0:  # if shift/ctrl
-            if key == 56 or key == 49 or key == 53 or key == 54 or key == 65 or key == 67 or key == 86:
-                self._lastKey = 999
-                e.Skip()
-                return
-            elif key == 0:
-                e.Skip()
-                return
-        if key == 9:
+        # tab is not part of an expression, it completes names.
+        if e.GetKeyCode() == wx.WXK_TAB:
+            self.Complete()
             return
-        elif 65 <= key <= 90:
-            self.inp.SetDefaultStyle(self.KEYWORD_STYLE)
-            self.inp.EmulateKeyPress(e)
+        e.Skip()
+
+    def Complete(self):
+        position = self.inp.GetInsertionPoint()
+        match = _PREFIX.search(self.inp.GetRange(0, position))
+        if match is None:
             return
-        elif 48 <= key <= 57:
-            self.inp.SetDefaultStyle(self.NUMBER_STYLE)
-            self.inp.EmulateKeyPress(e)
+        prefix = match.group().lower()
+        matches = self.completer.complete(prefix)
+        if len(matches) == 1:
+            self.InsertCompletion(prefix, *matches[0])
             return
-        else:
-            self._lastKey = key
-            e.Skip()
+        if not matches:
+            return
+
+        menu = wx.Menu()
+        for name, kind in matches:
+            item = menu.Append(wx.ID_ANY, f'{name}(' if kind == FUNCTION else name)
+            self.Bind(wx.EVT_MENU, lambda e, name=name, kind=kind:
+                      self.InsertCompletion(prefix, name, kind), item)
+        x, y = self.inp.PositionToCoords(position)
+        self.inp.PopupMenu(menu, (x, y + self.fontSize))
+        menu.Destroy()
+
+    def InsertCompletion(self, prefix, name, kind):
+        text = name[len(prefix):]
+        if kind == FUNCTION and self.inp.GetRange(self.inp.GetInsertionPoint(),
+                                                  self.inp.GetLastPosition())[:1] != '(':
+            text += '('
+        self.inp.WriteText(text)
+
+    def Highlight(self):
+        # typing, pasting and deleting all end up here, only the span
+        # whose tokens changed is restyled, in one frozen batch.
+        start, end, tokens = self.lexer.update(self.inp.GetValue())
+        if start == end:
+            return
+        self.inp.Freeze()
+        try:
+            self.inp.SetStyle(start, end, self.REGULAR_STYLE)
+            for token in tokens:
+                style = self.TOKEN_STYLES.get(token.kind)
+                if style is not None:
+                    self.inp.SetStyle(token.pos, token.pos + len(token.text), style)
+        finally:
+            self.inp.Thaw()
 
     def ProcessInput(self, e):
-        # allows combined keys, that couldn't be simulated by ProcessKey.
-        pass
+        # live preview, cached results show up at once, anything else
+        # is evaluated once typing pauses for PREVIEW_DELAY.
+        e.Skip()
+        self.Highlight()
+        value = self.inp.GetValue().strip()
+        if value in self._previewCache:
+            self._previewTimer.Stop()
+            self._previewCache.move_to_end(value)
+            self.SetPreview(self._previewCache[value])
+        elif not value:
+            self._previewTimer.Stop()
+            self.preview.SetLabel('')
+        else:
+            self._previewTimer.Start(PREVIEW_DELAY)
+
+    def RunPreview(self):
+        if self.previewer.busy:
+            # a stale preview is still running, it is dropped and
+            # the current input is previewed once it is gone.
+            self._previewPending = True
+            self.previewer.cancel()
+            return
+        value = self.inp.GetValue().strip()
+        if not value or value in self._previewCache:
+            return
+        # assignments are not kept, the previewer's worksheet stays as it is.
+        self.previewer.submit(value, self.precision, self.worksheet,
+                              lambda result, delta: wx.CallAfter(self.ShowPreview, value, result),
+                              keep=False)
+
+    def ShowPreview(self, value, result):
+        if not self:
+            return
+        if result[1] not in (CANCELLED, FAILED):
+            self._previewCache[value] = result
+            if len(self._previewCache) > PREVIEW_CACHE:
+                self._previewCache.popitem(last=False)
+        if value == self.inp.GetValue().strip():
+            self.SetPreview(result)
+        if self._previewPending:
+            self._previewPending = False
+            self.RunPreview()
+
+    def SetPreview(self, result):
+        # errors are expected while typing, they show as an empty preview.
+        if result[0] is None:
+            self.preview.SetLabel('')
+        else:
+            self.preview.SetLabel(f'= {format_result(result[0])}')
+
+    def PasteInput(self, e):
+        # a block of several lines is evaluated as a batch, without
+        # going through the input.
+        text = ''
+        if wx.TheClipboard.Open():
+            data = wx.TextDataObject()
+            if wx.TheClipboard.GetData(data):
+                text = data.GetText()
+            wx.TheClipboard.Close()
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if len(lines) < 2:
+            e.Skip()
+            return
+        self.RunBatch(lines)
 
     def SubmitInput(self, e):
         value = self.inp.GetValue().strip()
-        result = evaluate(value)
-        self.hist.SetDefaultStyle(self.REGULAR_STYLE)
-        if result[0] == None:
-            self.hist.AppendText(result[1] + '\n')
+        if not value or self.IsEvaluating():
+            return
+        if '\n' in value:
+            self.inp.Clear()
+            self.RunBatch([line.strip() for line in value.splitlines() if line.strip()])
+            return
+        self.SetBusy(True)
+        self.evaluator.submit(value, self.precision, self.worksheet,
+                              lambda result, delta: wx.CallAfter(self.ShowResult, value, result, delta))
+
+    def RunBatch(self, lines):
+        if self.IsEvaluating():
+            return
+        if self.batch is None:
+            self.batch = BatchEvaluator(self.evaluator.timeout, self.evaluator.memory,
+                                        self.widgetConf.get('batchProcesses'))
+        self.SetBusy(True)
+        self.ClearSearch(None)
+        self.preview.SetLabel(f'0/{len(lines)}')
+        # every line is evaluated with the variables as they are now,
+        # the results are numbered in the order of the lines.
+        self.batch.submit(lines, self.precision, self.worksheet,
+                          lambda items, done, total: wx.CallAfter(self.ShowBatch, items, done, total),
+                          lambda cancelled: wx.CallAfter(self.FinishBatch, cancelled))
+
+    def ShowBatch(self, items, done, total):
+        if not self:
+            return
+        for value, result, answer in items:
+            if result[0] is None:
+                self.RecordHistory(value, result[1], error=True)
+            else:
+                self.RecordHistory(value, format_result(result[0]),
+                                   number=self.worksheet.remember(answer))
+        self.hist.SetEntries(self.history)
+        self.preview.SetLabel(f'{done}/{total}')
+
+    def FinishBatch(self, cancelled):
+        if not self:
+            return
+        self.SetBusy(False)
+        self._previewCache.clear()
+        self.preview.SetLabel('Batch cancelled.' if cancelled else '')
+
+    def IsEvaluating(self):
+        return self.evaluator.busy or (self.batch is not None and self.batch.busy)
+
+    def CancelInput(self, e):
+        if self.batch is not None and self.batch.busy:
+            self.batch.cancel()
+        else:
+            self.evaluator.cancel()
+
+    def SetBusy(self, busy):
+        self.cancel.Show(busy)
+        self.inp.SetEditable(not busy)
+        self.Layout()
+
+    def ShowResult(self, value, result, delta):
+        # the widget may have been closed while the evaluation was running.
+        if not self:
+            return
+        self.SetBusy(False)
+        if delta is not None:
+            # the worker's worksheet changed, the changes are applied here.
+            self.worksheet.apply(delta)
+            self.completer.update(self.worksheet.formulas)
+            # previews were computed with the old variables.
+            self._previewCache.clear()
+        self.preview.SetLabel('')
+
+        if result[0] is None:
+            self.AddHistory(value, result[1], error=True)
+            return
+
+        # the exact value stays in the worksheet as ans, the input
+        # is cleared instead of holding the rounded text of the result.
+        number = self.worksheet.answered
+        if split_assignment(value) is not None:
+            name, _ = split_assignment(value)
+            self.AddHistory(name, format_result(result[0]), number=number)
+        else:
+            self.AddHistory(value, format_result(result[0]), number=number)
+        self.inp.Clear()
+
+    def AddHistory(self, value, result, error=False, number=None):
+        self.RecordHistory(value, result, error, number)
+        if self.search.GetValue():
+            # a new result ends the search, so it shows up.
+            self.search.ChangeValue('')
+            self.hist.SetEntries(self.history)
+        else:
+            self.hist.ShowLatest()
+
+    def RecordHistory(self, value, result, error=False, number=None):
+        # adds the entry without updating the list.
+        entry = make_entry(value, result, error, number)
+        self.history.append(entry)
+        if self.store is not None:
+            self.store.append(entry)
+
+    def SearchHistory(self, e):
+        # incremental, every keystroke narrows the list to the matches,
+        # looked up in the database index when there is one.
+        text = self.search.GetValue().strip()
+        if not text:
+            self.hist.SetEntries(self.history)
+        elif self.store is not None:
+            self.hist.SetEntries(self.store.search(text))
+        else:
+            self.hist.SetEntries(self.history.search(text))
+
+    def ClearSearch(self, e):
+        self.search.ChangeValue('')
+        self.hist.SetEntries(self.history)
+
+    def RecallHistory(self, e):
+        # double click puts the input of the row back for editing.
+        entry = self.hist.entries[e.GetSelection()]
+        self.inp.SetValue(entry.input)
+        self.inp.SetInsertionPointEnd()
+        self.inp.SetFocus()
+
+    def HistoryMenu(self, e):
+        # huge results are shown shortened, all their digits are
+        # produced on demand, for the clipboard or a file.
+        position = e.GetPosition()
+        if position == wx.DefaultPosition:
+            row = self.hist.GetSelection()
         else:
-            result = f'{result[0]}'
-            self.hist.AppendText(f'{value} = {result}\n')
-            self.inp.SetDefaultStyle(self.NUMBER_STYLE)
-            self.inp.SetValue(f'{result}')
+            row = self.hist.VirtualHitTest(self.hist.ScreenToClient(position).y)
+        if row == wx.NOT_FOUND:
+            return
+        entry = self.hist.entries[row]
+        try:
+            value = self.worksheet.answer(entry.number) if entry.number else None
+        except LookupError:
+            value = None
+        if not is_huge(value):
+            return
+
+        menu = wx.Menu()
+        copy = menu.Append(wx.ID_ANY, 'Copy all digits')
+        save = menu.Append(wx.ID_ANY, 'Save all digits...')
+        self.Bind(wx.EVT_MENU, lambda e: self.CopyDigits(value), copy)
+        self.Bind(wx.EVT_MENU, lambda e: self.SaveDigits(value), save)
+        self.hist.PopupMenu(menu)
+        menu.Destroy()
+
+    def CopyDigits(self, value):
+        self.preview.SetLabel('Writing out the digits...')
+
+        def convert():
+            digits = to_string(value)
+            wx.CallAfter(self._SetClipboard, digits)
+
+        threading.Thread(target=convert, daemon=True).start()
+
+    def _SetClipboard(self, digits):
+        if not self:
+            return
+        if wx.TheClipboard.Open():
+            wx.TheClipboard.SetData(wx.TextDataObject(digits))
+            wx.TheClipboard.Close()
+            self.preview.SetLabel(f'{len(digits)} characters copied')
+
+    def SaveDigits(self, value):
+        with wx.FileDialog(self, 'Save all digits', wildcard='Text files (*.txt)|*.txt',
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = dialog.GetPath()
+        self.preview.SetLabel('Writing out the digits...')
+
+        def save():
+            try:
+                with open(path, 'w', encoding='ascii') as file:
+                    write_digits(value, file)
+                message = f'Saved to {path}'
+            except OSError as error:
+                message = f'Could not save: {error.strerror}'
+            wx.CallAfter(self._SetStatus, message)
+
+        threading.Thread(target=save, daemon=True).start()
+
+    def _SetStatus(self, message):
+        if self:
+            self.preview.SetLabel(message)
 
     def Draw(self, dc):
         dc.SetBackground(wx.Brush(self.config.get_color('frame', 'widget')))
@@ -113,12 +469,67 @@ class Panel(wx.Panel):
         dc = wx.BufferedPaintDC(self)
         self.Draw(dc)
 
+    def _OnDestroy(self, e):
+        if e.GetEventObject() is self:
+            self._previewTimer.Stop()
+            self.evaluator.close()
+            self.previewer.close()
+            if self.batch is not None:
+                self.batch.close()
+            self.history.close()
+            if self.store is not None:
+                self.store.close()
+        e.Skip()
+
+
+class History(wx.VListBox):
+
+    """
+    Virtual list over a HistoryBuffer or the matches of a search, only
+    the visible rows are measured and drawn, however many entries
+    the buffer holds.
+    """
+
+    def __init__(self, parent, entries, font, fgColor, **kwargs):
+        super().__init__(parent, style=wx.NO_BORDER, **kwargs)
+        self.entries = entries
+        self.font = font
+        self.fgColor = fgColor
+        dc = wx.ClientDC(self)
+        dc.SetFont(font)
+        self.rowHeight = dc.GetTextExtent('0')[1] + 4
 
-class History(RichTextCtrl):
+    def ShowLatest(self):
+        """Picks up entries appended to the buffer and shows the newest one."""
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.SetInsertionPoint(0)
+        count = len(self.entries)
+        self.SetItemCount(count)
+        if count:
+            self.ScrollToRow(count - 1)
+        self.Refresh()
+
+    def SetEntries(self, entries):
+        """Shows entries instead, a buffer or a list of them."""
+
+        self.entries = entries
+        self.ShowLatest()
+
+    def OnMeasureItem(self, n):
+        return self.rowHeight
+
+    def OnDrawItem(self, dc, rect, n):
+        entry = self.entries[n]
+        if entry.error:
+            text = entry.result
+        else:
+            text = f'{entry.input} = {entry.result}'
+        if entry.number is not None:
+            text = f'[{entry.number}] {text}'
+        dc.SetFont(self.font)
+        dc.SetTextForeground(self.fgColor)
+        dc.SetClippingRegion(rect)
+        dc.DrawText(text, rect.x + 2, rect.y + 2)
+        dc.DestroyClippingRegion()
 
 
 class Input(wx.TextCtrl):
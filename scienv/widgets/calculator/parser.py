@@ -0,0 +1,374 @@
+"""
+Tokenizer and parser for calculator expressions.
+
+The input is split into tokens in a single regular expression pass and
+then turned into a tree of nodes by a recursive descent parser, so the
+work done grows linearly with the length of the expression.
+"""
+
+import re
+from collections import namedtuple
+
+
+# token kinds
+NUMBER = 'number'
+NAME = 'name'
+OPERATOR = 'operator'
+LPAREN = '('
+RPAREN = ')'
+LBRACKET = '['
+RBRACKET = ']'
+COMMA = ','
+BANG = '!'
+ERROR = 'error'
+END = 'end'
+
+Token = namedtuple('Token', 'kind text pos')
+
+_TOKENS = re.compile(r'''
+      (?P<space>\s+)
+    | (?P<number>(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?)
+    | (?P<name>[a-z_][a-z0-9_]*)
+    | (?P<operator>\*\*|[-+*/%^])
+    | (?P<punct>[()\[\],!])
+    | (?P<error>.)
+''', re.VERBOSE | re.IGNORECASE)
+
+
+def normalize(string):
+    """
+    return type: string
+    Lowercases the input and collapses whitespace, the result
+    is used as the key of the compiled expressions cache.
+    """
+
+    return ' '.join(string.lower().split())
+
+
+def tokenize(string, pos=0):
+    """
+    Yields tokens of the string starting at pos, whitespace is
+    skipped and unknown characters are reported as ERROR tokens.
+    """
+
+    for match in _TOKENS.finditer(string, pos):
+        kind = match.lastgroup
+        if kind == 'space':
+            continue
+        text = match.group()
+        if kind == 'punct':
+            kind = text
+        yield Token(kind, text, match.start())
+
+
+def to_number(text):
+    """Converts a number literal to int when possible, float otherwise."""
+
+    if '.' in text or 'e' in text or 'E' in text:
+        return float(text)
+    return int(text)
+
+
+###########################################################################################
+# syntax tree nodes.
+
+class Node(tuple):
+
+    """
+    Base of the syntax tree nodes, nodes are immutable and compare
+    by their type as well as their fields, so equal subtrees hash
+    to the same value.
+    """
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self).__name__, tuple.__hash__(self)))
+
+
+class Number(Node, namedtuple('Number', 'text')):
+    __slots__ = ()
+
+
+class Name(Node, namedtuple('Name', 'id')):
+    __slots__ = ()
+
+
+class UnaryOp(Node, namedtuple('UnaryOp', 'op operand')):
+    __slots__ = ()
+
+
+class BinOp(Node, namedtuple('BinOp', 'op left right')):
+    __slots__ = ()
+
+
+class Call(Node, namedtuple('Call', 'name args')):
+    __slots__ = ()
+
+
+class Array(Node, namedtuple('Array', 'items')):
+    __slots__ = ()
+
+
+class Index(Node, namedtuple('Index', 'value index')):
+    __slots__ = ()
+
+
+###########################################################################################
+# parser.
+
+class Parser:
+
+    """
+    Recursive descent parser, grammar from the lowest precedence:
+
+        expression := term (('+' | '-') term)*
+        term       := unary (('*' | '/' | '%') unary | power)*
+        unary      := ('+' | '-') unary | power
+        power      := postfix (('^' | '**') unary)?
+        postfix    := primary ('!' | '[' expression ']')*
+        primary    := NUMBER | NAME ['(' arguments ')'] | '(' expression ')'
+                    | '[' items ']'
+        items      := (expression [','])*
+
+    A term directly followed by a name or "(" is an implicit
+    multiplication, so "2pi" and "3(1+2)" work as expected.
+
+    Array items are separated by commas or by whitespace alone, so
+    pasted columns of numbers parse as they are. Without a comma, a
+    sign preceded by a space but not followed by one starts a new
+    item, "[1 -2]" has two items and "[1 - 2]" one. For the same
+    reason an index has to follow its value directly, "x[0]".
+    """
+
+    def __init__(self, string):
+        self.string = string
+        self.tokens = list(tokenize(string))
+        self.tokens.append(Token(END, '', len(string)))
+        self.index = 0
+        # open brackets and parentheses, innermost last.
+        self.nesting = []
+
+    def parse(self):
+        node = self.expression()
+        self.expect(END)
+        return node
+
+    # helpers.
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def accept(self, kind, *texts):
+        token = self.tokens[self.index]
+        if token.kind == kind and (not texts or token.text in texts):
+            self.index += 1
+            return token
+        return None
+
+    def expect(self, kind):
+        token = self.accept(kind)
+        if token is None:
+            self.error(self.peek())
+        return token
+
+    def error(self, token):
+        if token.kind == END:
+            raise SyntaxError('unexpected end of expression')
+        raise SyntaxError(f'unexpected {token.text!r} at position {token.pos}')
+
+    # grammar rules.
+
+    def expression(self):
+        node = self.term()
+        while True:
+            if self.starts_item(self.peek()):
+                return node
+            token = self.accept(OPERATOR, '+', '-')
+            if token is None:
+                return node
+            node = BinOp(token.text, node, self.term())
+
+    def starts_item(self, token):
+        # a sign written like "[1 -2]", directly inside brackets.
+        if not self.nesting or self.nesting[-1] != LBRACKET:
+            return False
+        if token.kind != OPERATOR or token.text not in '+-':
+            return False
+        before = self.string[token.pos - 1:token.pos]
+        after = self.string[token.pos + 1:token.pos + 2]
+        return before.isspace() and not after.isspace()
+
+    def term(self):
+        node = self.unary()
+        while True:
+            token = self.accept(OPERATOR, '*', '/', '%')
+            if token is not None:
+                node = BinOp(token.text, node, self.unary())
+            elif self.peek().kind in (NAME, LPAREN):
+                node = BinOp('*', node, self.power())
+            else:
+                return node
+
+    def unary(self):
+        token = self.accept(OPERATOR, '+', '-')
+        if token is not None:
+            return UnaryOp(token.text, self.unary())
+        return self.power()
+
+    def power(self):
+        node = self.postfix()
+        if self.accept(OPERATOR, '^', '**') is not None:
+            node = BinOp('^', node, self.unary())
+        return node
+
+    def postfix(self):
+        node = self.primary()
+        while True:
+            if self.accept(BANG) is not None:
+                node = Call('factorial', (node,))
+            elif self.adjacent(LBRACKET):
+                self.advance()
+                self.nesting.append(LPAREN)
+                node = Index(node, self.expression())
+                self.expect(RBRACKET)
+                self.nesting.pop()
+            else:
+                return node
+
+    def adjacent(self, kind):
+        # the next token is of kind and touches the previous one.
+        token, previous = self.peek(), self.tokens[self.index - 1]
+        return token.kind == kind and token.pos == previous.pos + len(previous.text)
+
+    def primary(self):
+        token = self.advance()
+        if token.kind == NUMBER:
+            return Number(token.text)
+        if token.kind == NAME:
+            if self.accept(LPAREN) is not None:
+                return Call(token.text, self.arguments())
+            return Name(token.text)
+        if token.kind == LPAREN:
+            self.nesting.append(LPAREN)
+            node = self.expression()
+            self.expect(RPAREN)
+            self.nesting.pop()
+            return node
+        if token.kind == LBRACKET:
+            return Array(self.items())
+        self.error(token)
+
+    def arguments(self):
+        args = []
+        if self.accept(RPAREN) is not None:
+            return tuple(args)
+        self.nesting.append(LPAREN)
+        args.append(self.expression())
+        while self.accept(COMMA) is not None:
+            args.append(self.expression())
+        self.expect(RPAREN)
+        self.nesting.pop()
+        return tuple(args)
+
+    def items(self):
+        items = []
+        self.nesting.append(LBRACKET)
+        while self.accept(RBRACKET) is None:
+            items.append(self.expression())
+            self.accept(COMMA)
+        self.nesting.pop()
+        return tuple(items)
+
+
+def parse(string):
+    """
+    return type: Node
+    Parses the (normalized) string to a syntax tree.
+    """
+
+    return Parser(string).parse()
+
+
+###########################################################################################
+# tree utilities.
+
+def names(node):
+    """Returns the set of names referenced by the tree."""
+
+    found = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Name):
+            found.add(node.id)
+        elif isinstance(node, Call):
+            found.add(node.name)
+            stack.extend(node.args)
+        elif isinstance(node, Array):
+            stack.extend(node.items)
+        elif isinstance(node, Index):
+            stack.append(node.value)
+            stack.append(node.index)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, BinOp):
+            stack.append(node.left)
+            stack.append(node.right)
+    return found
+
+
+def unparse(node):
+    """
+    return type: string
+    Writes the tree back as a fully parenthesized expression.
+    """
+
+    if isinstance(node, Number):
+        return node.text
+    if isinstance(node, Name):
+        return node.id
+    if isinstance(node, UnaryOp):
+        return f'{node.op}{_wrap(node.operand)}'
+    if isinstance(node, BinOp):
+        if node.op == '^':
+            return f'{_wrap(node.left)}**{_wrap(node.right)}'
+
+        # walking the left spine keeps long sums from recursing, it
+        # stays on operators of one precedence, (1+2)*3 keeps its group.
+        group = _GROUPS[node.op]
+        parts = []
+        while isinstance(node, BinOp) and _GROUPS.get(node.op) == group:
+            parts.append(_wrap(node.right))
+            parts.append(node.op)
+            node = node.left
+        parts.append(_wrap(node))
+        return ''.join(reversed(parts))
+    if isinstance(node, Call):
+        return f'{node.name}({", ".join(unparse(arg) for arg in node.args)})'
+    if isinstance(node, Array):
+        return f'[{", ".join(unparse(item) for item in node.items)}]'
+    if isinstance(node, Index):
+        return f'{_wrap(node.value)}[{unparse(node.index)}]'
+    raise TypeError(f'unknown node {node!r}')
+
+
+# precedence of the left associative operators.
+_GROUPS = {'+': 0, '-': 0, '*': 1, '/': 1, '%': 1}
+
+
+def _wrap(node):
+    if isinstance(node, (UnaryOp, BinOp)):
+        return f'({unparse(node)})'
+    return unparse(node)
@@ -0,0 +1,368 @@
+"""
+Decimal counterparts of keywords for arbitrary precision evaluation.
+
+Every function works at the precision of the current decimal context,
+constants and function values are cached per precision so they are
+only computed once for each precision in use.
+"""
+
+from decimal import Decimal, getcontext, localcontext, ROUND_CEILING
+from functools import lru_cache
+import numpy as np
+
+from . import keywords
+
+
+# extra digits carried through the evaluation, the result is
+# rounded to the requested precision at the end.
+GUARD = 5
+
+
+# constants:
+@lru_cache(maxsize=None)
+def pi(precision):
+    """Pi to the given precision, series from the decimal module recipes."""
+
+    with localcontext() as ctx:
+        ctx.prec = precision + 2
+        lasts, t, s, n, na, d, da = 0, Decimal(3), 3, 1, 0, 0, 24
+        while s != lasts:
+            lasts = s
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            s += t
+        ctx.prec = precision
+        return +s
+
+
+@lru_cache(maxsize=None)
+def e(precision):
+    with localcontext() as ctx:
+        ctx.prec = precision
+        return Decimal(1).exp()
+
+
+@lru_cache(maxsize=None)
+def ln2(precision):
+    with localcontext() as ctx:
+        ctx.prec = precision
+        return Decimal(2).ln()
+
+
+# trigonometric functions:
+@lru_cache(maxsize=1024)
+def _sin_cos(x, precision):
+
+    # large arguments lose digits in the reduction, so those are
+    # computed with as many more digits as x has before the point.
+    with localcontext() as ctx:
+        ctx.prec = precision + 2 + max(0, x.adjusted())
+        tau = 2 * pi(ctx.prec)
+        x -= tau * (x / tau).to_integral_value()
+        x2 = x * x
+
+        sin, term, n = x, x, 1
+        while True:
+            term = -term * x2 / ((n + 1) * (n + 2))
+            n += 2
+            if sin + term == sin:
+                break
+            sin += term
+
+        cos, term, n = Decimal(1), Decimal(1), 0
+        while True:
+            term = -term * x2 / ((n + 1) * (n + 2))
+            n += 2
+            if cos + term == cos:
+                break
+            cos += term
+
+        ctx.prec = precision
+        return +sin, +cos
+
+
+def sin(x):
+    return _sin_cos(Decimal(x), getcontext().prec)[0]
+
+
+def cos(x):
+    return _sin_cos(Decimal(x), getcontext().prec)[1]
+
+
+def tan(x):
+    sin, cos = _sin_cos(Decimal(x), getcontext().prec)
+    return sin / cos
+
+
+# logarithms:
+def log10(x):
+    return Decimal(x).log10()
+
+
+def log2(x):
+    return Decimal(x).ln() / ln2(getcontext().prec)
+
+
+# factorial function:
+def factorial(n):
+    n = Decimal(n)
+    if n != n.to_integral_value():
+        return gamma(n + 1)
+    return keywords.factorial(int(n))
+
+
+def to_decimal(n):
+
+    """
+    return type: Decimal
+    Rounds the integer n to the current precision, huge integers are
+    built from their leading bits instead of a full base conversion.
+    Integers are exact in this engine until they meet a Decimal.
+    """
+
+    bits = getcontext().prec * 4 + 64
+    shift = abs(n).bit_length() - bits
+    if shift <= 0:
+        return +Decimal(n)
+    with localcontext() as ctx:
+        ctx.prec += 5
+        value = Decimal(n >> shift) * Decimal(2) ** shift
+    return +value
+
+
+@lru_cache(maxsize=None)
+def _spouge(precision):
+
+    # Spouge's approximation with a ~ 1.26 * digits terms has a relative
+    # error below 10**-precision, the alternating coefficients cancel
+    # heavily so they are computed with twice the digits.
+    a = int(precision * 1.26) + 2
+    with localcontext() as ctx:
+        ctx.prec = 2 * precision + 10
+        coefficients = [(2 * pi(ctx.prec)).sqrt()]
+        sign, fact = 1, Decimal(1)
+        for k in range(1, a):
+            base = Decimal(a - k)
+            coefficients.append(sign * base ** (Decimal(k) - Decimal('0.5')) * base.exp() / fact)
+            sign, fact = -sign, fact * k
+        return a, coefficients
+
+
+def gamma(x):
+    x = Decimal(x)
+    if x == x.to_integral_value():
+        if x <= 0:
+            raise ValueError('gamma() not defined for non-positive integers')
+        if x < keywords.EXACT_GAMMA:
+            return keywords.factorial(int(x) - 1)
+
+    precision = getcontext().prec
+    with localcontext() as ctx:
+        ctx.prec = precision + 5
+        if x < Decimal('0.5'):
+            # reflection, gamma(x) * gamma(1 - x) = pi / sin(pi*x)
+            p = pi(ctx.prec)
+            result = p / (sin(p * x) * gamma(1 - x))
+        else:
+            a, coefficients = _spouge(ctx.prec)
+            z = x - 1
+            total = coefficients[0]
+            for k in range(1, a):
+                total += coefficients[k] / (z + k)
+            result = (z + a) ** (z + Decimal('0.5')) * (-(z + a)).exp() * total
+        ctx.prec = precision
+        return +result
+
+
+def lgamma(x):
+
+    """
+    return type: Decimal
+    ln|gamma(x)|, from the logarithm of Spouge's approximation, so a
+    large x builds neither a huge power nor a factorial.
+    """
+
+    x = Decimal(x)
+    if x <= 0 and x == x.to_integral_value():
+        raise ValueError('lgamma() not defined for non-positive integers')
+    precision = getcontext().prec
+    with localcontext() as ctx:
+        # the logarithm is about x ln x, its integer digits are carried.
+        ctx.prec = precision + 5 + max(0, x.copy_abs().adjusted())
+        if x < Decimal('0.5'):
+            p = pi(ctx.prec)
+            result = (p / abs(sin(p * x))).ln() - lgamma(1 - x)
+        else:
+            a, coefficients = _spouge(ctx.prec)
+            z = x - 1
+            total = coefficients[0]
+            for k in range(1, a):
+                total += coefficients[k] / (z + k)
+            result = (z + Decimal('0.5')) * (z + a).ln() - (z + a) + total.ln()
+        ctx.prec = precision
+        return +result
+
+
+# combinatorics:
+def ncr(n, k):
+    return keywords.ncr(_integral(n), _integral(k))
+
+
+binomial = ncr
+
+
+def npr(n, k):
+    return keywords.npr(_integral(n), _integral(k))
+
+
+def _integral(n):
+    n = Decimal(n)
+    if n != n.to_integral_value():
+        raise ValueError('only integral values are accepted')
+    return int(n)
+
+
+# operators, factorials and binomials are exact integers like in the
+# float engine. An integer meeting a whole Decimal, a literal like 7,
+# stays exact, meeting any other Decimal it is rounded first, which is
+# fast even for a huge one. Integers are divided as Decimals:
+def _decimals(x, y):
+    if isinstance(x, int) and isinstance(y, Decimal):
+        return (x, int(y)) if _whole(y) else (to_decimal(x), y)
+    if isinstance(y, int) and isinstance(x, Decimal):
+        return (int(x), y) if _whole(x) else (x, to_decimal(y))
+    return x, y
+
+
+def _whole(x):
+    return x.is_finite() and x.as_tuple().exponent == 0
+
+
+def _elementwise(function):
+    # object arrays are mapped element by element.
+    mapped = np.frompyfunc(function, 2, 1)
+
+    def operator(x, y):
+        if isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+            return mapped(x, y)
+        return function(x, y)
+    operator.__name__ = function.__name__
+    return operator
+
+
+@_elementwise
+def add(x, y):
+    x, y = _decimals(x, y)
+    return x + y
+
+
+@_elementwise
+def sub(x, y):
+    x, y = _decimals(x, y)
+    return x - y
+
+
+@_elementwise
+def mul(x, y):
+    x, y = _decimals(x, y)
+    return x * y
+
+
+@_elementwise
+def div(x, y):
+    x, y = _decimals(x, y)
+    if isinstance(x, int) and isinstance(y, int):
+        x, y = to_decimal(x), to_decimal(y)
+    return x / y
+
+
+@_elementwise
+def mod(x, y):
+    # x - y*floor(x/y) like the % of floats, the remainder of Decimal
+    # is exact but has the sign of x.
+    x, y = _decimals(x, y)
+    if isinstance(x, int) and isinstance(y, int):
+        return x % y
+    x, y = Decimal(x), Decimal(y)
+    if not y:
+        raise ZeroDivisionError('modulo by zero')
+    remainder = x % y
+    if remainder and (remainder < 0) != (y < 0):
+        remainder += y
+    return remainder
+
+
+@_elementwise
+def power(x, y):
+    x, y = _decimals(x, y)
+    if isinstance(x, int) and isinstance(y, int) and y < 0:
+        x = to_decimal(x)
+    return x ** y
+
+
+# symbol -> operator, the names the compiled code calls them by.
+operators = {'+': add, '-': sub, '*': mul, '/': div, '%': mod, '^': power}
+
+
+# root function:
+def root(x, degree=2):
+    x, degree = Decimal(x), Decimal(degree)
+    if degree == 2:
+        return x.sqrt()
+    if x < 0 and degree % 2 == 1:
+        return -((-x) ** (1 / degree))
+    return x ** (1 / degree)
+
+
+sqrt = root
+
+
+# to radians:
+def rad(deg):
+    return deg * pi(getcontext().prec) / 180
+
+
+# to degrees:
+def deg(rad):
+    return rad * 180 / pi(getcontext().prec)
+
+
+# sweep ranges, object arrays of Decimals like the rest of the arrays:
+def linspace(start, stop, num=50):
+    start, stop, num = Decimal(start), Decimal(stop), int(Decimal(num))
+    if num <= 1:
+        return _array([+start][:max(num, 0)])
+    step = (stop - start) / (num - 1)
+    return _array([start + i * step for i in range(num - 1)] + [+stop])
+
+
+def arange(start, stop=None, step=1):
+    if stop is None:
+        start, stop = 0, start
+    start, stop, step = Decimal(start), Decimal(stop), Decimal(step)
+    if step == 0:
+        raise ValueError('arange() step must not be zero')
+    count = int(((stop - start) / step).to_integral_value(ROUND_CEILING))
+    return _array([start + i * step for i in range(max(count, 0))])
+
+
+def _array(values):
+    # np.array would look into the Decimals for nested sequences.
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+@lru_cache(maxsize=None)
+def namespace(precision, names):
+    """
+    return type: dict
+    Names resolvable at the given working precision, with
+    the constants already computed.
+    """
+
+    values = {'pi': pi(precision), 'e': e(precision)}
+    functions = globals()
+    return {name: values[name] if name in values else functions[name]
+            for name in names if name in values or name in functions}
@@ -0,0 +1,259 @@
+"""
+Calculator variables defined by assignments like "f = a*b + sin(c)".
+
+Each variable keeps its compiled expression and its last value, the
+variables it reads form a dependency graph, so changing one of them
+recomputes only the variables depending on it, in topological order.
+
+The worksheet also keeps the exact values of the latest results, read
+back by "ans" (the last one) and "ans[n]" (result number n).
+"""
+
+from collections import defaultdict, deque
+
+
+# results kept for ans[n] and the memory (bytes) arrays among them may
+# take, older results are forgotten. The last result is always kept,
+# whatever its size, it is ans. Variables are not bounded, they are
+# what the user assigned, and the worksheet is only sent to a worker
+# when its copy there is out of date (see worker.py).
+ANSWERS = 100
+ANSWER_BYTES = 64 * 2**20
+
+
+class InvalidAssignment(ValueError):
+    pass
+
+
+class UnknownAnswer(LookupError):
+    pass
+
+
+class Worksheet:
+
+    def __init__(self, reserved=()):
+
+        # names that can't be assigned to, functions and constants.
+        self.reserved = frozenset(reserved)
+
+        self.formulas = {}
+        self.values = {}
+        self.errors = {}
+
+        # name -> variables it reads / variables reading it.
+        self.dependencies = {}
+        self.dependents = defaultdict(set)
+
+        # engine the values were computed with, see sync.
+        self.engine = None
+
+        # latest results and the number of results so far.
+        self.answers = deque()
+        self.answered = 0
+        self.answer_bytes = 0
+
+        # bumped by every change, a copy kept by a worker process
+        # is current while its revision is the same.
+        self.revision = 0
+
+    def __contains__(self, name):
+        return name in self.formulas
+
+    def assign(self, name, expression, run):
+
+        """
+        return type: value of the variable
+        Binds name to the compiled expression and recomputes it and
+        everything depending on it, run(expression, values) evaluates
+        one expression with the current values of the variables.
+        """
+
+        if name in self.reserved:
+            raise InvalidAssignment(f"'{name}' is a built-in name.")
+
+        dependencies = {n for n in expression.names if n not in self.reserved}
+        if name in dependencies or name in self._upstream(dependencies):
+            raise InvalidAssignment(f"Circular definition of '{name}'.")
+
+        for dependency in self.dependencies.get(name, ()):
+            self.dependents[dependency].discard(name)
+        for dependency in dependencies:
+            self.dependents[dependency].add(name)
+        self.dependencies[name] = dependencies
+        self.formulas[name] = expression
+
+        self.recompute(self._downstream(name), run)
+        if name in self.errors:
+            raise self.errors[name]
+        return self.values[name]
+
+    def sync(self, engine, run):
+
+        """
+        Recomputes every variable when the values were computed by another
+        engine, like floats being reused after the precision was raised.
+        """
+
+        if engine != self.engine:
+            self.engine = engine
+            self.recompute(set(self.formulas), run)
+
+    def recompute(self, names, run):
+
+        """Recomputes the given variables, dependencies first."""
+
+        self.revision += 1
+        for name in self._ordered(names):
+            self.values.pop(name, None)
+            self.errors.pop(name, None)
+            try:
+                self.values[name] = run(self.formulas[name], self.values)
+            except Exception as error:
+                self.errors[name] = error
+
+    def copy(self):
+
+        """
+        return type: Worksheet
+        A worksheet with the same variables and results, assigning in
+        one of them leaves the other as it is.
+        """
+
+        sheet = Worksheet(self.reserved)
+        sheet.formulas = dict(self.formulas)
+        sheet.values = dict(self.values)
+        sheet.errors = dict(self.errors)
+        sheet.dependencies = dict(self.dependencies)
+        sheet.dependents = defaultdict(set, {name: set(names)
+                                             for name, names in self.dependents.items()})
+        sheet.engine = self.engine
+        sheet.answers = deque(self.answers)
+        sheet.answered = self.answered
+        sheet.answer_bytes = self.answer_bytes
+        sheet.revision = self.revision
+        return sheet
+
+    def delta(self, before):
+
+        """
+        return type: dict
+        The changes since before, a copy of this worksheet taken
+        earlier, to be applied to another copy of before. Values are
+        only included when they were computed again, and results only
+        when they are new.
+        """
+
+        new = min(self.answered - before.answered, len(self.answers))
+        return {
+            'formulas': self.formulas,
+            'dependencies': self.dependencies,
+            'errors': self.errors,
+            'values': {name: value for name, value in self.values.items()
+                       if name not in before.values or before.values[name] is not value},
+            'removed': [name for name in before.values if name not in self.values],
+            'engine': self.engine,
+            'answers': list(self.answers)[len(self.answers) - new:] if new > 0 else [],
+            'answered': self.answered,
+            'revision': self.revision,
+        }
+
+    def apply(self, delta):
+
+        """Applies the changes of delta() made to a copy of this worksheet."""
+
+        self.formulas = dict(delta['formulas'])
+        self.dependencies = dict(delta['dependencies'])
+        self.dependents = defaultdict(set)
+        for name, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                self.dependents[dependency].add(name)
+        self.errors = dict(delta['errors'])
+        for name in delta['removed']:
+            self.values.pop(name, None)
+        self.values.update(delta['values'])
+        self.engine = delta['engine']
+        for value in delta['answers']:
+            self.remember(value)
+        self.answered = delta['answered']
+        self.revision = delta['revision']
+
+    def remember(self, value):
+
+        """
+        return type: int
+        Keeps value as the next result, returns its number.
+        """
+
+        self.answers.append(value)
+        self.answered += 1
+        self.revision += 1
+        self.answer_bytes += getattr(value, 'nbytes', 0)
+        # the last result stays even past the budget, ans reads it.
+        while len(self.answers) > 1 and (len(self.answers) > ANSWERS
+                                         or self.answer_bytes > ANSWER_BYTES):
+            self.answer_bytes -= getattr(self.answers.popleft(), 'nbytes', 0)
+        return self.answered
+
+    def answer(self, number=-1):
+
+        """
+        return type: value of the result
+        Result number n counted from 1, negative numbers count
+        back from the last result, -1 being the last one.
+        """
+
+        if number != int(number) or not number:
+            raise UnknownAnswer(f'ans[{number}] is not a result number.')
+        number = int(number)
+        if number < 0:
+            index = len(self.answers) + number
+        else:
+            # numbers of the forgotten results come first.
+            index = number - 1 - (self.answered - len(self.answers))
+        if not 0 <= index < len(self.answers):
+            raise UnknownAnswer(f'There is no result ans[{number}].')
+        return self.answers[index]
+
+    # graph walks.
+
+    def _upstream(self, names):
+        """Every variable the given names depend on, directly or not."""
+
+        seen = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            for dependency in self.dependencies.get(name, ()):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    stack.append(dependency)
+        return seen
+
+    def _downstream(self, name):
+        """The variable and every defined variable depending on it."""
+
+        seen = {name}
+        stack = [name]
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return seen
+
+    def _ordered(self, names):
+        """Topological order of the defined variables among names."""
+
+        names = {name for name in names if name in self.formulas}
+        pending = {name: len(self.dependencies[name] & names) for name in names}
+        ready = [name for name, count in pending.items() if not count]
+        order = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for dependent in self.dependents.get(name, ()):
+                if dependent in pending:
+                    pending[dependent] -= 1
+                    if not pending[dependent]:
+                        ready.append(dependent)
+        return order
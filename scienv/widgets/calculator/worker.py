@@ -0,0 +1,469 @@
+"""
+Evaluation of calculator input in a separate process.
+
+The worker process is started once and reused, every submission runs
+with a time budget and, where the platform allows it, a memory budget.
+A submission that runs out of time or is cancelled kills the worker,
+the next submission starts a fresh one.
+
+The worker keeps a copy of the worksheet between submissions. It is
+sent only when the worker's copy is not current (a new worker, or
+results added to the worksheet by a batch), and that from a
+background thread. An evaluation sends back only what it changed, so
+large variables don't travel with every keystroke of a preview.
+
+A batch of independent lines, like a pasted column of expressions, is
+spread over several workers in chunks. Every line still gets its own
+time budget: only the worker stuck on a line is killed, and a new one
+takes over the rest of its chunk. The results are delivered in the
+order of the lines as soon as they are complete up to that point.
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import threading
+import time
+from collections import deque
+
+from .expression_manager import evaluate, split_assignment
+
+try:
+    import resource
+except ImportError:
+    # no address space limits on this platform.
+    resource = None
+
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_MEMORY = 2048
+
+# messages of evaluations that did not finish.
+TIMED_OUT = "Evaluation timed out."
+CANCELLED = "Evaluation cancelled."
+FAILED = "Evaluation failed."
+NOT_BATCHED = "Assignments are not evaluated in a batch."
+
+# lines sent to a batch worker at a time, seconds between checks of the
+# batch workers' time budgets and between deliveries of results.
+CHUNK = 64
+POLL = 0.05
+
+# chunks read ahead for each batch worker, they bound the memory
+# taken by lines waiting for evaluation and results waiting for delivery.
+AHEAD = 4
+
+# spawn instead of fork, forking a process running a GUI is unsafe.
+_context = multiprocessing.get_context('spawn')
+
+
+def _limit_memory(memory):
+    # memory is in megabytes.
+    if resource is not None and memory:
+        limit = memory * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+
+
+def _send_object(connection, value):
+
+    # pickled with the contiguous NumPy arrays out of band, they are
+    # written to the pipe as they are, without a copy and without
+    # holding the GIL, so a large variable doesn't stall the GUI.
+    buffers = []
+    data = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+    views = [buffer.raw() for buffer in buffers]
+    connection.send([view.nbytes for view in views])
+    connection.send_bytes(data)
+    for view in views:
+        connection.send_bytes(view)
+
+
+def _receive_object(connection):
+    sizes = connection.recv()
+    data = connection.recv_bytes()
+    # writable buffers, the arrays would be read-only on bytes.
+    buffers = [bytearray(size) for size in sizes]
+    for buffer in buffers:
+        connection.recv_bytes_into(buffer)
+    return pickle.loads(data, buffers=buffers)
+
+
+def _serve(connection, memory):
+
+    # entry point of the worker process, it keeps the last worksheet
+    # it was sent and the changes of the evaluations that are kept.
+    _limit_memory(memory)
+    worksheet = None
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message == 'worksheet':
+            worksheet = _receive_object(connection)
+            continue
+        _, string, precision, keep = message
+        # the copy shares the values, only its dicts are new.
+        sheet = worksheet.copy()
+        result = evaluate(string, precision, sheet)
+        delta = None
+        if keep:
+            delta = sheet.delta(worksheet)
+            worksheet = sheet
+        _send_object(connection, (result, delta))
+
+
+class Evaluator:
+
+    """
+    Runs evaluate() in the worker process, one submission at a time.
+    The callback gets the result and the changes to apply to the
+    worksheet (Worksheet.apply), None when there are none to keep, and
+    is called from a background thread, GUI code has to forward it
+    to the main loop (wx.CallAfter).
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, memory=DEFAULT_MEMORY):
+        self.timeout = timeout
+        self.memory = memory
+        self.busy = False
+        self._process = None
+        self._connection = None
+        self._cancelled = False
+        # revision of the worksheet the worker holds, None for none.
+        self._revision = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Starts the worker process, if it is not running already."""
+
+        with self._lock:
+            if self._process is None:
+                parent, child = _context.Pipe()
+                self._process = _context.Process(target=_serve, args=(child, self.memory),
+                                                 daemon=True)
+                self._process.start()
+                child.close()
+                self._connection = parent
+
+    def submit(self, string, precision, worksheet, callback, keep=True):
+
+        """
+        Evaluates string with the variables of worksheet. With keep
+        false the evaluation changes nothing, like a preview, and the
+        callback gets None for the changes.
+        """
+
+        if self.busy:
+            raise RuntimeError('an evaluation is already running')
+        self.start()
+        self.busy = True
+        self._cancelled = False
+        # a shallow copy, the GUI may change the worksheet while it is pickled.
+        sheet = worksheet.copy() if worksheet.revision != self._revision else None
+        threading.Thread(target=self._send, args=(string, precision, sheet, keep, callback),
+                         daemon=True).start()
+
+    def cancel(self):
+        """Kills the running evaluation, the callback reports it as cancelled."""
+
+        with self._lock:
+            if self.busy and self._process is not None:
+                self._cancelled = True
+                self._process.terminate()
+
+    def close(self):
+        """Stops the worker process."""
+
+        with self._lock:
+            if self._process is not None:
+                self._process.terminate()
+                if not self.busy:
+                    self._stop()
+
+    def _send(self, string, precision, sheet, keep, callback):
+        try:
+            if sheet is not None:
+                self._connection.send('worksheet')
+                _send_object(self._connection, sheet)
+                self._revision = sheet.revision
+            self._connection.send(('evaluate', string, precision, keep))
+        except OSError:
+            # the worker was killed by cancel, or crashed, _wait tells.
+            pass
+        self._wait(callback)
+
+    def _wait(self, callback):
+        delta = None
+        failed = True
+        try:
+            if self._connection.poll(self.timeout):
+                result, delta = _receive_object(self._connection)
+                failed = False
+            else:
+                self._process.terminate()
+                result = (None, TIMED_OUT)
+        except (EOFError, OSError):
+            # the worker is gone, killed by cancel or crashed.
+            result = (None, CANCELLED) if self._cancelled else (None, FAILED)
+
+        with self._lock:
+            if delta is not None:
+                self._revision = delta['revision']
+            if self._cancelled or failed or not self._process.is_alive():
+                self._stop()
+            self.busy = False
+        callback(result, delta)
+
+    def _stop(self):
+        self._process.join()
+        self._connection.close()
+        self._process = self._connection = None
+        self._revision = None
+
+
+def _serve_batch(connection, memory):
+
+    # entry point of a batch worker process, a batch starts with its
+    # precision and worksheet, then come chunks of lines.
+    _limit_memory(memory)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message[0] == 'batch':
+            precision, worksheet = pickle.loads(message[1])
+            continue
+        start, lines = message
+        for offset, string in enumerate(lines):
+            connection.send((start + offset,) + evaluate_line(string, precision, worksheet))
+
+
+def evaluate_line(string, precision, worksheet):
+
+    """
+    return type: tuple (result, answer)
+    Evaluates a line of a batch on a copy of the worksheet, so lines
+    don't see each other. answer is the exact value remembered for
+    ans, None when there is none.
+    """
+
+    if split_assignment(string) is not None:
+        return (None, NOT_BATCHED), None
+    sheet = worksheet.copy()
+    result = evaluate(string, precision, sheet)
+    answer = sheet.answers[-1] if sheet.answered > worksheet.answered else None
+    return result, answer
+
+
+class _BatchWorker:
+
+    # a batch worker process and the chunk it is working on.
+
+    def __init__(self, memory):
+        parent, child = _context.Pipe()
+        self.process = _context.Process(target=_serve_batch, args=(child, memory), daemon=True)
+        self.process.start()
+        child.close()
+        self.connection = parent
+        self.batch = None
+        self.chunk = None
+        self.done = 0
+        self.since = 0
+
+    def assign(self, batch, payload, chunk):
+        if self.batch is not batch:
+            self.connection.send(('batch', payload))
+            self.batch = batch
+        self.connection.send(chunk)
+        self.chunk = chunk
+        self.done = 0
+        self.since = time.monotonic()
+
+    @property
+    def current(self):
+        """Index of the line being evaluated."""
+
+        return self.chunk[0] + self.done
+
+    @property
+    def rest(self):
+        """The chunk of lines after the current one."""
+
+        return self.current + 1, self.chunk[1][self.done + 1:]
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+class BatchEvaluator:
+
+    """
+    Evaluates batches of independent lines in a set of worker processes,
+    one batch at a time, each line within the time budget. A batch is
+    either submitted, with callbacks called from a background thread
+    like the Evaluator's: results(items, done, total) gets the next
+    (line, result, answer) items in order, finished(cancelled) is
+    called at the end. Or it is iterated over with evaluate().
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, memory=DEFAULT_MEMORY, processes=None):
+        self.timeout = timeout
+        self.memory = memory
+        self.processes = processes or os.cpu_count() or 1
+        self.busy = False
+        self._workers = []
+        self._cancelled = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, lines, precision, worksheet, results, finished):
+        if self.busy:
+            raise RuntimeError('a batch is already running')
+        self.busy = True
+        self._cancelled = False
+        self._thread = threading.Thread(target=self._deliver,
+                                        args=(list(lines), precision, worksheet, results, finished),
+                                        daemon=True)
+        self._thread.start()
+
+    def evaluate(self, lines, precision, worksheet):
+
+        """
+        Yields lists of the next (line, result, answer) items in the
+        order of the lines. lines can be any iterable, like a file, it
+        is read only as far as the workers are ahead of the delivered
+        results, so memory stays bounded however long it is.
+        """
+
+        if self.busy:
+            raise RuntimeError('a batch is already running')
+        self.busy = True
+        self._cancelled = False
+        yield from self._stream(lines, precision, worksheet)
+
+    def cancel(self):
+        """Stops the running batch, the lines not evaluated yet are dropped."""
+
+        self._cancelled = True
+
+    def close(self):
+        """Stops the batch and the worker processes."""
+
+        self._cancelled = True
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            for worker in self._workers:
+                worker.kill()
+            self._workers = []
+
+    def _deliver(self, lines, precision, worksheet, results, finished):
+        done = 0
+        for items in self._stream(lines, precision, worksheet):
+            done += len(items)
+            results(items, done, len(lines))
+        finished(self._cancelled)
+
+    def _stream(self, lines, precision, worksheet):
+        batch = object()
+        # pickled once, not for every worker it is sent to.
+        payload = pickle.dumps((precision, worksheet))
+        source = iter(lines)
+        # lines read and not delivered yet, by index.
+        texts = {}
+        read = delivered = 0
+        ahead = self.processes * AHEAD * CHUNK
+
+        def chunk():
+            nonlocal read
+            lines = [line for _, line in zip(range(CHUNK), source)]
+            texts.update(enumerate(lines, read))
+            read += len(lines)
+            return (read - len(lines), lines) if lines else None
+
+        chunks = deque()
+        exhausted = False
+        done = {}
+        items = []
+        last = time.monotonic()
+        with self._lock:
+            workers = self._workers
+        try:
+            while not self._cancelled:
+                # the source is read as long as the workers are not
+                # too far ahead of the delivery.
+                while not exhausted and len(chunks) < self.processes and read - delivered < ahead:
+                    lines = chunk()
+                    if lines is None:
+                        exhausted = True
+                    else:
+                        chunks.append(lines)
+                if exhausted and not chunks and delivered == read:
+                    if items:
+                        yield items
+                    break
+
+                with self._lock:
+                    while len(workers) < min(self.processes, len(chunks)
+                                             + sum(worker.chunk is not None for worker in workers)):
+                        workers.append(_BatchWorker(self.memory))
+                for worker in workers:
+                    if worker.chunk is None and chunks:
+                        worker.assign(batch, payload, chunks.popleft())
+                busy = [worker for worker in workers if worker.chunk is not None]
+                ready = multiprocessing.connection.wait([worker.connection for worker in busy], POLL)
+
+                now = time.monotonic()
+                for index, worker in enumerate(workers):
+                    if worker.chunk is None:
+                        continue
+                    message = None
+                    if worker.connection in ready:
+                        try:
+                            while worker.connection.poll():
+                                line, result, answer = worker.connection.recv()
+                                done[line] = (result, answer)
+                                worker.done += 1
+                                worker.since = now
+                        except (EOFError, OSError):
+                            # the worker crashed, out of memory most likely.
+                            message = FAILED
+                    elif now - worker.since > self.timeout:
+                        message = TIMED_OUT
+
+                    if message is not None:
+                        # the line is lost with the worker, a new one
+                        # takes over the rest of the chunk.
+                        done[worker.current] = ((None, message), None)
+                        start, rest = worker.rest
+                        worker.kill()
+                        workers[index] = worker = _BatchWorker(self.memory)
+                        if rest:
+                            worker.assign(batch, payload, (start, rest))
+                    elif worker.done == len(worker.chunk[1]):
+                        worker.chunk = None
+
+                while delivered in done:
+                    items.append((texts.pop(delivered),) + done.pop(delivered))
+                    delivered += 1
+                if items and now - last >= POLL:
+                    last = now
+                    yield items
+                    items = []
+        finally:
+            with self._lock:
+                # workers in the middle of a line are killed, the
+                # idle ones wait for the next batch.
+                for worker in workers:
+                    if worker.chunk is not None:
+                        worker.kill()
+                workers[:] = [worker for worker in workers if worker.chunk is None]
+                self.busy = False
@@ -1,7 +1,14 @@
 import wx
 from ...lib import ButtonBase
+from .linalg import OPERATIONS
 
 
+# steps of the progress gauge.
+GAUGE_RANGE = 1000
+
+# the operation Calculate runs by default.
+PRODUCT = 'A·B'
+
 
 
 class Button(ButtonBase):
@@ -51,11 +58,47 @@ class ControlPanel(wx.Panel):
 	def Display(self):
 		self.sizer = wx.BoxSizer(wx.HORIZONTAL)
 		butt1 = Button(self, self.appConf, 'Calculate', size=(100, 40))
+		self.operation = wx.Choice(self, choices=[PRODUCT, *OPERATIONS])
+		self.operation.SetSelection(0)
+
+		# progress and cancel are shown while a job is running,
+		# the status line the rest of the time.
+		self.gauge = wx.Gauge(self, range=GAUGE_RANGE, size=(-1, 10))
+		self.status = wx.StaticText(self, style=wx.ST_ELLIPSIZE_END)
+		self.status.SetForegroundColour(self.appConf.get_color('text', 'widget'))
+		self.cancel = Button(self, self.appConf, 'Cancel', size=(100, 40))
+		self.gauge.Hide()
+		self.cancel.Hide()
+
 		self.sizer.Add(butt1, 1, flag=wx.EXPAND|wx.BOTTOM|wx.LEFT|wx.RIGHT, border=5)
+		self.sizer.Add(self.operation, 0, flag=wx.ALIGN_CENTER_VERTICAL|wx.LEFT|wx.RIGHT, border=5)
+		self.sizer.Add(self.gauge, 1, flag=wx.ALIGN_CENTER_VERTICAL|wx.LEFT|wx.RIGHT, border=5)
+		self.sizer.Add(self.status, 1, flag=wx.ALIGN_CENTER_VERTICAL|wx.LEFT|wx.RIGHT, border=5)
+		self.sizer.Add(self.cancel, 0, flag=wx.EXPAND|wx.BOTTOM|wx.LEFT|wx.RIGHT, border=5)
 		self.SetSizer(self.sizer)
 		self.Layout()
 
 
+	def SetBusy(self, busy):
+		self.gauge.SetValue(0)
+		self.gauge.Show(busy)
+		self.cancel.Show(busy)
+		self.status.Show(not busy)
+		self.Layout()
+
+
+	def SetProgress(self, fraction):
+		self.gauge.SetValue(int(fraction*GAUGE_RANGE))
+
+
+	def GetOperation(self):
+		return self.operation.GetStringSelection()
+
+
+	def SetStatus(self, text):
+		self.status.SetLabel(text)
+
+
 	def Draw(self, dc):
 		dc.SetBackground(wx.Brush(self.appConf.get_color('color1', 'widget')))
 		dc.Clear()
@@ -0,0 +1,87 @@
+"""
+Reading and writing matrices as CSV, NumPy .npy and .npz files.
+
+.npy files are memory-mapped, copy-on-write: nothing is read until a
+cell is shown or used, so a matrix larger than the memory opens at
+once and the grid pages in only the cells it draws. Edits stay in
+memory, the file is left as it is.
+"""
+
+import os
+
+import numpy as np
+
+
+WILDCARD = ('Matrices (*.npy;*.npz;*.csv;*.txt)|*.npy;*.npz;*.csv;*.txt|'
+			'NumPy array (*.npy)|*.npy|NumPy archive (*.npz)|*.npz|CSV (*.csv)|*.csv')
+
+
+def names(path):
+	"""
+	return type: list
+	Names of the arrays in a .npz archive, empty for other files.
+	"""
+
+	if _extension(path) != '.npz':
+		return []
+	with np.load(path) as archive:
+		return list(archive.files)
+
+
+def load(path, name=None):
+	"""
+	return type: numpy.ndarray
+	The matrix in the file, a memory map for .npy files. name picks
+	the array of a .npz archive, the first one by default.
+	"""
+
+	extension = _extension(path)
+	if extension == '.npy':
+		array = np.load(path, mmap_mode='c')
+	elif extension == '.npz':
+		with np.load(path) as archive:
+			if not archive.files:
+				raise ValueError('The archive holds no arrays.')
+			array = archive[name or archive.files[0]]
+	else:
+		array = _load_text(path)
+	return _matrix(array)
+
+
+def save(path, array, name='matrix'):
+	"""Writes the array to path, in the format of its extension, CSV by default."""
+
+	extension = _extension(path)
+	if extension == '.npy':
+		np.save(path, array)
+	elif extension == '.npz':
+		np.savez(path, **{name: array})
+	else:
+		np.savetxt(path, array, delimiter=',', fmt='%.17g')
+
+
+def _extension(path):
+	return os.path.splitext(path)[1].lower()
+
+
+def _load_text(path):
+	# the delimiter and a header row are told from the first line.
+	with open(path) as file:
+		first = file.readline()
+	delimiter = ',' if ',' in first else ';' if ';' in first else None
+	fields = first.split(delimiter)
+	try:
+		float(fields[0])
+		header = 0
+	except (ValueError, IndexError):
+		header = 1
+	return np.loadtxt(path, delimiter=delimiter, skiprows=header, ndmin=2)
+
+
+def _matrix(array):
+	# vectors are shown as one row, without copying a memory map.
+	if array.dtype.kind not in 'biuf':
+		raise ValueError('Only arrays of numbers can be opened.')
+	if array.ndim > 2:
+		raise ValueError(f"A {array.ndim}-dimensional array can't be shown as a matrix.")
+	return array.reshape(1, -1) if array.ndim < 2 else array
@@ -0,0 +1,208 @@
+"""
+Matrix operations running on a background thread.
+
+NumPy releases the GIL inside BLAS, so the GUI keeps running while a
+job computes. A job works in steps, like bands of rows of a product,
+between steps it reports its progress and stops if it was cancelled,
+a single BLAS call can't be interrupted.
+
+Products too large for the memory are computed out of core: the
+operands are memory maps and the product is written to a .npy file
+tile by tile, see multiply_out_of_core().
+"""
+
+import math
+import os
+import threading
+
+import numpy as np
+
+
+# multiply-adds of one band of a product, and its least rows, thinner
+# bands make BLAS noticeably slower than one call for the whole product.
+BAND_WORK = 2**30
+BAND_ROWS = 256
+
+# tiles of an out-of-core product held at once: one of a, one of b,
+# the product of the two and the sum it is added to.
+TILES = 4
+
+
+class Cancelled(Exception):
+	pass
+
+
+
+class Job:
+
+	"""
+	Runs function(job, *args) on a background thread. The callbacks are
+	called from that thread, GUI code has to forward them to the main
+	loop (wx.CallAfter): progress(fraction) after each step and
+	done(result, error) at the end, error being None, an exception or
+	Cancelled. Warnings about a result are collected in warnings.
+	"""
+
+	def __init__(self, function, *args, progress=None, done=None):
+		self.function = function
+		self.args = args
+		self.progress = progress
+		self.done = done
+		self.cancelled = False
+		self.warnings = []
+		self._thread = threading.Thread(target=self._run, daemon=True)
+
+
+	@property
+	def running(self):
+		return self._thread.is_alive()
+
+
+	def start(self):
+		self._thread.start()
+
+
+	def cancel(self):
+		"""The job stops after the step it is in."""
+
+		self.cancelled = True
+
+
+	def step(self, fraction):
+		"""Called by the function between steps with the fraction done."""
+
+		if self.cancelled:
+			raise Cancelled()
+		if self.progress is not None:
+			self.progress(fraction)
+
+
+	def warn(self, message):
+		"""Called by the function when its result is computed but doubtful."""
+
+		self.warnings.append(message)
+
+
+	def _run(self):
+		result = error = None
+		try:
+			result = self.function(self, *self.args)
+		except Exception as e:
+			# anything the function raises, Cancelled included, ends
+			# the job through done, or the GUI would wait for good.
+			error = e
+		if self.done is not None:
+			self.done(result, error)
+
+
+
+def product_type(a, b):
+	"""The type of a product, floating like the matrices typed in, integers are promoted."""
+
+	return np.result_type(a, b, 1.0)
+
+
+def multiply(job, a, b):
+
+	"""
+	return type: numpy.ndarray
+	The product a.dot(b), computed in bands of rows of a, each one
+	a BLAS call of about BAND_WORK multiply-adds, or BAND_ROWS rows.
+	"""
+
+	if a.shape[1] != b.shape[0]:
+		raise ValueError(f'Shapes {a.shape[0]}x{a.shape[1]} and {b.shape[0]}x{b.shape[1]} '
+						 "can't be multiplied.")
+	rows = a.shape[0]
+	band = max(BAND_ROWS, BAND_WORK // max(1, a.shape[1]*b.shape[1]))
+	dtype = product_type(a, b)
+	b = np.asarray(b, dtype=dtype)
+	out = np.empty((rows, b.shape[1]), dtype=dtype)
+	for start in range(0, rows, band):
+		job.step(start/rows)
+		np.dot(np.asarray(a[start:start + band], dtype=dtype), b, out=out[start:start + band])
+	job.step(1.0)
+	return out
+
+
+
+def tile_size(budget, itemsize=8):
+
+	"""
+	return type: int
+	Side of the square tiles that fit TILES at a time in budget bytes.
+	"""
+
+	return max(1, math.isqrt(budget // (TILES*itemsize)))
+
+
+
+def multiply_out_of_core(job, a, b, path, budget):
+
+	"""
+	return type: numpy.memmap
+	The product a.dot(b) written to the .npy file at path and opened
+	copy-on-write. a and b are usually memory maps, they are read in
+	square tiles sized so that about budget bytes are in memory at once.
+	Each tile of the product is summed in memory over the tiles of a
+	row of a and a column of b, and written once. The product goes to
+	path + '.part' first, which takes the place of path when done and
+	is removed when the job fails or is cancelled, so an existing file
+	at path is only replaced by a complete product.
+	"""
+
+	if a.shape[1] != b.shape[0]:
+		raise ValueError(f'Shapes {a.shape[0]}x{a.shape[1]} and {b.shape[0]}x{b.shape[1]} '
+						 "can't be multiplied.")
+	rows, inner, cols = a.shape[0], a.shape[1], b.shape[1]
+	dtype = product_type(a, b)
+	size = tile_size(budget, dtype.itemsize)
+	steps = math.ceil(rows/size) * math.ceil(cols/size) * max(1, math.ceil(inner/size))
+
+	partial = path + '.part'
+	out = None
+	try:
+		out = np.lib.format.open_memmap(partial, mode='w+', dtype=dtype, shape=(rows, cols))
+		_reserve(partial)
+		done = 0
+		# flat buffers, np.dot writes only to contiguous arrays and
+		# the tiles at the edges are smaller.
+		product = np.empty(size*size, dtype=dtype)
+		total = np.empty(size*size, dtype=dtype)
+		for i in range(0, rows, size):
+			for j in range(0, cols, size):
+				shape = (min(size, rows - i), min(size, cols - j))
+				block = total[:shape[0]*shape[1]].reshape(shape)
+				part = product[:shape[0]*shape[1]].reshape(shape)
+				block.fill(0)
+				for k in range(0, inner, size):
+					job.step(done/steps)
+					# slicing a memory map reads only the rows of the tile.
+					np.dot(np.ascontiguousarray(a[i:i + size, k:k + size], dtype=dtype),
+						   np.ascontiguousarray(b[k:k + size, j:j + size], dtype=dtype), out=part)
+					block += part
+					done += 1
+				out[i:i + size, j:j + size] = block
+		out.flush()
+		job.step(1.0)
+		del out
+		os.replace(partial, path)
+	except BaseException:
+		# the map has to be closed before its file can be removed.
+		out = None
+		try:
+			os.remove(partial)
+		except OSError:
+			pass
+		raise
+	return np.load(path, mmap_mode='c')
+
+
+
+def _reserve(path):
+	# the file of a new memory map is sparse, a disk filling up while
+	# the tiles are written would crash on a page fault (SIGBUS) rather
+	# than raise, so its blocks are allocated up front, as an OSError.
+	if hasattr(os, 'posix_fallocate'):
+		with open(path, 'r+b') as file:
+			os.posix_fallocate(file.fileno(), 0, os.fstat(file.fileno()).st_size)
@@ -0,0 +1,277 @@
+"""
+Dense linear algebra of the matrices widget.
+
+Every operation is a function(job, cache, a, b) run by a Job. The
+factorizations behind them are kept in a Factorizations cache keyed by
+a hash of the matrix content, so det(A), solve(A, B) and inv(A) of the
+same A share one LU, and the factors of an SVD or QR are shown one
+after the other without factorizing again. Editing A changes its hash,
+nothing has to be invalidated.
+
+NumPy has no LU, it is computed here in blocks: each panel of BLOCK
+columns is factorized with partial pivoting and the rest of the matrix
+is updated with one matrix product, which runs in BLAS.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# columns of an LU panel and rows of a triangular solve block.
+BLOCK = 64
+
+# factorizations kept, the least recently used is dropped first.
+CACHE_SIZE = 8
+
+
+
+class LU:
+
+	"""
+	P A = L U of a square matrix with partial pivoting, packed like
+	LAPACK's getrf: L below the diagonal, its unit diagonal implied,
+	and U on and above it. perm holds the rows of A in the order of
+	P A.
+	"""
+
+	def __init__(self, a, job=None):
+		lu = np.array(a, dtype=float)
+		n = lu.shape[0]
+		perm = np.arange(n)
+		swaps = 0
+		for start in range(0, n, BLOCK):
+			if job is not None:
+				job.step(1 - ((n - start)/n)**3)
+			end = min(start + BLOCK, n)
+			for k in range(start, end):
+				pivot = k + int(np.argmax(np.abs(lu[k:, k])))
+				if pivot != k:
+					lu[[k, pivot]] = lu[[pivot, k]]
+					perm[[k, pivot]] = perm[[pivot, k]]
+					swaps += 1
+				# a zero column leaves a zero on the diagonal of U.
+				if lu[k, k] != 0:
+					lu[k + 1:, k] /= lu[k, k]
+				lu[k + 1:, k + 1:end] -= np.outer(lu[k + 1:, k], lu[k, k + 1:end])
+			if end < n:
+				lu[start:end, end:] = _triangular(lu[start:end, start:end], lu[start:end, end:],
+												  lower=True)
+				lu[end:, end:] -= lu[end:, start:end] @ lu[start:end, end:]
+		self.lu = lu
+		self.perm = perm
+		self.swaps = swaps
+
+
+	@property
+	def singular(self):
+		return not np.all(np.diagonal(self.lu))
+
+
+	@property
+	def ill_conditioned(self):
+		# pivots below the tolerance of rank(A), like those rounding leaves
+		# where exact arithmetic has zeros, or those of a badly scaled matrix.
+		pivots = np.abs(np.diagonal(self.lu))
+		return pivots.min(initial=np.inf) <= pivots.max(initial=0) * len(pivots) * np.finfo(float).eps
+
+
+	def det(self):
+		sign = -1.0 if self.swaps % 2 else 1.0
+		return sign * np.prod(np.diagonal(self.lu))
+
+
+	def solve(self, b):
+		"""
+		return type: numpy.ndarray
+		x with A x = b, b a vector or a matrix of right-hand sides.
+		"""
+
+		if self.singular:
+			raise np.linalg.LinAlgError('The matrix is singular.')
+		y = _triangular(self.lu, np.asarray(b, dtype=float)[self.perm], lower=True)
+		return _triangular(self.lu, y, lower=False)
+
+
+	def inverse(self):
+		return self.solve(np.eye(self.lu.shape[0]))
+
+
+	def factors(self):
+		"""
+		return type: tuple
+		(P, L, U) with A = P L U, like scipy.linalg.lu.
+		"""
+
+		n = self.lu.shape[0]
+		L = np.tril(self.lu, -1) + np.eye(n)
+		U = np.triu(self.lu)
+		return np.eye(n)[:, np.argsort(self.perm)].T, L, U
+
+
+
+class Factorizations:
+
+	"""
+	The factorizations of the last CACHE_SIZE (matrix, kind) pairs.
+	A matrix is known by its shape, type and a hash of its values, a
+	hash reads the matrix once, which is little next to the O(n³) of
+	factorizing it.
+	"""
+
+	def __init__(self, size=CACHE_SIZE):
+		self.size = size
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+
+	def __len__(self):
+		return len(self._entries)
+
+
+	def get(self, kind, a, job=None):
+		"""The factorization of kind ('lu', 'qr', 'svd', 'singular' or 'eig') of a."""
+
+		key = (kind, a.shape, a.dtype.str, _digest(a))
+		with self._lock:
+			if key in self._entries:
+				self._entries.move_to_end(key)
+				return self._entries[key]
+		value = FACTORIZE[kind](a, job)
+		with self._lock:
+			self._entries[key] = value
+			while len(self._entries) > self.size:
+				self._entries.popitem(last=False)
+		return value
+
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+
+
+def _digest(a):
+	return hashlib.blake2b(np.ascontiguousarray(a).data, digest_size=16).digest()
+
+
+def _triangular(t, b, lower):
+	# x with T x = b for the triangle of t, the unit diagonal of L is
+	# implied when lower. Solved in blocks: the part already known is
+	# subtracted with a matrix product, then the diagonal block is solved.
+	n = t.shape[0]
+	x = np.array(b, dtype=float)
+	starts = range(0, n, BLOCK)
+	for start in (starts if lower else reversed(starts)):
+		end = min(start + BLOCK, n)
+		if lower:
+			x[start:end] -= t[start:end, :start] @ x[:start]
+			block = np.tril(t[start:end, start:end], -1) + np.eye(end - start)
+		else:
+			x[start:end] -= t[start:end, end:] @ x[end:]
+			block = np.triu(t[start:end, start:end])
+		x[start:end] = np.linalg.solve(block, x[start:end])
+	return x
+
+
+def _single(function):
+	# a factorization of one NumPy call, which can't report progress.
+	def factorize(a, job=None):
+		if job is not None:
+			job.step(0.0)
+		return function(np.asarray(a, dtype=float))
+	return factorize
+
+
+def _eig(a):
+	# symmetric matrices have real eigenvalues, eigh finds them faster.
+	if np.array_equal(a, a.T):
+		return np.linalg.eigh(a)
+	values, vectors = np.linalg.eig(a)
+	return np.real_if_close(values), np.real_if_close(vectors)
+
+
+FACTORIZE = {
+	'lu': LU,
+	'qr': _single(np.linalg.qr),
+	'svd': _single(lambda a: np.linalg.svd(a, full_matrices=False)),
+	'singular': _single(lambda a: np.linalg.svd(a, compute_uv=False)),
+	'eig': _single(_eig),
+}
+
+
+
+###########################################################################################
+# operations, each returns the matrix shown in C.
+
+def _square(a):
+	if a.shape[0] != a.shape[1]:
+		raise ValueError(f'A is {a.shape[0]}x{a.shape[1]}, it has to be square.')
+	return a
+
+
+def _lu(job, cache, a):
+	lu = cache.get('lu', _square(a), job)
+	if job is not None and lu.ill_conditioned and not lu.singular:
+		job.warn('A is ill-conditioned, the result may be inaccurate.')
+	return lu
+
+
+def inverse(job, cache, a, b):
+	return _lu(job, cache, a).inverse()
+
+
+def determinant(job, cache, a, b):
+	return np.array([[_lu(job, cache, a).det()]])
+
+
+def solve(job, cache, a, b):
+	if b.shape[0] != a.shape[0]:
+		raise ValueError(f'B has {b.shape[0]} rows, A has {a.shape[0]}.')
+	return _lu(job, cache, a).solve(b)
+
+
+def rank(job, cache, a, b):
+	# the tolerance of numpy.linalg.matrix_rank.
+	values = cache.get('singular', a, job)
+	tolerance = values.max(initial=0) * max(a.shape) * np.finfo(float).eps
+	return np.array([[np.count_nonzero(values > tolerance)]], dtype=float)
+
+
+def eigenvalues(job, cache, a, b):
+	return cache.get('eig', _square(a), job)[0][np.newaxis]
+
+
+def eigenvectors(job, cache, a, b):
+	return cache.get('eig', _square(a), job)[1]
+
+
+def _factor(kind, index, square=False):
+	def operation(job, cache, a, b):
+		factors = cache.get(kind, _square(a) if square else a, job)
+		if kind == 'lu':
+			factors = factors.factors()
+		factor = factors[index]
+		return factor[np.newaxis] if factor.ndim == 1 else factor
+	return operation
+
+
+# name shown in the widget -> operation.
+OPERATIONS = {
+	'inv(A)': inverse,
+	'det(A)': determinant,
+	'solve(A, B)': solve,
+	'rank(A)': rank,
+	'eigenvalues(A)': eigenvalues,
+	'eigenvectors(A)': eigenvectors,
+	'SVD(A): U': _factor('svd', 0),
+	'SVD(A): S': _factor('svd', 1),
+	'SVD(A): Vt': _factor('svd', 2),
+	'QR(A): Q': _factor('qr', 0),
+	'QR(A): R': _factor('qr', 1),
+	'LU(A): P': _factor('lu', 0, square=True),
+	'LU(A): L': _factor('lu', 1, square=True),
+	'LU(A): U': _factor('lu', 2, square=True),
+}
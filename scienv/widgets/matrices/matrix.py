@@ -1,6 +1,75 @@
+import os
+
 import wx
+import wx.grid
 from ...lib import ScaledStaticText
 import numpy as np
+from . import files
+
+
+
+# most cells a matrix asks room for, larger ones scroll.
+VISIBLE_ROWS = 10
+VISIBLE_COLS = 8
+
+
+class MatrixTable(wx.grid.GridTableBase):
+
+	"""
+	Table of a grid backed by a 2-D NumPy array, the grid asks only for
+	the cells it draws, so the size of the matrix doesn't matter.
+	"""
+
+	def __init__(self, array):
+		super().__init__()
+		self.array = array
+
+
+	def GetNumberRows(self):
+		return self.array.shape[0]
+
+
+	def GetNumberCols(self):
+		return self.array.shape[1]
+
+
+	def IsEmptyCell(self, row, col):
+		return False
+
+
+	def GetValue(self, row, col):
+		return f'{self.array[row, col]:.6g}'
+
+
+	def SetValue(self, row, col, value):
+		# anything that isn't a number leaves the cell as it was.
+		try:
+			self.array[row, col] = float(value)
+		except ValueError:
+			pass
+
+
+	def SetArray(self, array):
+		"""Replaces the array, the grid is told about the rows and columns that came or went."""
+
+		old = self.array.shape
+		self.array = array
+		grid = self.GetView()
+		if grid is None:
+			return
+
+		grid.BeginBatch()
+		for current, new, deleted, appended in (
+				(old[0], array.shape[0], wx.grid.GRIDTABLE_NOTIFY_ROWS_DELETED,
+				 wx.grid.GRIDTABLE_NOTIFY_ROWS_APPENDED),
+				(old[1], array.shape[1], wx.grid.GRIDTABLE_NOTIFY_COLS_DELETED,
+				 wx.grid.GRIDTABLE_NOTIFY_COLS_APPENDED)):
+			if new < current:
+				grid.ProcessTableMessage(wx.grid.GridTableMessage(self, deleted, new, current - new))
+			elif new > current:
+				grid.ProcessTableMessage(wx.grid.GridTableMessage(self, appended, new - current))
+		grid.EndBatch()
+		grid.ForceRefresh()
 
 
 
@@ -15,77 +84,84 @@ class Matrix(wx.Panel):
 		self.fontSize = self.font.GetPointSize()
 
 		rows, cols = [int(n) for n in dimensions.split('x')]
-		
-		self.DisplayGrid(rows, cols)
+
+		self.Display(rows, cols)
 		self.CalculateSize()
 
 		self.Bind(wx.EVT_PAINT, self._OnPaint)
 		self.Bind(wx.EVT_ERASE_BACKGROUND, self._OnEraseBackground)
 
 
+	def Display(self, rows, cols):
+		self.rows = rows
+		self.cols = cols
+		self.cellSize = (4*self.fontSize + 10, self.fontSize + 10)
+
+		# a virtual grid, the cells are drawn from the table,
+		# no control exists per cell.
+		self.table = MatrixTable(np.zeros((rows, cols)))
+		self.grid = wx.grid.Grid(self, style=wx.NO_BORDER)
+		self.grid.SetTable(self.table, takeOwnership=True)
+		self.grid.SetRowLabelSize(0)
+		self.grid.SetColLabelSize(0)
+		self.grid.SetDefaultColSize(self.cellSize[0], resizeExistingCols=True)
+		self.grid.SetDefaultRowSize(self.cellSize[1], resizeExistingRows=True)
+		self.grid.DisableDragGridSize()
+		self.grid.SetDefaultCellFont(self.font)
+		self.grid.SetDefaultCellAlignment(wx.ALIGN_CENTER, wx.ALIGN_CENTER)
+		self.grid.SetDefaultCellTextColour(self.config.get_color('text', 'widget'))
+		self.grid.SetDefaultCellBackgroundColour(self.config.get_color('color1', 'widget'))
+		self.grid.SetGridLineColour(self.config.get_color('color2', 'widget'))
+		self.grid.SetBackgroundColour(self.config.get_color('color1', 'widget'))
+
+		self.sizer = wx.BoxSizer(wx.HORIZONTAL)
+		self.sizer.Add(self.grid, 1, flag=wx.EXPAND|wx.ALL, border=3)
+		self.SetSizer(self.sizer)
+
+		self.Layout()
+
+
 	def CalculateSize(self):
-		width, height = (self.cols*(self.fontSize+20), self.rows*(self.fontSize+5))
+		width = min(self.cols, VISIBLE_COLS)*self.cellSize[0] + 6
+		height = min(self.rows, VISIBLE_ROWS)*self.cellSize[1] + 6
+		if self.cols > VISIBLE_COLS or self.rows > VISIBLE_ROWS:
+			width += wx.SystemSettings.GetMetric(wx.SYS_VSCROLL_X)
+			height += wx.SystemSettings.GetMetric(wx.SYS_HSCROLL_Y)
 		self.SetMinSize((width, height))
 
 
 	def DisplayGrid(self, rows, cols):
-		try:
-			self.panel.Destroy()
-		except:
-			pass
+		"""Resizes the matrix, the remaining cells keep their values, new cells are 0."""
 
+		array = np.zeros((rows, cols))
+		kept_rows, kept_cols = min(rows, self.rows), min(cols, self.cols)
+		array[:kept_rows, :kept_cols] = self.table.array[:kept_rows, :kept_cols]
 		self.rows = rows
 		self.cols = cols
-
-		self.panel = wx.Panel(self)
-		self.panel.SetBackgroundColour(self.config.get_color('color1', 'widget'))
-		self.panel.sizer = wx.GridSizer(rows, cols, 0, 0)
-
-		size = (self.fontSize+20, self.fontSize+5)
-		fg = self.config.get_color('text', 'widget')
-		bg = self.config.get_color('color1', 'widget')
-
-		for row in range(0, rows):
-			for col in range(0, cols):
-				self.panel.sizer.Add(TextField(self.panel, self.font, fg, bg, size=size), 
-									flag=wx.EXPAND)
-
-		self.panel.SetSizer(self.panel.sizer)
-		self.sizer = wx.BoxSizer(wx.HORIZONTAL)
-		self.sizer.Add(self.panel, 1, flag=wx.EXPAND|wx.ALL, border=3)
-		self.SetSizer(self.sizer)
-
+		self.table.SetArray(array)
 		self.Layout()
 
 
 	def ReadValues(self):
-		array = []
-		row = []
-		nxt = self.cols - 1
-		for index, child in enumerate(self.panel.GetChildren()):
-			row.append(child.GetValue())
-
-			if index == nxt:
-				nxt = nxt + self.cols
-				array.append(row)
-				row = []
-
-		return array
+		# a cell still being edited counts with its new value, memory-mapped
+		# arrays are returned as they are, copying would read them whole.
+		if self.grid.IsCellEditControlEnabled():
+			self.grid.SaveEditControlValue()
+			self.grid.HideCellEditControl()
+		array = self.table.array
+		return array if isinstance(array, np.memmap) else array.copy()
 
 
 	def WriteValues(self, array):
-		unpacked = []
-		if self.rows == 1:
-			unpacked = [str(num) for num in array]
-		else:
-			for subarray in array:
-				for num in subarray:
-					unpacked.append(str(num))
-		print(unpacked)
+		self.SetArray(np.array(array, dtype=float, ndmin=2))
 
-		for index, child in enumerate(self.panel.GetChildren()):
-			child.SetValue(unpacked[index])
 
+	def SetArray(self, array):
+		"""Shows the 2-D array itself, a memory map stays one."""
+
+		self.rows, self.cols = array.shape
+		self.table.SetArray(array)
+		self.Layout()
 
 
 	def Draw(self, dc):
@@ -162,6 +238,7 @@ class MainPanel(wx.Panel):
 						  size=(200, 30), name='b')
 		dim_b.Bind(wx.EVT_TEXT_ENTER, self.ChangeDimensions)
 		dim_b.SetValue('3x3')
+		self.dims = {'a': dim_a, 'b': dim_b}
 
 		x_text = ScaledStaticText(self, 'x', textFont, 
 								  self.config.get_color('color1', 'widget'), self.config.get_color('text', 'widget'),
@@ -171,6 +248,11 @@ class MainPanel(wx.Panel):
 		self.matrix_b = Matrix(self, self.config, matrixFont, dimensions='3x3')
 		self.matrix_c = Matrix(self, self.config, matrixFont, dimensions='3x3')
 
+		# right click on a matrix opens or saves it.
+		for name, matrix in self.Matrices():
+			matrix.grid.Bind(wx.grid.EVT_GRID_CELL_RIGHT_CLICK,
+							 lambda e, name=name: self.MatrixMenu(name))
+
 		sizer.Add(dim_a, pos=(0, 0), span=(1, 2), flag=wx.EXPAND|wx.ALL, border=10)
 		sizer.Add(dim_b, pos=(0, 3), span=(1, 2), flag=wx.EXPAND|wx.ALL, border=10)
 		sizer.Add(x_text, pos=(1, 2), flag=wx.EXPAND)
@@ -191,6 +273,75 @@ class MainPanel(wx.Panel):
 		self.SetSizer(sizer)
 		self.Layout()
 
+
+	def Matrices(self):
+		return (('a', self.matrix_a), ('b', self.matrix_b), ('c', self.matrix_c))
+
+
+	def IsMapped(self, path):
+		"""True when a matrix is memory-mapped from path, the file must not be rewritten."""
+
+		path = os.path.realpath(path)
+		for _, matrix in self.Matrices():
+			array = matrix.table.array
+			if isinstance(array, np.memmap) and os.path.realpath(array.filename) == path:
+				return True
+		return False
+
+
+	def MatrixMenu(self, name):
+		menu = wx.Menu()
+		load = menu.Append(wx.ID_ANY, 'Open...')
+		save = menu.Append(wx.ID_ANY, 'Save as...')
+		self.Bind(wx.EVT_MENU, lambda e: self.OpenMatrix(name), load)
+		self.Bind(wx.EVT_MENU, lambda e: self.SaveMatrix(name), save)
+		self.PopupMenu(menu)
+		menu.Destroy()
+
+
+	def OpenMatrix(self, name):
+		matrix = dict(self.Matrices())[name]
+		with wx.FileDialog(self, f'Open matrix {name.upper()}', wildcard=files.WILDCARD,
+						   style=wx.FD_OPEN|wx.FD_FILE_MUST_EXIST) as dialog:
+			if dialog.ShowModal() == wx.ID_CANCEL:
+				return
+			path = dialog.GetPath()
+		try:
+			arrays = files.names(path)
+			choice = None
+			if len(arrays) > 1:
+				with wx.SingleChoiceDialog(self, 'Array to open', 'Open', arrays) as dialog:
+					if dialog.ShowModal() == wx.ID_CANCEL:
+						return
+					choice = dialog.GetStringSelection()
+			array = files.load(path, choice)
+		except (OSError, ValueError) as error:
+			wx.MessageBox(str(error), 'Open', wx.OK|wx.ICON_ERROR, self)
+			return
+
+		matrix.SetArray(array)
+		matrix.CalculateSize()
+		if name in self.dims:
+			self.dims[name].ChangeValue('{}x{}'.format(*array.shape))
+		self.Layout()
+
+
+	def SaveMatrix(self, name):
+		matrix = dict(self.Matrices())[name]
+		with wx.FileDialog(self, f'Save matrix {name.upper()}', wildcard=files.WILDCARD,
+						   style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT) as dialog:
+			if dialog.ShowModal() == wx.ID_CANCEL:
+				return
+			path = dialog.GetPath()
+		if self.IsMapped(path):
+			wx.MessageBox('The file is open in a matrix.', 'Save', wx.OK|wx.ICON_ERROR, self)
+			return
+		try:
+			files.save(path, matrix.ReadValues(), name)
+		except (OSError, ValueError) as error:
+			wx.MessageBox(str(error), 'Save', wx.OK|wx.ICON_ERROR, self)
+
+
 	def ChangeDimensions(self, e):
 		print('change dimensions')
 		try:
@@ -1,7 +1,14 @@
 import wx
 import numpy as np
 from .matrix import MainPanel
-from .control import ControlPanel
+from .control import ControlPanel, PRODUCT
+from .jobs import Job, Cancelled, multiply, multiply_out_of_core, product_type
+from .linalg import OPERATIONS, Factorizations
+
+
+# MiB the operands and the product of an in-memory multiplication may
+# take, larger products are computed out of core into a .npy file.
+MEMORY_BUDGET = 1024
 
 
 class Panel(wx.Panel):
@@ -17,6 +24,12 @@ class Panel(wx.Panel):
 
 		self.config = appConf
 		self.widgetConf = widgetConf
+		# the running or last matrix job.
+		self.job = None
+		self.budget = int(self.widgetConf.get('memoryBudget', MEMORY_BUDGET)) * 2**20
+		# factorizations of the last operands, shared by the operations.
+		self.factorizations = Factorizations()
+		self.Bind(wx.EVT_WINDOW_DESTROY, self._OnDestroy)
 
 		self.Display()
 
@@ -39,9 +52,75 @@ class Panel(wx.Panel):
 	def OnButton(self, e):
 		name = e.GetEventObject().label
 		if name == 'Calculate':
-			MultiplyMatrices(self.matrixPanel.matrix_a, 
-							 self.matrixPanel.matrix_b, 
-							 self.matrixPanel.matrix_c)
+			self.Calculate()
+		elif name == 'Cancel' and self.job is not None:
+			self.job.cancel()
+
+
+	def Calculate(self):
+		# the operation runs on a background thread, only
+		# its progress and result come back to the GUI.
+		if self.job is not None and self.job.running:
+			return
+		# memory maps are passed as they are, of any type, the job
+		# converts what it reads, a cast here would read them whole.
+		A = self.matrixPanel.matrix_a.ReadValues()
+		B = self.matrixPanel.matrix_b.ReadValues()
+		operation = self.controlPanel.GetOperation()
+		args = (multiply, A, B)
+		if operation != PRODUCT:
+			args = (OPERATIONS[operation], self.factorizations, A, B)
+		elif A.nbytes + B.nbytes + A.shape[0]*B.shape[1]*product_type(A, B).itemsize > self.budget:
+			path = self.AskProductFile()
+			if path is None:
+				return
+			args = (multiply_out_of_core, A, B, path, self.budget)
+		self.job = Job(*args,
+					   progress=lambda fraction: wx.CallAfter(self.ShowProgress, fraction),
+					   done=lambda result, error: wx.CallAfter(self.ShowResult, result, error))
+		self.controlPanel.SetBusy(True)
+		self.job.start()
+
+
+	def AskProductFile(self):
+		# the out-of-core product is written to a .npy file of the user's choice.
+		with wx.FileDialog(self, 'The product does not fit in the memory budget, write it to',
+						   wildcard='NumPy array (*.npy)|*.npy',
+						   style=wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT) as dialog:
+			if dialog.ShowModal() == wx.ID_CANCEL:
+				return None
+			path = dialog.GetPath()
+		if not path.endswith('.npy'):
+			path += '.npy'
+		if self.matrixPanel.IsMapped(path):
+			self.controlPanel.SetStatus('The file is open in a matrix.')
+			return None
+		return path
+
+
+	def ShowProgress(self, fraction):
+		if self:
+			self.controlPanel.SetProgress(fraction)
+
+
+	def ShowResult(self, C, error):
+		# the widget may have been closed while the job was running.
+		if not self:
+			return
+		self.controlPanel.SetBusy(False)
+		if isinstance(error, Cancelled):
+			self.controlPanel.SetStatus('Cancelled.')
+			return
+		if error is not None:
+			if not str(error):
+				error = 'Not enough memory.' if isinstance(error, MemoryError) else type(error).__name__
+			self.controlPanel.SetStatus(str(error))
+			return
+		self.controlPanel.SetStatus(' '.join(self.job.warnings))
+		out = self.matrixPanel.matrix_c
+		out.SetArray(C)
+		out.CalculateSize()
+		self.matrixPanel.Layout()
 
 
 
@@ -59,11 +138,7 @@ class Panel(wx.Panel):
 		self.Draw(dc)
 
 
-def MultiplyMatrices(matrix_a, matrix_b, out):
-	A = np.array(matrix_a.ReadValues(), dtype=float)
-	B = np.array(matrix_b.ReadValues(), dtype=float)
-	C = A.dot(B)
-	c_rows, c_cols = C.shape
-	out.DisplayGrid(c_rows, c_cols)
-	out.CalculateSize()
-	out.WriteValues(C)
\ No newline at end of file
+	def _OnDestroy(self, e):
+		if e.GetEventObject() is self and self.job is not None:
+			self.job.cancel()
+		e.Skip()
@@ -0,0 +1,85 @@
+import math
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from scienv.widgets.calculator.autodiff import Dual, derivative
+from scienv.widgets.calculator.expression_manager import evaluate
+from scienv.widgets.calculator.variables import Worksheet
+
+
+def d(string, precision=15, worksheet=None):
+    value, source = evaluate(string, precision, worksheet or Worksheet())
+    assert value is not None, source
+    return value
+
+
+def test_dual_arithmetic():
+    x = Dual(3.0, 1.0)
+    y = x * x + 2 * x - 1 / x
+    assert y.val == pytest.approx(9 + 6 - 1 / 3)
+    assert y.der == pytest.approx(2 * 3 + 2 + 1 / 9)
+    assert (x ** 3).der == pytest.approx(27)
+
+
+def test_derivative():
+    assert derivative(lambda ns: ns['x'] ** 2, 'x', 3.0, {}) == pytest.approx(6)
+    # a constant expression has a zero derivative.
+    assert derivative(lambda ns: 5.0, 'x', 3.0, {}) == 0
+
+
+@pytest.mark.parametrize('string, expected', [
+    ('d(x^3, x, 2)', 12),
+    ('d(sin(x), x, 0)', 1),
+    ('d(cos(x), x, 0)', 0),
+    ('d(sqrt(x), x, 4)', 0.25),
+    ('d(log10(x), x, 1)', 1 / math.log(10)),
+    ('d(2^x, x, 1)', 2 * math.log(2)),
+    ('d(x^x, x, 1)', 1),
+    ('d(d(x^3, x), x, 2)', 12),
+    ('d(5, x, 2)', 0),
+    ('d(x!, x, 3)', 6 * (1 + 1 / 2 + 1 / 3 - 0.5772156649015329)),
+    ('d(gamma(x), x, 2)', 1 - 0.5772156649015329),
+    ('d(ncr(x, 2), x, 5)', 4.5),
+    ('d(npr(x, 2), x, 5)', 9),
+    ('d(erf(x), x, 1)', 2 / math.sqrt(math.pi) / math.e),
+    ('d(normcdf(x), x, 0)', 1 / math.sqrt(2 * math.pi)),
+    ('d(beta(x, 2), x, 1)', -0.75),
+    ('d(poissonpmf(3, x), x, 2)', 4 * math.exp(-2) * (3 / 2 - 1) / 3),
+    ('d(sum(x*[1, 2, 3]), x, 1)', 6),
+    ('d(sum(x+[1, 2]), x, 1)', 2),
+])
+def test_expressions(string, expected):
+    assert float(d(string)) == pytest.approx(expected)
+
+
+def test_over_an_array():
+    assert np.allclose(d('d(x^2, x, [1, 2, 3])'), [2, 4, 6])
+
+
+def test_at_high_precision():
+    # computed in floats, the result has the digits of a float only.
+    value = d('d(sin(x), x, 1)', 50)
+    assert value == Decimal('0.540302305868140')
+    assert d('d(sin(x), x, 1)*2', 50) == 2 * value
+
+
+@pytest.mark.parametrize('string, message', [
+    ('d(gcd(x, 4), x, 2)', 'd(): gcd is not differentiable'),
+    ('d(poissonpmf(x, 2), x, 2)', 'd(): poissonpmf is not differentiable'),
+    ('d(max(x*[1, 2]), x, 1)', 'd(): max is not differentiable'),
+    ('d(d(gamma(x), x), x, 2)', 'd(): gamma can only be differentiated once'),
+])
+def test_not_differentiable(string, message):
+    assert evaluate(string, 15, Worksheet()) == (None, message)
+
+
+def test_worksheet_variables():
+    worksheet = Worksheet()
+    for line in ('a = 3', 'x = 2', 'y = a*x^2'):
+        d(line, worksheet=worksheet)
+    # y depends on x, its formula is differentiated, not its value.
+    assert d('d(y, x)', worksheet=worksheet) == 12
+    assert d('d(y, x, 1)', worksheet=worksheet) == 6
+    assert d('d(a*x, x)', worksheet=worksheet) == 3
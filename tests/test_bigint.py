@@ -0,0 +1,49 @@
+import io
+import math
+import random
+import sys
+
+import pytest
+
+from scienv.widgets.calculator import bigint
+
+
+@pytest.fixture(autouse=True)
+def unlimited_str():
+    # str() is the reference, it has to print every digit.
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    yield
+    sys.set_int_max_str_digits(limit)
+
+
+def numbers():
+    generator = random.Random(0)
+    yield from (0, 1, -1, 9, 10, 2**bigint.LEAF_BITS, -(2**bigint.LEAF_BITS) - 1)
+    # powers of 10 and their neighbours, where digit_count's estimate is closest.
+    for exponent in (15, 16, 308, 309, 1000, 4300, 12345):
+        yield from (10**exponent - 1, 10**exponent, 10**exponent + 1)
+    for bits in (63, 64, 1023, 1025, 5000, 65536, 200001):
+        yield generator.getrandbits(bits)
+        yield -generator.getrandbits(bits)
+    yield math.factorial(5000)
+
+
+@pytest.mark.parametrize('n', list(numbers()), ids=lambda n: f'{n.bit_length()}bits')
+def test_against_str(n):
+    digits = str(n)
+    assert bigint.to_string(n) == digits
+    assert str(bigint.to_decimal(n)) == digits
+    assert bigint.digit_count(n) == len(digits.lstrip('-'))
+
+
+def test_write_digits(monkeypatch):
+    monkeypatch.setattr(bigint, 'CHUNK', 1000)
+    n = 7**20000
+    file = io.StringIO()
+    calls = []
+    bigint.write_digits(n, file, lambda written, total: calls.append((written, total)))
+    digits = str(n)
+    assert file.getvalue() == digits
+    assert calls[-1] == (len(digits), len(digits))
+    assert [written for written, _ in calls] == sorted(written for written, _ in calls)
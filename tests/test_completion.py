@@ -0,0 +1,53 @@
+import random
+
+from scienv.widgets.calculator.completion import Trie, FUNCTION, CONSTANT, VARIABLE
+
+
+def reference(names, prefix, limit):
+    return sorted((name, kind) for name, kind in names.items() if name.startswith(prefix))[:limit]
+
+
+def test_complete():
+    trie = Trie([('sin', FUNCTION), ('sinh', FUNCTION), ('sqrt', FUNCTION),
+                 ('pi', CONSTANT), ('s', VARIABLE)])
+    assert len(trie) == 5 and 'sin' in trie and 'si' not in trie
+    assert trie.complete('s') == [('s', VARIABLE), ('sin', FUNCTION), ('sinh', FUNCTION),
+                                  ('sqrt', FUNCTION)]
+    assert trie.complete('si', limit=1) == [('sin', FUNCTION)]
+    assert trie.complete('') == sorted(trie.complete(''))
+    assert trie.complete('x') == [] and trie.complete('sinhx') == []
+
+
+def test_add_and_remove():
+    trie = Trie([('sin', FUNCTION)])
+    trie.add('sin', VARIABLE)
+    assert len(trie) == 1 and trie.complete('sin') == [('sin', VARIABLE)]
+    trie.add('sine', VARIABLE)
+    trie.remove('sin')
+    trie.remove('sin')
+    trie.remove('tan')
+    assert len(trie) == 1 and 'sin' not in trie
+    assert trie.complete('s') == [('sine', VARIABLE)]
+    trie.remove('sine')
+    assert len(trie) == 0 and trie.complete('') == []
+    # the branches were removed with the names.
+    assert trie._root.children == {}
+
+
+def test_random_names():
+    generator = random.Random(0)
+    trie = Trie()
+    names = {}
+    for _ in range(3000):
+        name = ''.join(generator.choice('abc_1') for _ in range(generator.randint(1, 6)))
+        if name in names and generator.random() < 0.5:
+            trie.remove(name)
+            del names[name]
+        else:
+            kind = generator.choice((FUNCTION, CONSTANT, VARIABLE))
+            trie.add(name, kind)
+            names[name] = kind
+    assert len(trie) == len(names)
+    for prefix in ('', 'a', 'b_', 'ca1', 'abcab', '1'):
+        for limit in (1, 20, 10**6):
+            assert trie.complete(prefix, limit) == reference(names, prefix, limit)
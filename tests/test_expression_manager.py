@@ -0,0 +1,35 @@
+import pytest
+
+from scienv.widgets.calculator.expression_manager import evaluate, evaluate_precise
+from scienv.widgets.calculator.variables import Worksheet
+
+
+@pytest.mark.parametrize('string, precision, message', [
+    ('9^9^9', 30, 'Overflow'),
+    ('e^1e10', 15, 'Overflow'),
+    ('e^1e10', 30, 'Overflow'),
+    ('sqrt(-4)', 15, 'Math domain error'),
+    ('sqrt(-4)', 30, 'Math domain error'),
+    ('log10(-1)', 30, 'Math domain error'),
+    ('(-1)!', 15, 'Math domain error'),
+    ('1/0', 30, 'Division by zero is not allowed.'),
+    ('2 3', 15, 'Invalid Syntax'),
+    ('[[1, 2], [3]]', 15, 'Invalid Syntax'),
+    ('q+1', 30, 'Invalid Function'),
+])
+def test_error_messages(string, precision, message):
+    assert evaluate(string, precision, Worksheet()) == (None, message)
+
+
+def test_evaluate_precise_values():
+    assert evaluate_precise('2x', 15, {'x': 3}) == 6
+    with pytest.raises(NameError):
+        evaluate_precise('2x', 15)
+
+
+@pytest.mark.parametrize('precision', [15, 30])
+def test_gamma(precision):
+    assert evaluate('gamma(5)', precision, Worksheet())[0] == 24
+    assert evaluate('gamma(1e10)', precision, Worksheet()) == (None, 'Overflow')
+    assert evaluate('gamma(10^10)', precision, Worksheet()) == (None, 'Overflow')
+    assert evaluate('gamma(0)', precision, Worksheet()) == (None, 'Math domain error')
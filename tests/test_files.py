@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from scienv.widgets.matrices import files
+
+
+def matrix(dtype=float):
+    return (np.random.default_rng(0).standard_normal((7, 5)) * 1e3).astype(dtype)
+
+
+@pytest.mark.parametrize('extension', ['.npy', '.npz', '.csv', '.txt', '.CSV'])
+def test_round_trip(tmp_path, extension):
+    path = str(tmp_path / ('m' + extension))
+    a = matrix()
+    files.save(path, a)
+    b = files.load(path)
+    # 17 significant digits in text, every double comes back the same.
+    assert b.dtype == a.dtype and np.array_equal(a, b)
+
+
+@pytest.mark.parametrize('dtype', [np.int32, np.float32, np.uint8, bool])
+def test_binary_keeps_type(tmp_path, dtype):
+    for extension in ('.npy', '.npz'):
+        path = str(tmp_path / ('m' + extension))
+        a = matrix(dtype)
+        files.save(path, a)
+        b = files.load(path)
+        assert b.dtype == a.dtype and np.array_equal(a, b)
+
+
+def test_npy_is_mapped_copy_on_write(tmp_path):
+    path = str(tmp_path / 'm.npy')
+    a = matrix()
+    files.save(path, a)
+    b = files.load(path)
+    assert isinstance(b, np.memmap) and b.mode == 'c'
+    b[0, 0] = 42
+    # edits stay in memory.
+    assert np.array_equal(files.load(path), a)
+
+
+def test_npz_names(tmp_path):
+    path = str(tmp_path / 'm.npz')
+    np.savez(path, first=np.eye(2), second=np.arange(3.0))
+    assert files.names(path) == ['first', 'second']
+    assert files.names(str(tmp_path / 'm.npy')) == []
+    assert np.array_equal(files.load(path), np.eye(2))
+    # vectors are one row.
+    assert np.array_equal(files.load(path, 'second'), [[0.0, 1.0, 2.0]])
+    np.savez(path)
+    with pytest.raises(ValueError, match='no arrays'):
+        files.load(path)
+
+
+@pytest.mark.parametrize('text', [
+    'a,b\n1,2\n3,4\n', '1;2\n3;4\n', '1 2\n3 4\n', 'x y\n1 2\n3 4\n', '1,2\n3,4'])
+def test_text_formats(tmp_path, text):
+    path = tmp_path / 'm.csv'
+    path.write_text(text)
+    assert np.array_equal(files.load(str(path)), [[1, 2], [3, 4]])
+
+
+def test_single_column(tmp_path):
+    path = tmp_path / 'm.txt'
+    path.write_text('1\n2\n3\n')
+    assert files.load(str(path)).shape == (3, 1)
+
+
+@pytest.mark.parametrize('array', [np.array(['a', 'b']), np.zeros((2, 2, 2))])
+def test_not_a_matrix(tmp_path, array):
+    path = str(tmp_path / 'm.npy')
+    np.save(path, array)
+    with pytest.raises(ValueError):
+        files.load(path)
@@ -0,0 +1,58 @@
+import random
+
+from scienv.widgets.calculator.highlight import Lexer
+from scienv.widgets.calculator.parser import tokenize
+
+
+def check(lexer, text):
+    start, end, tokens = lexer.update(text)
+    full = list(tokenize(text))
+    assert lexer.tokens == full
+    # the tokens reported are those of the changed span.
+    assert tokens == [token for token in full if start <= token.pos < end]
+    return start, end
+
+
+def test_typing():
+    lexer = Lexer()
+    text = ''
+    for character in 'x = 2.5e+10*sin(ans[2]) # 1':
+        text += character
+        check(lexer, text)
+    # deleting from the end, then everything.
+    while text:
+        text = text[:-1]
+        check(lexer, text)
+
+
+def test_numbers_grow_into_exponents():
+    lexer = Lexer()
+    check(lexer, '2 + 3')
+    for text in ('2e + 3', '2e+ + 3', '2e+5 + 3', '2.e+5 + 3'):
+        check(lexer, text)
+
+
+def test_edit_in_the_middle_is_local():
+    lexer = Lexer()
+    text = ' + '.join(f'f{n}(x)' for n in range(1000))
+    check(lexer, text)
+    middle = text.index('f500')
+    start, end = check(lexer, text[:middle] + 'g' + text[middle + 1:])
+    assert start <= middle and end - start < 10
+
+
+def test_random_edits():
+    pieces = ['1', '2.', '5e', '+', '-', '*', '/', '^', '(', ')', '[', ']', ',', ' ', 'x',
+              'sin', 'ans', '=', '.', 'e', '3', '!', '$', '"']
+    generator = random.Random(0)
+    lexer = Lexer()
+    text = ''
+    for _ in range(2000):
+        position = generator.randint(0, len(text))
+        cut = generator.randint(0, min(3, len(text) - position))
+        insert = ''.join(generator.choice(pieces) for _ in range(generator.randint(0, 3)))
+        text = text[:position] + insert + text[position + cut:]
+        check(lexer, text)
+    lexer.reset()
+    assert lexer.tokens == []
+    check(lexer, text)
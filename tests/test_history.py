@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+from scienv.widgets.calculator.history import HistoryBuffer, HistoryStore, make_entry
+
+
+def entries(count):
+    return [make_entry(f'{n}+1', str(n + 1)) for n in range(count)]
+
+
+def test_ring_buffer():
+    history = HistoryBuffer(capacity=3)
+    added = entries(5)
+    for entry in added[:2]:
+        history.append(entry)
+    assert len(history) == 2 and list(history) == added[:2]
+    for entry in added[2:]:
+        history.append(entry)
+    # the oldest entries are dropped, indexing starts at the oldest kept.
+    assert len(history) == 3 and list(history) == added[2:]
+    assert history[0] == added[2] and history[-1] == added[4]
+    for index in (3, -4):
+        with pytest.raises(IndexError):
+            history[index]
+    history.clear()
+    assert len(history) == 0 and list(history) == []
+
+
+def test_spill(tmp_path):
+    spill = tmp_path / 'spill.jsonl'
+    history = HistoryBuffer(capacity=2, spill=str(spill))
+    added = entries(4)
+    for entry in added:
+        history.append(entry)
+    history.close()
+    lines = spill.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == [entry._asdict() for entry in added[:2]]
+    assert list(history) == added[2:]
+
+
+def test_search():
+    history = HistoryBuffer(capacity=20)
+    for entry in entries(15):
+        history.append(entry)
+    # latest matches, oldest first.
+    assert [e.input for e in history.search('1+')] == ['1+1', '11+1']
+    assert [e.input for e in history.search('+1', limit=2)] == ['13+1', '14+1']
+    assert [e.result for e in history.search('15')] == ['15']
+    assert history.search('x') == []
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history' / 'history.db'))
+    yield store
+    store.close()
+
+
+def test_store_latest(store):
+    added = entries(5)
+    for entry in added:
+        store.append(entry)
+    store.flush()
+    assert store.latest(2) == added[3:]
+    assert store.search('') == added
+
+
+@pytest.mark.parametrize('text', ['sin(', '2.5', 'x_1', '%', '"q', 'e', 'no match'])
+def test_store_search(store, text):
+    # trigram lookups, and scans for text shorter than a trigram,
+    # find what a scan of the entries does.
+    added = [make_entry(input, result) for input, result in [
+        ('sin(pi/2)', '1'), ('x_1 = 2.5', '2.5'), ('7 % 3', '1'), ('"q" + 1', 'Invalid Syntax'),
+        ('xa1', '0'), ('exp(1)', '2.71828182845905'), ('SIN(1)', '0.841470984807897')]]
+    for entry in added:
+        store.append(entry)
+    store.flush()
+    expected = [entry for entry in added if text.casefold() in entry.input.casefold()
+                or text.casefold() in entry.result.casefold()]
+    assert store.search(text) == expected
+
+
+def test_store_search_limit(store):
+    added = entries(30)
+    for entry in added:
+        store.append(entry)
+    store.flush()
+    assert store.search('+1', limit=3) == added[-3:]
+
+
+def test_store_reopened(tmp_path):
+    path = str(tmp_path / 'history.db')
+    store = HistoryStore(path)
+    store.append(make_entry('1+1', '2', number=1))
+    store.close()
+    store = HistoryStore(path)
+    try:
+        # numbers of another session don't resolve with ans[n].
+        [entry] = store.search('1+1')
+        assert entry.input == '1+1' and entry.number is None
+    finally:
+        store.close()
@@ -0,0 +1,94 @@
+import math
+from decimal import Decimal, localcontext
+
+import numpy as np
+import pytest
+
+from scienv.widgets.calculator.expression_manager import evaluate, evaluate_precise
+from scienv.widgets.calculator.jit import compile_code
+from scienv.widgets.calculator.parser import parse, normalize
+from scienv.widgets.calculator.variables import Worksheet
+
+
+def run(string, **names):
+    return compile_code(parse(normalize(string)))(names)
+
+
+@pytest.mark.parametrize('string, expected', [
+    ('1+2*3', 7),
+    ('(1+2)*3', 9),
+    ('2^3^2', 512),
+    ('-2^2', -4),
+    ('7/2', 3.5),
+    ('-7%3', 2),
+    ('10-4-3', 3),
+])
+def test_arithmetic(string, expected):
+    assert run(string) == expected
+
+
+def test_names_and_functions():
+    assert run('2x+y', x=3, y=1) == 7
+    assert run('f(x)^2', f=math.sqrt, x=9) == 9
+    assert run('2pi', pi=math.pi) == 2 * math.pi
+
+
+def test_common_subexpressions():
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x + 1
+
+    assert run('f(x)^2+f(x)', f=f, x=1) == 6
+    assert calls == [1]
+
+
+def test_constants_are_folded():
+    # the generated code never looks up a name for a constant expression.
+    assert compile_code(parse('2^10+1'))({}) == 1025
+
+
+def test_arrays():
+    assert np.array_equal(run('[1, 2, 3]*x', x=2), [2, 4, 6])
+    assert run('[[1, 2], [3, 4]][1][0]') == 3
+    with pytest.raises(IndexError):
+        run('[1, 2][1.5]')
+
+
+def test_missing_name():
+    with pytest.raises(NameError):
+        run('x+1')
+
+
+def test_key_error_of_a_function():
+    def lookup(x):
+        return {}[x]
+
+    with pytest.raises(KeyError):
+        run('f(1)', f=lookup)
+
+
+def test_constant_call():
+    assert run('pi(2)', pi=math.pi) == 2 * math.pi
+
+
+@pytest.mark.parametrize('string', ['-7%3', '7%-3', '-7.5%2', '[-7, 7]%3'])
+def test_modulo_in_both_engines(string):
+    floats = evaluate(string, 15, Worksheet())[0]
+    decimals = evaluate(string, 30, Worksheet())[0]
+    assert np.array_equal(np.asarray(floats, dtype=float), np.asarray(decimals, dtype=float))
+
+
+def test_precise_integers_are_exact():
+    assert evaluate('100!', 20, Worksheet())[0] == math.factorial(100)
+    assert evaluate('ncr(100, 50)', 30, Worksheet())[0] == math.comb(100, 50)
+    assert evaluate('100!%7', 30, Worksheet())[0] == 0
+    assert evaluate_precise('ncr(10, 3)/7', 30) == Decimal('17.' + '142857' * 4 + '1429')
+
+
+def test_precise_engine():
+    assert evaluate_precise('1/3', 30) == Decimal('0.' + '3' * 30)
+    with localcontext() as ctx:
+        ctx.prec = 40
+        assert evaluate_precise('2^0.5', 40) == Decimal(2).sqrt()
@@ -0,0 +1,129 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from scienv.widgets.matrices import jobs
+from scienv.widgets.matrices.jobs import Job, Cancelled, multiply, multiply_out_of_core
+
+
+def random_matrix(rows, cols, seed=0, dtype=float):
+    return (np.random.default_rng(seed).standard_normal((rows, cols)) * 10).astype(dtype)
+
+
+def recording():
+    # a job run on the calling thread, its progress kept.
+    fractions = []
+    return Job(None, progress=fractions.append), fractions
+
+
+@pytest.mark.parametrize('shape', [(1, 1, 1), (50, 30, 20), (300, 7, 45)])
+def test_multiply_in_bands(monkeypatch, shape):
+    monkeypatch.setattr(jobs, 'BAND_WORK', 1)
+    monkeypatch.setattr(jobs, 'BAND_ROWS', 16)
+    rows, inner, cols = shape
+    a, b = random_matrix(rows, inner), random_matrix(inner, cols, seed=1)
+    job, fractions = recording()
+    assert np.allclose(multiply(job, a, b), a @ b)
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+
+
+@pytest.mark.parametrize('types', [(np.int64, np.int64, np.float64), (np.float32, np.float32, np.float32),
+                                   (np.int8, np.float32, np.float32), (np.float32, np.float64, np.float64)])
+def test_product_type(types):
+    a, b = random_matrix(5, 4, dtype=types[0]), random_matrix(4, 3, seed=1, dtype=types[1])
+    product = multiply(Job(None), a, b)
+    assert product.dtype == types[2] == jobs.product_type(a, b)
+    assert np.allclose(product, a.astype(types[2]) @ b.astype(types[2]), rtol=1e-5)
+
+
+def test_shapes_checked(tmp_path):
+    a, b = random_matrix(3, 4), random_matrix(3, 4)
+    with pytest.raises(ValueError, match="3x4 and 3x4 can't be multiplied"):
+        multiply(Job(None), a, b)
+    with pytest.raises(ValueError):
+        multiply_out_of_core(Job(None), a, b, str(tmp_path / 'c.npy'), 2**20)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('shape', [(40, 40, 40), (37, 61, 23), (1, 100, 1), (100, 1, 100)])
+@pytest.mark.parametrize('types', [(float, float), (np.float32, np.float32), (np.int32, np.float32)])
+def test_out_of_core(tmp_path, shape, types):
+    rows, inner, cols = shape
+    a = random_matrix(rows, inner, dtype=types[0])
+    b = random_matrix(inner, cols, seed=1, dtype=types[1])
+    # the operands as memory maps, like files opened in the grid.
+    np.save(tmp_path / 'a.npy', a)
+    np.save(tmp_path / 'b.npy', b)
+    a_map = np.load(tmp_path / 'a.npy', mmap_mode='r')
+    b_map = np.load(tmp_path / 'b.npy', mmap_mode='r')
+    path = str(tmp_path / 'c.npy')
+    # tiles of 8x8 elements at most.
+    budget = jobs.TILES * 64 * jobs.product_type(a, b).itemsize
+    assert jobs.tile_size(budget, jobs.product_type(a, b).itemsize) == 8
+    job, fractions = recording()
+    c = multiply_out_of_core(job, a_map, b_map, path, budget)
+    dtype = jobs.product_type(a, b)
+    assert c.dtype == dtype and c.shape == (rows, cols)
+    # the tiles add up in another order than BLAS, entries that cancel
+    # are only close to the size of the terms.
+    expected = a.astype(float) @ b.astype(float)
+    scale = np.abs(a.astype(float)) @ np.abs(b.astype(float))
+    assert np.all(np.abs(c - expected) <= 4 * inner * np.finfo(dtype).eps * scale)
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    assert sorted(os.listdir(tmp_path)) == ['a.npy', 'b.npy', 'c.npy']
+
+
+def test_cancelled_out_of_core_keeps_the_old_file(tmp_path):
+    path = str(tmp_path / 'c.npy')
+    np.save(path, np.eye(2))
+    job = Job(None)
+    steps = []
+
+    def progress(fraction):
+        steps.append(fraction)
+        if len(steps) == 3:
+            job.cancel()
+
+    job.progress = progress
+    a, b = random_matrix(30, 30), random_matrix(30, 30, seed=1)
+    with pytest.raises(Cancelled):
+        multiply_out_of_core(job, a, b, path, jobs.TILES * 64 * 8)
+    # the partial product is removed, the file at path is untouched.
+    assert os.listdir(tmp_path) == ['c.npy']
+    assert np.array_equal(np.load(path), np.eye(2))
+
+
+def test_failed_out_of_core_removes_the_partial_file(tmp_path, monkeypatch):
+    def full(path):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(jobs, '_reserve', full)
+    with pytest.raises(OSError):
+        multiply_out_of_core(Job(None), np.eye(3), np.eye(3), str(tmp_path / 'c.npy'), 2**20)
+    assert os.listdir(tmp_path) == []
+
+
+def test_job_thread():
+    finished = threading.Event()
+    results = []
+
+    def done(result, error):
+        results.append((result, error))
+        finished.set()
+
+    a, b = random_matrix(20, 10), random_matrix(10, 5, seed=1)
+    job = Job(multiply, a, b, done=done)
+    job.start()
+    assert finished.wait(60)
+    [(result, error)] = results
+    assert error is None and np.allclose(result, a @ b)
+
+    finished.clear()
+    results.clear()
+    job = Job(multiply, a, b, done=done)
+    job.cancel()
+    job.start()
+    assert finished.wait(60)
+    assert results[0][0] is None and isinstance(results[0][1], Cancelled)
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from scienv.widgets.matrices import linalg
+from scienv.widgets.matrices.jobs import Job
+from scienv.widgets.matrices.linalg import LU, Factorizations
+
+
+def random_matrix(n, m=None, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, n if m is None else m))
+
+
+# sizes around linalg.BLOCK, where the blocked LU changes panels.
+SIZES = [1, 2, 5, linalg.BLOCK - 1, linalg.BLOCK, linalg.BLOCK + 1, 2 * linalg.BLOCK + 3]
+
+
+@pytest.mark.parametrize('n', SIZES)
+def test_lu_matches_numpy(n):
+    a = random_matrix(n)
+    b = random_matrix(n, 3, seed=1)
+    lu = LU(a)
+    assert np.isclose(lu.det(), np.linalg.det(a), rtol=1e-9)
+    assert np.allclose(lu.solve(b), np.linalg.solve(a, b))
+    assert np.allclose(lu.solve(b[:, 0]), np.linalg.solve(a, b[:, 0]))
+    assert np.allclose(lu.inverse(), np.linalg.inv(a))
+    p, l, u = lu.factors()
+    assert np.allclose(p @ l @ u, a)
+    assert np.allclose(np.diagonal(l), 1)
+    assert np.allclose(l, np.tril(l)) and np.allclose(u, np.triu(u))
+
+
+def test_one_by_one():
+    lu = LU(np.array([[4.0]]))
+    assert lu.det() == 4.0
+    assert np.allclose(lu.solve(np.array([[2.0]])), [[0.5]])
+    assert np.allclose(linalg.inverse(None, Factorizations(), np.array([[4.0]]), None), [[0.25]])
+
+
+@pytest.mark.parametrize('n', [1, 3, linalg.BLOCK + 5])
+def test_singular(n):
+    a = random_matrix(n)
+    a[-1] = 0
+    lu = LU(a)
+    assert lu.singular
+    assert lu.det() == 0
+    with pytest.raises(np.linalg.LinAlgError):
+        lu.solve(np.ones(n))
+    assert linalg.rank(None, Factorizations(), a, None)[0, 0] == np.linalg.matrix_rank(a)
+
+
+def test_badly_scaled_is_not_singular():
+    a = np.diag([1.0, 1e-17])
+    b = np.array([1.0, 1e-17])
+    job = Job(None)
+    lu = LU(a)
+    assert not lu.singular and lu.ill_conditioned
+    assert np.isclose(linalg.determinant(job, Factorizations(), a, None)[0, 0], 1e-17, rtol=1e-12, atol=0)
+    assert np.allclose(linalg.solve(job, Factorizations(), a, b), np.linalg.solve(a, b))
+    assert np.allclose(linalg.inverse(job, Factorizations(), a, None), np.linalg.inv(a))
+    assert len(job.warnings) == 3
+
+
+def test_rounded_singular():
+    # elimination leaves a pivot of about 1e-16, not an exact zero, the
+    # result is computed like numpy.linalg does, with a warning.
+    a = np.arange(1.0, 10.0).reshape(3, 3)
+    job = Job(None)
+    det = linalg.determinant(job, Factorizations(), a, None)[0, 0]
+    assert np.isclose(det, np.linalg.det(a), atol=1e-14)
+    assert job.warnings
+
+
+def test_well_conditioned_has_no_warning():
+    job = Job(None)
+    linalg.inverse(job, Factorizations(), random_matrix(4), None)
+    assert job.warnings == []
+
+
+def test_zero_column():
+    a = np.array([[0.0, 1.0], [0.0, 2.0]])
+    p, l, u = LU(a).factors()
+    assert np.allclose(p @ l @ u, a)
+
+
+@pytest.mark.parametrize('operation', ['inv(A)', 'det(A)', 'solve(A, B)', 'eigenvalues(A)',
+                                       'eigenvectors(A)', 'LU(A): L'])
+def test_non_square(operation):
+    a = random_matrix(3, 4)
+    with pytest.raises(ValueError):
+        linalg.OPERATIONS[operation](None, Factorizations(), a, random_matrix(3, 2))
+
+
+def test_operations_match_numpy():
+    a, b = random_matrix(6), random_matrix(6, 2, seed=1)
+    cache = Factorizations()
+    assert np.allclose(linalg.OPERATIONS['inv(A)'](None, cache, a, b), np.linalg.inv(a))
+    assert np.isclose(linalg.OPERATIONS['det(A)'](None, cache, a, b)[0, 0], np.linalg.det(a))
+    assert np.allclose(linalg.OPERATIONS['solve(A, B)'](None, cache, a, b), np.linalg.solve(a, b))
+    assert linalg.OPERATIONS['rank(A)'](None, cache, a, b)[0, 0] == 6
+    q = linalg.OPERATIONS['QR(A): Q'](None, cache, a, b)
+    r = linalg.OPERATIONS['QR(A): R'](None, cache, a, b)
+    assert np.allclose(q @ r, a)
+    u = linalg.OPERATIONS['SVD(A): U'](None, cache, a, b)
+    s = linalg.OPERATIONS['SVD(A): S'](None, cache, a, b)
+    vt = linalg.OPERATIONS['SVD(A): Vt'](None, cache, a, b)
+    assert np.allclose(u * s @ vt, a)
+    symmetric = a + a.T
+    assert np.allclose(linalg.OPERATIONS['eigenvalues(A)'](None, cache, symmetric, b)[0],
+                       np.linalg.eigvalsh(symmetric))
+
+
+def test_cache_shares_factorizations():
+    a = random_matrix(5)
+    cache = Factorizations()
+    lu = cache.get('lu', a)
+    assert cache.get('lu', a.copy()) is lu
+    assert cache.get('qr', a) is not lu
+    assert len(cache) == 2
+
+
+def test_cache_misses_after_edit():
+    a = random_matrix(5)
+    cache = Factorizations()
+    before = linalg.determinant(None, cache, a, None)[0, 0]
+    a[2, 3] += 1.0
+    after = linalg.determinant(None, cache, a, None)[0, 0]
+    assert np.isclose(after, np.linalg.det(a))
+    assert not np.isclose(before, after)
+    assert len(cache) == 2
+
+
+def test_cache_keys_shape_and_type():
+    cache = Factorizations()
+    a = np.arange(6.0)
+    cache.get('singular', a.reshape(2, 3))
+    cache.get('singular', a.reshape(3, 2))
+    cache.get('singular', a.reshape(2, 3).astype(np.float32))
+    assert len(cache) == 3
+
+
+def test_cache_drops_least_recently_used():
+    cache = Factorizations(size=2)
+    first, second, third = (random_matrix(3, seed=seed) for seed in range(3))
+    lu = cache.get('lu', first)
+    cache.get('lu', second)
+    cache.get('lu', first)
+    cache.get('lu', third)
+    assert len(cache) == 2
+    assert cache.get('lu', first) is lu
+    cache.clear()
+    assert len(cache) == 0
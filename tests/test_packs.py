@@ -0,0 +1,50 @@
+import math
+import subprocess
+import sys
+from decimal import Decimal
+
+import numpy as np
+
+from scienv.widgets.calculator import packs
+from scienv.widgets.calculator.expression_manager import evaluate, evaluate_precise, reserved
+
+
+LAZY = '''
+import sys
+from scienv.widgets.calculator.expression_manager import evaluate, reserved
+loaded = lambda: sorted(name.rsplit('.', 1)[1] for name in sys.modules
+                        if name.startswith('scienv.widgets.calculator.packs.'))
+assert 'gcd' in reserved and 'erf' in reserved
+print(loaded())
+evaluate('gcd(12, 18)', 15)
+print(loaded())
+evaluate('erf(1) + 1', 15)
+print(loaded())
+'''
+
+
+def test_loaded_on_first_use():
+    # in a fresh interpreter, other tests have loaded the packs already.
+    output = subprocess.run([sys.executable, '-c', LAZY], capture_output=True, text=True,
+                            check=True).stdout.splitlines()
+    assert output == ['[]', "['numbers']", "['numbers', 'special']"]
+
+
+def test_lookup():
+    assert packs.lookup('sin') is None
+    scalar, vector = packs.lookup('erf')
+    assert scalar(1) == math.erf(1)
+    assert np.array_equal(vector(np.array([0.0, 1.0])), [0.0, math.erf(1)])
+    precise, _ = packs.lookup('erf', precise=True)
+    assert precise is not scalar
+    # no Decimal implementation, the scalar one is used at any precision.
+    assert packs.lookup('gcd', precise=True)[0] is packs.lookup('gcd')[0]
+    assert set(packs.functions) <= set(reserved)
+
+
+def test_float_and_precise():
+    assert evaluate('gcd(12, 18)', 15)[0] == 6
+    assert math.isclose(evaluate('beta(2, 3)', 15)[0], 1/12, rel_tol=1e-14)
+    assert np.allclose(evaluate('erf([0, 1])', 15)[0], [0, math.erf(1)])
+    assert evaluate_precise('erf(1)', 30) == Decimal('0.842700792949714869341220635083')
+    assert evaluate_precise('normcdf(1)', 30) == Decimal('0.841344746068542948585232545632')
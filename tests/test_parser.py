@@ -0,0 +1,61 @@
+import pytest
+
+from scienv.widgets.calculator.parser import normalize, parse, unparse, names, to_number
+
+
+def source(string):
+    return unparse(parse(normalize(string)))
+
+
+@pytest.mark.parametrize('string, expected', [
+    ('1+2*3', '1+(2*3)'),
+    ('(1+2)*3', '(1+2)*3'),
+    ('2*3+4*5-6', '(2*3)+(4*5)-6'),
+    ('2x^2', '2*(x**2)'),
+    ('2pi', '2*pi'),
+    ('-2^2', '-(2**2)'),
+    ('2^3^2', '2**(3**2)'),
+    ('3!', 'factorial(3)'),
+    ('(3!)!', 'factorial(factorial(3))'),
+    ('sin(x)cos(x)', 'sin(x)*cos(x)'),
+    ('10%3', '10%3'),
+    ('1e3', '1e3'),
+    ('[1, 2][0]', '[1, 2][0]'),
+    ('ans[1]', 'ans[1]'),
+    ('d(x^2, x, 3)', 'd(x**2, x, 3)'),
+])
+def test_unparse(string, expected):
+    assert source(string) == expected
+
+
+def test_unparse_parses_back():
+    for string in ('2x^2-3x+1', '(1+2)*3', '1-(2-3)', '-(1-2)^-3', 'sin(cos(x))!',
+                   '[[1, 2], [3, 4]][1]'):
+        assert parse(source(string)) == parse(normalize(string))
+
+
+def test_normalize():
+    assert normalize(' 2 X + 1 ') == '2 x + 1'
+
+
+def test_names():
+    assert names(parse('sin(x)*y+2pi')) == {'sin', 'x', 'y', 'pi'}
+    assert names(parse('1+2')) == set()
+
+
+@pytest.mark.parametrize('string', ['1+', '(1', '1)', '*2', 'sin(', '[1, 2', '2 3'])
+def test_syntax_errors(string):
+    with pytest.raises(SyntaxError):
+        parse(normalize(string))
+
+
+def test_deep_nesting():
+    depth = 100
+    tree = parse('(' * depth + '1' + ')' * depth)
+    assert unparse(tree) == '1'
+
+
+def test_to_number():
+    assert to_number('12') == 12 and isinstance(to_number('12'), int)
+    assert to_number('1.5') == 1.5
+    assert to_number('1e3') == 1000
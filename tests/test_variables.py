@@ -0,0 +1,117 @@
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from scienv.widgets.calculator import variables
+from scienv.widgets.calculator.expression_manager import evaluate, reserved
+from scienv.widgets.calculator.variables import Worksheet, InvalidAssignment, UnknownAnswer
+
+
+# an expression as the worksheet sees it: the names it reads and a
+# function of the values.
+Formula = namedtuple('Formula', 'names function')
+
+
+class Runs:
+
+    def __init__(self):
+        self.names = []
+
+    def __call__(self, formula, values):
+        self.names.append(formula.names)
+        return formula.function(values)
+
+
+def test_recomputes_dependents_in_order():
+    sheet, run = Worksheet(), Runs()
+    sheet.assign('a', Formula(frozenset(), lambda v: 1), run)
+    sheet.assign('b', Formula(frozenset('a'), lambda v: v['a'] + 1), run)
+    sheet.assign('c', Formula(frozenset('ab'), lambda v: v['a'] * v['b']), run)
+    sheet.assign('d', Formula(frozenset(), lambda v: 7), run)
+    run.names.clear()
+    assert sheet.assign('a', Formula(frozenset(), lambda v: 3), run) == 3
+    assert sheet.values == {'a': 3, 'b': 4, 'c': 12, 'd': 7}
+    # d does not read a, it is not computed again, b comes before c.
+    assert run.names == [frozenset(), frozenset('a'), frozenset('ab')]
+
+
+def test_through_evaluate():
+    sheet = Worksheet(reserved)
+    for line in ('x = 2', 'y = x^2', 'z = y + x'):
+        evaluate(line, 15, sheet)
+    assert evaluate('z', 15, sheet)[0] == 6
+    evaluate('x = 3', 15, sheet)
+    assert evaluate('z', 15, sheet)[0] == 12
+
+
+def test_invalid_assignments():
+    sheet = Worksheet(reserved)
+    assert evaluate('sin = 2', 15, sheet) == (None, "'sin' is a built-in name.")
+    evaluate('a = b + 1', 15, sheet)
+    assert evaluate('b = a', 15, sheet) == (None, "Circular definition of 'b'.")
+    assert evaluate('a = a', 15, sheet) == (None, "Circular definition of 'a'.")
+
+
+def test_errors_stay_with_the_variable():
+    sheet = Worksheet(reserved)
+    evaluate('a = 1', 15, sheet)
+    evaluate('b = 1/a', 15, sheet)
+    assert evaluate('a = 0', 15, sheet)[0] == 0
+    assert 'b' in sheet.errors and 'b' not in sheet.values
+    evaluate('a = 2', 15, sheet)
+    assert sheet.values['b'] == 0.5 and not sheet.errors
+
+
+def test_answers():
+    sheet = Worksheet(reserved)
+    for line in ('2', '3', 'ans*10', 'ans[1] + ans[-2]'):
+        evaluate(line, 15, sheet)
+    assert [sheet.answer(n) for n in (1, 2, 3, 4)] == [2, 3, 30, 5]
+    assert sheet.answer() == 5 and sheet.answer(-4) == 2
+    for number in (0, 5, -5, 1.5):
+        with pytest.raises(UnknownAnswer):
+            sheet.answer(number)
+
+
+def test_variables_pin_answers():
+    sheet = Worksheet(reserved)
+    evaluate('2', 15, sheet)
+    evaluate('v = ans + 1', 15, sheet)
+    evaluate('10', 15, sheet)
+    evaluate('w = 1', 15, sheet)
+    # v read result 1 and keeps reading it when it is recomputed.
+    assert sheet.formulas['v'].string == 'ans[1] + 1'
+    evaluate('w = 2', 15, sheet)
+    assert evaluate('v', 15, sheet)[0] == 3
+
+
+def test_answer_budgets(monkeypatch):
+    monkeypatch.setattr(variables, 'ANSWERS', 3)
+    monkeypatch.setattr(variables, 'ANSWER_BYTES', 100)
+    sheet = Worksheet()
+    for value in range(5):
+        sheet.remember(value)
+    assert list(sheet.answers) == [2, 3, 4] and sheet.answer(3) == 2
+    with pytest.raises(UnknownAnswer):
+        sheet.answer(2)
+    big = np.zeros(20)
+    sheet.remember(big)
+    # over the byte budget, only the last result is kept.
+    assert list(sheet.answers) == [big] and sheet.answer_bytes == big.nbytes
+
+
+def test_copy_delta_apply():
+    sheet = Worksheet(reserved)
+    evaluate('a = 1', 15, sheet)
+    evaluate('b = a + 1', 15, sheet)
+    before = sheet.copy()
+    changed = sheet.copy()
+    evaluate('a = 5', 15, changed)
+    evaluate('c = 1', 15, changed)
+    assert sheet.values == {'a': 1, 'b': 2}
+    before.apply(changed.delta(sheet))
+    assert before.values == changed.values
+    assert before.revision == changed.revision
+    assert list(before.answers) == list(changed.answers)
+    assert before.dependents['a'] == {'b'}
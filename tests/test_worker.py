@@ -0,0 +1,134 @@
+import threading
+
+import pytest
+
+from scienv.widgets.calculator import worker
+from scienv.widgets.calculator.expression_manager import evaluate, reserved
+from scienv.widgets.calculator.variables import Worksheet
+from scienv.widgets.calculator.worker import BatchEvaluator, Evaluator
+
+
+def run(evaluator, string, sheet, keep=True, cancel=False):
+    # the callback comes from a background thread.
+    calls = []
+    called = threading.Event()
+
+    def callback(result, delta):
+        calls.append((result, delta))
+        called.set()
+
+    evaluator.submit(string, 15, sheet, callback, keep)
+    if cancel:
+        evaluator.cancel()
+    assert called.wait(60)
+    return calls[0]
+
+
+@pytest.fixture
+def evaluator():
+    evaluator = Evaluator(timeout=5)
+    yield evaluator
+    evaluator.close()
+
+
+def test_result_and_changes(evaluator):
+    sheet = Worksheet(reserved)
+    evaluate('a = 2', 15, sheet)
+    result, delta = run(evaluator, 'b = a*3', sheet)
+    assert result == (6, 'b = a*3')
+    sheet.apply(delta)
+    assert sheet.values['b'] == 6
+    # the worker's copy is current, only the changes travel back.
+    result, delta = run(evaluator, 'b + a', sheet)
+    assert result[0] == 8 and set(delta['values']) == set()
+
+
+def test_preview_keeps_nothing(evaluator):
+    sheet = Worksheet(reserved)
+    assert run(evaluator, 'c = 1', sheet, keep=False) == ((1, 'c = 1'), None)
+    assert run(evaluator, 'c', sheet, keep=False)[0][0] is None
+
+
+def test_timeout():
+    evaluator = Evaluator(timeout=0.5)
+    try:
+        sheet = Worksheet(reserved)
+        assert run(evaluator, '9^9^9', sheet) == ((None, worker.TIMED_OUT), None)
+        assert not evaluator.busy
+        # a fresh worker takes the next submission.
+        assert run(evaluator, '1+1', sheet)[0] == (2, '1+1')
+    finally:
+        evaluator.close()
+
+
+def test_cancel(evaluator):
+    sheet = Worksheet(reserved)
+    assert run(evaluator, '9^9^9', sheet, cancel=True) == ((None, worker.CANCELLED), None)
+    assert run(evaluator, '2+2', sheet)[0] == (4, '2+2')
+
+
+@pytest.mark.skipif(worker.resource is None, reason='no address space limits')
+def test_memory_limit():
+    # 800 MB of floats, past a 200 MB budget.
+    string = 'sum(linspace(0, 1, 1e8))'
+    limited = Evaluator(timeout=30, memory=200)
+    try:
+        assert run(limited, string, Worksheet(reserved))[0] == (None, 'Out of memory.')
+        assert run(limited, '3', Worksheet(reserved))[0][0] == 3
+    finally:
+        limited.close()
+
+
+def batch(evaluator, lines, sheet):
+    return [item for items in evaluator.evaluate(lines, 15, sheet) for item in items]
+
+
+def test_batch_order(monkeypatch):
+    # small chunks, so lines are spread over both workers.
+    monkeypatch.setattr(worker, 'CHUNK', 3)
+    sheet = Worksheet(reserved)
+    evaluate('a = 10', 15, sheet)
+    lines = [f'{n}*a' for n in range(40)]
+    evaluator = BatchEvaluator(timeout=10, processes=2)
+    try:
+        # lines are read lazily, a generator will do.
+        items = batch(evaluator, (line for line in lines), sheet)
+    finally:
+        evaluator.close()
+    assert [line for line, _, _ in items] == lines
+    assert [result for _, (result, _), _ in items] == [n*10 for n in range(40)]
+    assert [answer for _, _, answer in items] == [n*10 for n in range(40)]
+    assert not evaluator.busy
+
+
+def test_batch_timeout_and_assignments(monkeypatch):
+    monkeypatch.setattr(worker, 'CHUNK', 4)
+    lines = ['1', '2', '9^9^9', '4', 'x = 5', '6', '7']
+    evaluator = BatchEvaluator(timeout=1, processes=2)
+    try:
+        sheet = Worksheet(reserved)
+        items = batch(evaluator, lines, sheet)
+        # only the line over its budget is lost, the rest of its chunk is evaluated.
+        assert [result for _, result, _ in items] == [
+            (1, '1'), (2, '2'), (None, worker.TIMED_OUT), (4, '4'),
+            (None, worker.NOT_BATCHED), (6, '6'), (7, '7')]
+        assert 'x' not in sheet and sheet.answered == 0
+        # the workers are reused by the next batch.
+        assert [result[0] for _, result, _ in batch(evaluator, ['8', '9'], sheet)] == [8, 9]
+    finally:
+        evaluator.close()
+
+
+def test_batch_submit():
+    delivered = []
+    finished = threading.Event()
+    evaluator = BatchEvaluator(timeout=10, processes=1)
+    try:
+        evaluator.submit([f'{n}+1' for n in range(10)], 15, Worksheet(reserved),
+                         lambda items, done, total: delivered.append((items, done, total)),
+                         lambda cancelled: finished.set())
+        assert finished.wait(60)
+    finally:
+        evaluator.close()
+    assert [result[0] for items, _, _ in delivered for _, result, _ in items] == list(range(1, 11))
+    assert delivered[-1][1:] == (10, 10)